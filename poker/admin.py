@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Game, Player, GameRound, PlayerAction
+from .models import Game, Player, GameRound, PlayerAction, OpponentStats, ChipTransfer, Tournament, TournamentEntry
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
@@ -23,3 +23,26 @@ class PlayerActionAdmin(admin.ModelAdmin):
     list_display = ['player', 'action', 'amount', 'timestamp']
     list_filter = ['action', 'timestamp']
     search_fields = ['player__user__username']
+
+@admin.register(OpponentStats)
+class OpponentStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'hands', 'vpip_hands', 'pfr_hands', 'aggressive_actions', 'passive_actions', 'updated_at']
+    search_fields = ['user__username']
+
+@admin.register(ChipTransfer)
+class ChipTransferAdmin(admin.ModelAdmin):
+    list_display = ['game', 'game_round', 'user', 'amount', 'reason', 'created_at']
+    list_filter = ['reason', 'created_at']
+    search_fields = ['user__username', 'game__name']
+
+@admin.register(Tournament)
+class TournamentAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'level', 'table_size', 'starting_chips', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['name']
+
+@admin.register(TournamentEntry)
+class TournamentEntryAdmin(admin.ModelAdmin):
+    list_display = ['tournament', 'user', 'is_ai', 'finish_position', 'eliminated_at']
+    list_filter = ['is_ai', 'tournament']
+    search_fields = ['user__username', 'tournament__name']
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PokerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'poker'
+
+    def ready(self):
+        # 状態変更シグナルの受信ハンドラを登録
+        from .utils import game_events  # noqa: F401
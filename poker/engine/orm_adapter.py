@@ -0,0 +1,98 @@
+"""
+テーブル状態マシンとDjangoモデルの相互変換
+"""
+import json
+
+from ..utils.fast_evaluator import FastHandEvaluator, RANK_INDEX, SUIT_INDEX
+from .table import Seat, Table
+
+
+class TableAdapter:
+    """Game / Player / GameRound からTableを組み立て、変更分だけを書き戻す"""
+
+    # チップはChipServiceでF()式により加減算するので一括更新には含めない
+    SEAT_FIELDS = ('current_bet', 'total_bet', 'is_active', 'is_folded', 'has_acted_this_round')
+
+    @staticmethod
+    def load(game, current_round=None, players=None, with_cards=False):
+        """Tableを組み立て、(table, players) を返す
+
+        playersを渡した場合はそのインスタンスに変更が反映される。
+        with_cards=Trueの場合は手札とコミュニティカードも読み込む。
+        """
+        from ..models import Player
+
+        if players is None:
+            players = list(Player.objects.filter(game=game).order_by('position'))
+
+        seats = []
+        for p in players:
+            seats.append(Seat(
+                p.position, p.chips,
+                player_id=p.id,
+                is_ai=p.is_ai,
+                current_bet=p.current_bet,
+                total_bet=p.total_bet,
+                hand=TableAdapter._parse_cards(p.hand_cards) if with_cards else None,
+                is_active=p.is_active,
+                is_folded=p.is_folded,
+                has_acted=p.has_acted_this_round,
+            ))
+
+        table = Table(seats, game.small_blind, game.big_blind, game.dealer_position)
+        table.pot = game.pot
+
+        if current_round is not None:
+            table.phase = current_round.phase
+            table.highest_bet = current_round.highest_bet
+            table.current_position = current_round.current_player_position
+            if with_cards:
+                table.board = TableAdapter._parse_cards(current_round.community_cards)
+
+        return table, players
+
+    @staticmethod
+    def save(table, game, current_round, players, reason=None):
+        """Tableの状態をモデルに反映して保存（変更のあったプレイヤーのみ一括更新）
+
+        チップとポットの変化はChipServiceで台帳に記録し、差分として加減算する。
+        """
+        from ..models import Game, Player
+        from ..services.chip_service import ChipService
+
+        seats = {seat.player_id: seat for seat in table.seats}
+        changed = []
+        chip_deltas = {}
+        for p in players:
+            seat = seats[p.id]
+            if seat.chips != p.chips:
+                chip_deltas[p] = seat.chips - p.chips
+            values = (seat.current_bet, seat.total_bet, seat.is_active, seat.is_folded, seat.has_acted)
+            current = (p.current_bet, p.total_bet, p.is_active, p.is_folded, p.has_acted_this_round)
+            if values != current:
+                p.current_bet, p.total_bet, p.is_active, p.is_folded, p.has_acted_this_round = values
+                changed.append(p)
+
+        if changed:
+            Player.objects.bulk_update(changed, TableAdapter.SEAT_FIELDS)
+
+        ChipService.apply(game, chip_deltas, reason, current_round)
+
+        if game.dealer_position != table.dealer_position:
+            game.dealer_position = table.dealer_position
+            Game.objects.filter(id=game.id).update(dealer_position=table.dealer_position)
+
+        if current_round is not None:
+            current_round.highest_bet = table.highest_bet
+            current_round.current_player_position = table.current_position
+            current_round.save()
+
+    @staticmethod
+    def _parse_cards(data):
+        """JSONのカードリストを整数カードのリストに変換"""
+        return [RANK_INDEX[card['rank']] * 4 + SUIT_INDEX[card['suit']] for card in json.loads(data)]
+
+    @staticmethod
+    def cards_to_models(cards):
+        """整数カードのリストをCardオブジェクトのリストに変換"""
+        return [FastHandEvaluator.int_to_card(card) for card in cards]
@@ -0,0 +1,106 @@
+"""
+ポジション計算ルール（ソート済みのポジション番号リストに対する純粋関数）
+"""
+
+
+class SeatPositions:
+    """ディーラー・ブラインド・手番順の計算"""
+
+    @staticmethod
+    def small_blind(positions, dealer_pos):
+        """スモールブラインドポジションを取得"""
+        if len(positions) < 2:
+            return None
+
+        if dealer_pos not in positions:
+            return positions[0]
+
+        dealer_index = positions.index(dealer_pos)
+
+        if len(positions) == 2:
+            # ヘッズアップ：ディーラーがSB
+            return dealer_pos
+        # 3人以上：ディーラーの次がSB
+        return positions[(dealer_index + 1) % len(positions)]
+
+    @staticmethod
+    def big_blind(positions, dealer_pos):
+        """ビッグブラインドポジションを取得"""
+        if len(positions) < 2:
+            return None
+
+        if dealer_pos not in positions:
+            return positions[1]
+
+        dealer_index = positions.index(dealer_pos)
+
+        if len(positions) == 2:
+            # ヘッズアップ：ディーラーでない方がBB
+            return positions[(dealer_index + 1) % len(positions)]
+        # 3人以上：ディーラーの2つ次がBB
+        return positions[(dealer_index + 2) % len(positions)]
+
+    @staticmethod
+    def next_player(active_positions, current_pos):
+        """次のプレイヤーポジションを取得（時計回り）"""
+        if not active_positions:
+            return None
+
+        for pos in active_positions:
+            if pos > current_pos:
+                return pos
+        # ラップアラウンド：最小の位置に戻る（テーブルを一周）
+        return active_positions[0]
+
+    @staticmethod
+    def preflop_first_player(active_positions, sb_position, bb_position):
+        """プリフロップで最初に行動するプレイヤー（UTG = BBの次、ヘッズアップはSB）"""
+        if not active_positions or bb_position is None:
+            return None
+
+        if len(active_positions) < 2:
+            return None
+
+        if len(active_positions) == 2:
+            # ヘッズアップ：SBから開始（SB = ディーラー）
+            if sb_position in active_positions:
+                return sb_position
+            # SBがフォールドしていればBBから
+            return bb_position if bb_position in active_positions else active_positions[0]
+
+        # 3人以上：UTG（BBの次のプレイヤー）から開始
+        if bb_position not in active_positions:
+            return active_positions[0]
+
+        bb_index = active_positions.index(bb_position)
+        return active_positions[(bb_index + 1) % len(active_positions)]
+
+    @staticmethod
+    def postflop_first_player(active_positions, dealer_pos):
+        """ポストフロップで最初に行動するプレイヤー（ディーラーの次から時計回り）
+
+        3人以上ではSBから、ヘッズアップではディーラー（SB）が最後になるのでBBから行動する。
+        """
+        if not active_positions:
+            return None
+
+        for pos in active_positions:
+            if pos > dealer_pos:
+                return pos
+        # ラップアラウンド：テーブル最小位置から開始
+        return active_positions[0]
+
+    @staticmethod
+    def next_dealer(positions, current_dealer):
+        """次のディーラーポジションを取得（チップがあるプレイヤーのポジションから）"""
+        if not positions:
+            return None
+
+        if current_dealer not in positions:
+            return positions[0]
+
+        for pos in positions:
+            if pos > current_dealer:
+                return pos
+        # ラップアラウンド：最小の位置に戻る（一周して戻る）
+        return positions[0]
@@ -0,0 +1,48 @@
+"""
+サイドポットの計算ルール（席ごとのハンド全体の投入額から組み立てる純粋関数）
+"""
+
+
+class SidePots:
+    """投入額からメインポット・サイドポットを組み立てる"""
+
+    @staticmethod
+    def build(seats, pot=None):
+        """[(金額, 獲得資格のある席のリスト)] をメインポットから順に返す
+
+        ハンドに残っている席の投入額ごとにポットを区切る。フォールドした席の投入額は
+        各ポットに入るが獲得資格はない。投入額でソートして1回走査するのでO(n log n)。
+        potを渡した場合、投入額の合計との差（投入額が記録されていない分）はメインポットに加える。
+        """
+        contributors = sorted((seat for seat in seats if seat.total_bet > 0), key=lambda seat: seat.total_bet)
+        in_hand = sorted((seat for seat in seats if seat.in_hand), key=lambda seat: seat.total_bet)
+        if not in_hand:
+            return []
+
+        levels = sorted({seat.total_bet for seat in in_hand if seat.total_bet > 0})
+        pots = []
+        index = 0
+        eligible_index = 0
+        previous = 0
+        for level_index, level in enumerate(levels):
+            last = level_index == len(levels) - 1
+            amount = 0
+            # このレベルまでで投入額が尽きる席（最後のポットは上回る分も含めて全員）
+            while index < len(contributors) and (last or contributors[index].total_bet <= level):
+                amount += contributors[index].total_bet - previous
+                index += 1
+            amount += (len(contributors) - index) * (level - previous)
+
+            while in_hand[eligible_index].total_bet < level:
+                eligible_index += 1
+            pots.append((amount, in_hand[eligible_index:]))
+            previous = level
+
+        if pot is not None:
+            unassigned = pot - sum(amount for amount, _ in pots)
+            if not pots:
+                pots.append((0, in_hand))
+            if unassigned:
+                pots[0] = (pots[0][0] + unassigned, pots[0][1])
+
+        return pots
@@ -0,0 +1,339 @@
+"""
+インメモリのテーブル状態マシン（Django ORMに依存しない）
+"""
+import random
+
+from ..utils.fast_evaluator import FastHandEvaluator, FULL_DECK
+from .positions import SeatPositions
+from .pots import SidePots
+
+
+class Seat:
+    """テーブルの1席（Playerモデルに対応）"""
+
+    __slots__ = (
+        'player_id', 'position', 'chips', 'current_bet', 'total_bet', 'hand',
+        'is_active', 'is_folded', 'has_acted', 'is_ai',
+    )
+
+    def __init__(self, position, chips, player_id=None, is_ai=False, current_bet=0, total_bet=0,
+                 hand=None, is_active=True, is_folded=False, has_acted=False):
+        self.player_id = player_id
+        self.position = position
+        self.chips = chips
+        self.current_bet = current_bet
+        self.total_bet = total_bet  # このハンドで投入した合計（ストリートをまたいで保持）
+        self.hand = hand  # 整数カードのリスト（未読み込みの場合はNone）
+        self.is_active = is_active
+        self.is_folded = is_folded
+        self.has_acted = has_acted
+        self.is_ai = is_ai
+
+    @property
+    def in_hand(self):
+        """ハンドに参加中（フォールドしていない）か"""
+        return self.is_active and not self.is_folded
+
+    def __repr__(self):
+        return f"Seat({self.position}, chips={self.chips}, bet={self.current_bet})"
+
+
+class Table:
+    """1テーブル分のハンド進行（ストリート・ベッティング・ショーダウン）"""
+
+    __slots__ = (
+        'seats', 'small_blind', 'big_blind', 'dealer_position', 'pot', 'phase',
+        'board', 'deck', 'highest_bet', 'current_position', 'rng', 'history',
+    )
+
+    BETTING_PHASES = ('preflop', 'flop', 'turn', 'river')
+    STREET_CARDS = {'preflop': 3, 'flop': 1, 'turn': 1}
+    NEXT_PHASE = {'preflop': 'flop', 'flop': 'turn', 'turn': 'river', 'river': 'showdown'}
+
+    def __init__(self, seats, small_blind=10, big_blind=20, dealer_position=0, rng=None):
+        self.seats = sorted(seats, key=lambda seat: seat.position)
+        self.small_blind = small_blind
+        self.big_blind = big_blind
+        self.dealer_position = dealer_position
+        self.pot = 0
+        self.phase = 'finished'
+        self.board = []
+        self.deck = []
+        self.highest_bet = 0
+        self.current_position = 0
+        self.rng = rng or random.Random()
+        self.history = []  # (position, phase, action, amount)
+
+    # ----- 参照 -----
+
+    def seat_at(self, position):
+        """ポジションの席を取得"""
+        for seat in self.seats:
+            if seat.position == position:
+                return seat
+        return None
+
+    def active_seats(self):
+        """ハンドに参加中の席（ポジション順）"""
+        return [seat for seat in self.seats if seat.is_active and not seat.is_folded]
+
+    def active_positions(self):
+        return [seat.position for seat in self.seats if seat.is_active and not seat.is_folded]
+
+    def blind_positions(self):
+        """ブラインド計算の対象ポジション（is_activeの席）"""
+        return [seat.position for seat in self.seats if seat.is_active]
+
+    def small_blind_position(self):
+        return SeatPositions.small_blind(self.blind_positions(), self.dealer_position)
+
+    def big_blind_position(self):
+        return SeatPositions.big_blind(self.blind_positions(), self.dealer_position)
+
+    def current_seat(self):
+        """現在の手番の席（ハンドに参加中の場合のみ）"""
+        seat = self.seat_at(self.current_position)
+        if seat is None or not seat.in_hand:
+            return None
+        return seat
+
+    def call_amount(self, seat):
+        """コールに必要な額"""
+        return max(0, self.highest_bet - seat.current_bet)
+
+    @property
+    def hand_over(self):
+        return self.phase in ('showdown', 'finished')
+
+    # ----- ハンドの開始 -----
+
+    def start_hand(self):
+        """新しいハンドを開始（プレイヤーのリセット、配札、ブラインド）"""
+        for seat in self.seats:
+            seat.total_bet = 0
+            if seat.chips > 0:
+                seat.is_active = True
+                seat.is_folded = False
+                seat.current_bet = 0
+                seat.has_acted = False
+            else:
+                seat.is_active = False
+
+        self.deck = list(FULL_DECK)
+        self.rng.shuffle(self.deck)
+        self.board = []
+        self.phase = 'preflop'
+        self.highest_bet = 0
+        self.history = []
+
+        for seat in self.seats:
+            if seat.is_active:
+                seat.hand = [self.deck.pop(), self.deck.pop()]
+
+        self.apply_blinds()
+
+        first_position = SeatPositions.preflop_first_player(
+            self.active_positions(), self.small_blind_position(), self.big_blind_position()
+        )
+        if first_position is not None:
+            self.current_position = first_position
+
+    def apply_blinds(self):
+        """ブラインドを適用"""
+        sb_position = self.small_blind_position()
+        bb_position = self.big_blind_position()
+
+        for position, blind in ((sb_position, self.small_blind), (bb_position, self.big_blind)):
+            if position is None:
+                continue
+            seat = self.seat_at(position)
+            if seat and seat.is_active and seat.chips > 0:
+                # ブラインドに足りない場合はオールイン（コール額はビッグブラインドのまま）
+                self._put_chips(seat, min(blind, seat.chips))
+                seat.has_acted = False  # プリフロップではまだアクション可能
+                if position == bb_position:
+                    self.highest_bet = blind
+
+    # ----- ベッティング -----
+
+    def apply_action(self, seat, action, amount=0):
+        """プレイヤーのアクションを適用"""
+        if action == 'fold':
+            seat.is_folded = True
+            seat.is_active = False
+
+        elif action == 'call':
+            call_amount = min(self.highest_bet - seat.current_bet, seat.chips)
+            self._put_chips(seat, call_amount)
+
+        elif action == 'raise':
+            # まず現在の最高ベットにコールしてから追加でレイズ
+            total_amount = min(self.highest_bet - seat.current_bet + amount, seat.chips)
+            self._put_chips(seat, total_amount)
+            self._update_highest_bet(seat)
+
+        elif action == 'check':
+            if seat.current_bet != self.highest_bet:
+                raise ValueError('Cannot check, must call or raise')
+
+        elif action == 'all_in':
+            self._put_chips(seat, seat.chips)
+            self._update_highest_bet(seat)
+
+        else:
+            raise ValueError(f'Unknown action: {action}')
+
+        seat.has_acted = True
+        self.history.append((seat.position, self.phase, action, amount))
+
+    def _put_chips(self, seat, amount):
+        seat.current_bet += amount
+        seat.total_bet += amount
+        seat.chips -= amount
+        self.pot += amount
+
+    def _update_highest_bet(self, seat):
+        """最高ベット額を更新し、他のプレイヤーの行動フラグをリセット"""
+        if seat.current_bet > self.highest_bet:
+            self.highest_bet = seat.current_bet
+            for other in self.seats:
+                if other is not seat and other.in_hand and other.current_bet < self.highest_bet:
+                    other.has_acted = False
+
+    def is_betting_round_complete(self):
+        """ベッティングラウンドが完了したか"""
+        active = self.active_seats()
+        if len(active) <= 1:
+            return True
+        if not all(seat.has_acted for seat in active):
+            return False
+        return all(seat.current_bet == self.highest_bet or seat.chips == 0 for seat in active)
+
+    def is_action_closed(self):
+        """これ以上ベットが起こり得ないか（2人以上が残り、チップが残っているのは1人以下）"""
+        active = self.active_seats()
+        return len(active) >= 2 and sum(1 for seat in active if seat.chips > 0) <= 1
+
+    def move_to_next_player(self):
+        """手番を次のプレイヤーに移す"""
+        next_position = SeatPositions.next_player(self.active_positions(), self.current_position)
+        if next_position is not None:
+            self.current_position = next_position
+        return next_position
+
+    def reset_betting_round(self):
+        """新しいストリート用にベッティングをリセット"""
+        for seat in self.active_seats():
+            seat.current_bet = 0
+            seat.has_acted = False
+
+        self.highest_bet = 0
+
+        if self.phase == 'preflop':
+            first_position = SeatPositions.preflop_first_player(
+                self.active_positions(), self.small_blind_position(), self.big_blind_position()
+            )
+        else:
+            first_position = SeatPositions.postflop_first_player(
+                self.active_positions(), self.dealer_position
+            )
+        self.current_position = first_position if first_position is not None else 0
+
+    # ----- ストリートとショーダウン -----
+
+    def deal_community(self, num_cards):
+        """バーンカードを1枚捨ててからコミュニティカードを配る"""
+        if self.deck:
+            self.deck.pop()
+        for _ in range(num_cards):
+            if self.deck:
+                self.board.append(self.deck.pop())
+
+    def advance_phase(self):
+        """次のストリートへ進める（必要に応じてショーダウン）。配当を返す"""
+        if len(self.active_seats()) <= 1 or self.phase == 'river':
+            self.phase = 'showdown'
+            return self.showdown()
+
+        self.deal_community(self.STREET_CARDS[self.phase])
+        self.phase = self.NEXT_PHASE[self.phase]
+        self.reset_betting_round()
+        return []
+
+    def run_out(self):
+        """残りのコミュニティカードを一度に配ってショーダウンする。配当を返す
+
+        ストリートごとに配る場合と同じ順でバーンカードを捨てるので、配られるカードは変わらない。
+        """
+        while self.phase in self.STREET_CARDS:
+            self.deal_community(self.STREET_CARDS[self.phase])
+            self.phase = self.NEXT_PHASE[self.phase]
+        self.phase = 'showdown'
+        return self.showdown()
+
+    def pots(self):
+        """メインポットとサイドポット [(金額, 獲得資格のある席)] を返す"""
+        return SidePots.build(self.seats, self.pot)
+
+    def showdown(self):
+        """ポットごとに勝者に分配し、[(seat, 獲得額)] を返す"""
+        active = self.active_seats()
+        if not active:
+            return []
+
+        if len(active) == 1:
+            scores = {active[0].position: 0}
+        else:
+            evaluate = FastHandEvaluator.evaluate
+            scores = {seat.position: evaluate(seat.hand + self.board) for seat in active}
+
+        won = {}
+        for amount, eligible in self.pots():
+            best = max(scores[seat.position] for seat in eligible)
+            winners = [seat for seat in eligible if scores[seat.position] == best]
+            share, remainder = divmod(amount, len(winners))
+            for i, seat in enumerate(sorted(winners, key=lambda seat: seat.position)):
+                won[seat] = won.get(seat, 0) + share + (1 if i < remainder else 0)
+
+        awards = []
+        for seat in active:
+            if seat in won:
+                seat.chips += won[seat]
+                awards.append((seat, won[seat]))
+
+        self.pot = 0
+        return awards
+
+    def finish_hand(self):
+        """ハンドを終了してディーラーを進める"""
+        self.phase = 'finished'
+        positions = [seat.position for seat in self.seats if seat.chips > 0]
+        next_dealer = SeatPositions.next_dealer(positions, self.dealer_position)
+        if next_dealer is not None:
+            self.dealer_position = next_dealer
+
+    # ----- シミュレーション用の一括進行 -----
+
+    def act(self, action, amount=0):
+        """現在の手番プレイヤーのアクションを適用し、次の手番まで進める"""
+        seat = self.current_seat()
+        if seat is None:
+            raise ValueError('No player to act')
+
+        self.apply_action(seat, action, amount)
+
+        if len(self.active_seats()) <= 1:
+            self.phase = 'showdown'
+            return self.showdown()
+
+        self.move_to_next_player()
+        awards = []
+        while not self.hand_over and self.is_betting_round_complete():
+            if self.is_action_closed():
+                # 全員（または1人を除く全員）がオールインなら残りのストリートをまとめて進める
+                return self.run_out()
+            awards = self.advance_phase()
+        return awards
+
+    def players_with_chips(self):
+        return [seat for seat in self.seats if seat.chips > 0]
@@ -0,0 +1,57 @@
+"""
+自己対戦から戦略テーブルを作成
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from poker.services.ai_strategies import STRATEGIES
+from poker.services.simulation_service import SimulationService
+
+
+class Command(BaseCommand):
+    help = 'AI戦略同士の自己対戦から、抽象化した状態ごとのアクションの期待値テーブルを作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hands', type=int, default=100000, help='プレイするハンド数')
+        parser.add_argument(
+            '--players', nargs='+', default=['heuristic', 'aiplayer', 'calling_station', 'random'],
+            help=f'席ごとの戦略名（{", ".join(sorted(STRATEGIES))}）'
+        )
+        parser.add_argument('--output', help='出力先（省略時はPOKER_STRATEGY_TABLE）')
+        parser.add_argument('--processes', type=int, default=1, help='並列プロセス数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--exploration', type=float, default=0.1, help='ランダムなアクションを選ぶ確率')
+        parser.add_argument('--chips', type=int, default=1000, help='各ハンド開始時のスタック')
+        parser.add_argument('--small-blind', type=int, default=10)
+        parser.add_argument('--big-blind', type=int, default=20)
+        parser.add_argument('--budget', type=float, default=0, help='AIの1判断あたりの時間（秒）')
+
+    def handle(self, *args, **options):
+        players = options['players']
+        if not 2 <= len(players) <= 8:
+            raise CommandError('プレイヤー数は2-8人である必要があります')
+        unknown = [name for name in players if name not in STRATEGIES]
+        if unknown:
+            raise CommandError(f'不明な戦略: {", ".join(unknown)}')
+
+        output = options['output'] or getattr(settings, 'POKER_STRATEGY_TABLE', '')
+        if not output:
+            raise CommandError('--output か POKER_STRATEGY_TABLE を指定してください')
+
+        result = SimulationService.build_strategy_table(
+            players,
+            options['hands'],
+            output,
+            seed=options['seed'],
+            processes=options['processes'],
+            exploration=options['exploration'],
+            starting_chips=options['chips'],
+            small_blind=options['small_blind'],
+            big_blind=options['big_blind'],
+            decision_budget=options['budget'],
+        )
+
+        self.stdout.write(
+            f"{result['hands']} hands, {result['decisions']} decisions, {result['states']} states "
+            f"in {result['elapsed']:.2f}s -> {output}"
+        )
@@ -0,0 +1,96 @@
+"""
+実際のビューを通した負荷試験
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from poker.services.load_test_service import LoadTestService
+
+
+class Command(BaseCommand):
+    help = (
+        'ユーザーとテーブルを作成し、start_gameとplayer_actionをテストクライアントで並列に実行して'
+        'スループット・レイテンシ・クエリ数を表示します'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tables', type=int, default=10, help='同時に進めるテーブル数')
+        parser.add_argument('--humans', type=int, default=1, help='1テーブルの人間プレイヤー数（ビュー経由で行動）')
+        parser.add_argument('--ais', type=int, default=3, help='1テーブルのAIプレイヤー数')
+        parser.add_argument('--hands', type=int, default=10, help='1テーブルでプレイするハンド数')
+        parser.add_argument('--workers', type=int, default=4, help='1プロセスあたりのクライアントスレッド数')
+        parser.add_argument('--processes', type=int, default=1, help='クライアントのプロセス数')
+        parser.add_argument('--duration', type=float, default=120, help='最大実行時間（秒）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--keep', action='store_true', help='作成したユーザーとゲームを削除しない')
+        parser.add_argument('--output', help='結果をJSONで保存するパス')
+        parser.add_argument(
+            '--baseline', help='比較する以前の結果（--outputで保存したJSON、例: SQLiteとPostgreSQLの比較）'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'比較する結果を読み込めません: {e}')
+
+        try:
+            result = LoadTestService.run(
+                options['tables'],
+                humans=options['humans'],
+                ais=options['ais'],
+                hands=options['hands'],
+                workers=options['workers'],
+                processes=options['processes'],
+                duration=options['duration'],
+                seed=options['seed'],
+                keep=options['keep'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(result, f, indent=2)
+
+        self.stdout.write(
+            f"{result['database']}: {result['tables']} tables x {result['workers']} workers x "
+            f"{result['processes']} processes (AI background: {result['ai_background']})"
+        )
+        self.stdout.write(
+            f"{result['hands']} hands, {result['actions']} actions, {result['requests']} requests "
+            f"in {result['elapsed']:.2f}s ({result['hands_per_second']:.1f} hands/s, "
+            f"{result['actions_per_second']:.1f} actions/s; setup {result['setup_elapsed']:.2f}s)"
+        )
+        self.write_views(result)
+
+        if baseline is not None:
+            self.stdout.write('')
+            self.stdout.write(f"vs {baseline['database']} ({options['baseline']}):")
+            self.stdout.write(
+                f"actions/s {baseline['actions_per_second']:.1f} -> {result['actions_per_second']:.1f}"
+            )
+            previous = {row['view']: row for row in baseline['views']}
+            self.stdout.write(f"{'view':<16} {'p95 ms':>19} {'queries/req':>17}")
+            for row in result['views']:
+                before = previous.get(row['view'])
+                if before is None:
+                    continue
+                self.stdout.write(
+                    f"{row['view']:<16} {before['p95_ms']:>8.1f} -> {row['p95_ms']:>7.1f} "
+                    f"{before['queries_per_request']:>7.1f} -> {row['queries_per_request']:>6.1f}"
+                )
+
+    def write_views(self, result):
+        self.stdout.write(
+            f"{'view':<16} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries/req':>11}"
+        )
+        for row in result['views']:
+            self.stdout.write(
+                f"{row['view']:<16} {row['requests']:>8} {row['errors']:>6} {row['p50_ms']:>8.1f} "
+                f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['queries_per_request']:>11.1f}"
+            )
@@ -0,0 +1,54 @@
+"""
+AI戦略同士の自己対戦シミュレーション
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from poker.services.ai_strategies import STRATEGIES
+from poker.services.simulation_service import SimulationService
+
+
+class Command(BaseCommand):
+    help = 'AI戦略同士でハンドを高速にシミュレーションし、勝率と信頼区間を表示します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hands', type=int, default=10000, help='プレイするハンド数')
+        parser.add_argument(
+            '--players', nargs='+', default=['heuristic', 'aiplayer'],
+            help=f'席ごとの戦略名（{", ".join(sorted(STRATEGIES))}）'
+        )
+        parser.add_argument('--processes', type=int, default=1, help='並列プロセス数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--chips', type=int, default=1000, help='各ハンド開始時のスタック')
+        parser.add_argument('--small-blind', type=int, default=10)
+        parser.add_argument('--big-blind', type=int, default=20)
+        parser.add_argument('--budget', type=float, default=0, help='AIの1判断あたりの時間（秒）')
+
+    def handle(self, *args, **options):
+        players = options['players']
+        if not 2 <= len(players) <= 8:
+            raise CommandError('プレイヤー数は2-8人である必要があります')
+        unknown = [name for name in players if name not in STRATEGIES]
+        if unknown:
+            raise CommandError(f'不明な戦略: {", ".join(unknown)}')
+
+        result = SimulationService.run(
+            players,
+            options['hands'],
+            seed=options['seed'],
+            processes=options['processes'],
+            starting_chips=options['chips'],
+            small_blind=options['small_blind'],
+            big_blind=options['big_blind'],
+            decision_budget=options['budget'],
+        )
+
+        self.stdout.write(
+            f"{result['hands']} hands, {result['actions']} actions in {result['elapsed']:.2f}s "
+            f"({result['hands_per_second']:.0f} hands/s)"
+        )
+        self.stdout.write(f"{'strategy':<16} {'seat-hands':>10} {'win%':>7} {'bb/100':>9} {'95% CI':>9}")
+        for row in result['strategies']:
+            self.stdout.write(
+                f"{row['strategy']:<16} {row['seat_hands']:>10} {row['win_rate'] * 100:>6.1f}% "
+                f"{row['bb_per_100']:>9.1f} ±{row['ci95_bb_per_100']:>8.1f}"
+            )
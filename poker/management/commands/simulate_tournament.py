@@ -0,0 +1,76 @@
+"""
+AI戦略同士のトーナメントを並列にシミュレーション
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from poker.models import Game
+from poker.services.ai_strategies import STRATEGIES
+from poker.services.simulation_service import SimulationService
+
+
+class Command(BaseCommand):
+    help = 'AI戦略同士で最後の1人になるまでのゲームを並列にシミュレーションし、順位を集計します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=200, help='プレイするゲーム数')
+        parser.add_argument(
+            '--players', nargs='+', default=['heuristic', 'aiplayer', 'calling_station', 'random'],
+            help=f'席ごとの戦略名（{", ".join(sorted(STRATEGIES))}）'
+        )
+        parser.add_argument('--processes', type=int, default=1, help='並列プロセス数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--chips', type=int, default=1000, help='開始スタック')
+        parser.add_argument('--game', type=int, help='ブラインドを引き継ぐ既存ゲームのID（省略時はモデルの既定値）')
+        parser.add_argument('--hands-per-level', type=int, default=10, help='ブラインドが上がるまでのハンド数')
+        parser.add_argument('--growth', type=float, default=1.5, help='レベルごとのブラインド倍率')
+        parser.add_argument('--max-hands', type=int, default=5000, help='1ゲームの最大ハンド数')
+        parser.add_argument('--budget', type=float, default=0, help='AIの1判断あたりの時間（秒）')
+        parser.add_argument('--stream', action='store_true', help='ゲームが終わるたびに結果を表示')
+
+    def handle(self, *args, **options):
+        players = options['players']
+        if not 2 <= len(players) <= 8:
+            raise CommandError('プレイヤー数は2-8人である必要があります')
+        unknown = [name for name in players if name not in STRATEGIES]
+        if unknown:
+            raise CommandError(f'不明な戦略: {", ".join(unknown)}')
+
+        if options['game']:
+            game = Game.objects.filter(id=options['game']).first()
+            if not game:
+                raise CommandError(f'ゲームが見つかりません: {options["game"]}')
+            small_blind, big_blind = game.small_blind, game.big_blind
+        else:
+            small_blind = Game._meta.get_field('small_blind').default
+            big_blind = Game._meta.get_field('big_blind').default
+
+        blind_levels = SimulationService.blind_schedule(small_blind, big_blind, growth=options['growth'])
+
+        on_result = None
+        if options['stream']:
+            def on_result(result):
+                self.stdout.write(f"seed {result['seed']}: {result['hands']} hands, {' > '.join(result['places'])}")
+
+        result = SimulationService.run_tournaments(
+            players,
+            options['games'],
+            seed=options['seed'],
+            processes=options['processes'],
+            on_result=on_result,
+            starting_chips=options['chips'],
+            blind_levels=blind_levels,
+            hands_per_level=options['hands_per_level'],
+            max_hands=options['max_hands'],
+            decision_budget=options['budget'],
+        )
+
+        self.stdout.write(
+            f"{result['games']} games, {result['hands']} hands in {result['elapsed']:.2f}s "
+            f"({result['games_per_second']:.1f} games/s)"
+        )
+        self.stdout.write(f"{'strategy':<16} {'entries':>8} {'win%':>7} {'95% CI':>8} {'avg place':>10}")
+        for row in result['strategies']:
+            self.stdout.write(
+                f"{row['strategy']:<16} {row['entries']:>8} {row['win_rate'] * 100:>6.1f}% "
+                f"±{row['ci95_win_rate'] * 100:>6.1f} {row['average_place']:>10.2f}"
+            )
@@ -0,0 +1,97 @@
+"""
+スタッフ向けのリクエスト単位のプロファイル
+"""
+import json
+import os
+import re
+import time
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+
+from .utils.log import get_logger
+from .utils.profiling import CallProfiler
+
+
+logger = get_logger(__name__)
+
+
+class RequestProfilerMiddleware:
+    """スタッフが ?profile=cprofile|sample（またはX-Profileヘッダ）を付けたリクエストをプロファイルする
+
+    プロファイルと要約はPOKER_PROFILE_DIRに保存し、レスポンスは上位の関数とSQLの要約（JSON）に置き換える。
+    それ以外のリクエストはそのまま次に渡す。
+
+    ASGIでは計測するリクエストだけを専用スレッドで処理し、ビューのコルーチンはそのリクエスト専用の
+    イベントループで実行する。同期処理（ORMやサービス層）は専用スレッド、コルーチンはループのスレッドで
+    計測されるので、他のリクエストの処理は混ざらない。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    PARAM = 'profile'
+    HEADER = 'X-Profile'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        mode = self._requested_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+        return self._profile(request, mode)
+
+    async def __acall__(self, request):
+        mode = self._requested_mode(request)
+        if mode is not None and (await request.auser()).is_staff:
+            return await sync_to_async(self._profile, thread_sensitive=False)(request, mode)
+        return await self.get_response(request)
+
+    def _requested_mode(self, request):
+        value = request.GET.get(self.PARAM) or request.headers.get(self.HEADER)
+        if not value:
+            return None
+        return 'cprofile' if value in ('1', 'true') else value
+
+    def _profile(self, request, mode):
+        try:
+            profiler = CallProfiler(mode, getattr(settings, 'POKER_PROFILE_SAMPLE_INTERVAL', 0.001))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if self.async_mode:
+            # コルーチンは新しいイベントループ（別スレッド）で実行し、そのスレッドも計測する。
+            # thread_sensitiveな同期処理はこのスレッドに戻ってくる
+            get_response = async_to_sync(profiler.profile_coroutine(self.get_response), force_new_loop=True)
+        else:
+            get_response = self.get_response
+        response = profiler.run(get_response, request)
+
+        directory = getattr(settings, 'POKER_PROFILE_DIR', '')
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        base = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{slug}-{os.getpid()}-{id(request):x}")
+
+        summary = {
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'profile_file': profiler.save(base),
+        }
+        summary.update(profiler.summary())
+        with open(f'{base}.json', 'w') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        logger.info(
+            'request_profiled', path=request.path, mode=mode, user_id=request.user.id,
+            elapsed_ms=summary['elapsed_ms'], queries=summary['sql']['queries'], profile_file=summary['profile_file'],
+        )
+        return JsonResponse(summary, json_dumps_params={'ensure_ascii': False})
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0005_game_big_blind_game_small_blind'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpponentStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hands', models.IntegerField(default=0)),
+                ('vpip_hands', models.IntegerField(default=0)),
+                ('pfr_hands', models.IntegerField(default=0)),
+                ('three_bet_chances', models.IntegerField(default=0)),
+                ('three_bets', models.IntegerField(default=0)),
+                ('aggressive_actions', models.IntegerField(default=0)),
+                ('passive_actions', models.IntegerField(default=0)),
+                ('fold_to_bet_chances', models.IntegerField(default=0)),
+                ('folds_to_bet', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='opponent_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
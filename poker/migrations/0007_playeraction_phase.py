@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0006_opponentstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playeraction',
+            name='phase',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
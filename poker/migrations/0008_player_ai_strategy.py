@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0007_playeraction_phase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='ai_strategy',
+            field=models.CharField(blank=True, default='', max_length=30),
+        ),
+    ]
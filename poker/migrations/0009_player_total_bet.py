@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0008_player_ai_strategy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='player',
+            name='total_bet',
+            field=models.IntegerField(default=0),
+        ),
+    ]
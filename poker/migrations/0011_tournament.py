@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0010_chiptransfer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tournament',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting for Players'), ('in_progress', 'In Progress'), ('finished', 'Finished')], default='waiting', max_length=20)),
+                ('starting_chips', models.IntegerField(default=1000)),
+                ('table_size', models.IntegerField(default=8)),
+                ('small_blind', models.IntegerField(default=10)),
+                ('big_blind', models.IntegerField(default=20)),
+                ('blind_growth', models.FloatField(default=1.5)),
+                ('level_duration', models.IntegerField(default=600)),
+                ('level', models.IntegerField(default=0)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_tournaments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='tournament',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tables', to='poker.tournament'),
+        ),
+        migrations.CreateModel(
+            name='TournamentEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_ai', models.BooleanField(default=False)),
+                ('ai_strategy', models.CharField(blank=True, default='', max_length=30)),
+                ('finish_position', models.IntegerField(blank=True, null=True)),
+                ('eliminated_at', models.DateTimeField(blank=True, null=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='poker.tournament')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('tournament', 'user')},
+            },
+        ),
+    ]
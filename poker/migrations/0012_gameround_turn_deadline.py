@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0011_tournament'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='turn_deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
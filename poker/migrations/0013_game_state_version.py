@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0012_gameround_turn_deadline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='state_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0013_game_state_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='revealed_cards',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
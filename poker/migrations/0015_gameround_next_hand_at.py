@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('poker', '0014_gameround_revealed_cards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameround',
+            name='next_hand_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -2,6 +2,10 @@ from django.db import models
 from django.contrib.auth.models import User
 import random
 import json
+import time
+from .utils.log import get_logger
+
+logger = get_logger(__name__)
 
 class Card:
     """単一のカードを表すクラス"""
@@ -109,6 +113,29 @@ class PokerHand:
                 return False
         return True
 
+class Tournament(models.Model):
+    """複数のテーブル（Game）で行うトーナメント"""
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting for Players'),
+        ('in_progress', 'In Progress'),
+        ('finished', 'Finished'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='created_tournaments', null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    starting_chips = models.IntegerField(default=1000)
+    table_size = models.IntegerField(default=8)  # 1テーブルの最大人数
+    small_blind = models.IntegerField(default=10)  # レベル0のスモールブラインド
+    big_blind = models.IntegerField(default=20)  # レベル0のビッグブラインド
+    blind_growth = models.FloatField(default=1.5)  # レベルごとのブラインドの倍率
+    level_duration = models.IntegerField(default=600)  # 1レベルの長さ（秒）
+    level = models.IntegerField(default=0)  # 現在のブラインドレベル
+    
+    def __str__(self):
+        return f"Tournament: {self.name} ({self.status})"
+
 class Game(models.Model):
     """ポーカーゲームを表すモデル"""
     STATUS_CHOICES = [
@@ -128,6 +155,8 @@ class Game(models.Model):
     dealer_position = models.IntegerField(default=0)  # ディーラーの位置
     small_blind = models.IntegerField(default=10)  # スモールブラインド額
     big_blind = models.IntegerField(default=20)  # ビッグブラインド額
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='tables', null=True, blank=True)
+    state_version = models.PositiveIntegerField(default=0)  # 状態が変わるたびに進めるバージョン（ロングポーリング用、全プロセス共通）
     
     def get_deck_cards(self):
         """デッキの状態を取得"""
@@ -185,10 +214,12 @@ class Player(models.Model):
     position = models.IntegerField()  # テーブルでの位置
     is_active = models.BooleanField(default=True)
     current_bet = models.IntegerField(default=0)
+    total_bet = models.IntegerField(default=0)  # このハンドで投入したチップの合計（サイドポット用）
     hand_cards = models.TextField(default='[]')  # JSON形式でカードを保存
     is_ai = models.BooleanField(default=False)  # AIプレイヤーかどうか
     has_acted_this_round = models.BooleanField(default=False)  # このラウンドで行動したか
     is_folded = models.BooleanField(default=False)  # フォールドしたかどうか
+    ai_strategy = models.CharField(max_length=30, blank=True, default='')  # AIの戦略名（空の場合は既定の戦略）
     
     class Meta:
         unique_together = ('user', 'game')
@@ -211,6 +242,7 @@ class Player(models.Model):
         else:
             self.is_active = False
         self.current_bet = 0
+        self.total_bet = 0
         self.has_acted_this_round = False
         self.hand_cards = '[]'
     
@@ -235,12 +267,20 @@ class GameRound(models.Model):
     current_player_position = models.IntegerField(default=0)  # 現在行動するプレイヤーの位置
     highest_bet = models.IntegerField(default=0)  # このラウンドの最高ベット額
     is_betting_complete = models.BooleanField(default=False)  # ベッティングが完了したか
+    turn_deadline = models.DateTimeField(null=True, blank=True)  # 現在の手番の期限（人間は持ち時間、AIは処理を依頼した時刻。手番ごとのトークンを兼ねる）
+    revealed_cards = models.IntegerField(null=True, blank=True)  # ランアウト中にUIに見せるコミュニティカードの枚数（Noneは全て）
+    next_hand_at = models.DateTimeField(null=True, blank=True)  # ショーダウン後に次のハンドを始める予定時刻
     
     def get_community_cards(self):
         """コミュニティカードをCardオブジェクトのリストとして取得"""
         cards_data = json.loads(self.community_cards)
         return [Card(card['suit'], card['rank']) for card in cards_data]
     
+    def get_visible_community_cards(self):
+        """UIに見せるコミュニティカード（オールインのランアウト中はまだ見せていないカードを除く）"""
+        cards = self.get_community_cards()
+        return cards if self.revealed_cards is None else cards[:self.revealed_cards]
+    
     def set_community_cards(self, cards):
         """コミュニティカードをセット"""
         cards_data = [card.to_dict() for card in cards]
@@ -289,11 +329,90 @@ class PlayerAction(models.Model):
     game_round = models.ForeignKey(GameRound, on_delete=models.CASCADE)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
     amount = models.IntegerField(default=0)  # レイズやベットの金額
+    phase = models.CharField(max_length=20, blank=True, default='')  # アクション時のフェーズ
     timestamp = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return f"{self.player.user.username} - {self.action} ({self.amount})"
 
+class TournamentEntry(models.Model):
+    """トーナメントへの参加と順位"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    is_ai = models.BooleanField(default=False)
+    ai_strategy = models.CharField(max_length=30, blank=True, default='')
+    finish_position = models.IntegerField(null=True, blank=True)  # 順位（残っている間はNone）
+    eliminated_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('tournament', 'user')
+    
+    def __str__(self):
+        return f"{self.user.username} in {self.tournament.name}"
+
+class ChipTransfer(models.Model):
+    """チップの移動を記録する台帳（追記のみ、プレイヤーとポットの間の移動）"""
+    REASON_CHOICES = [
+        ('blind', 'Blind'),
+        ('bet', 'Bet'),
+        ('award', 'Award'),
+        ('penalty', 'Penalty'),
+    ]
+    
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='chip_transfers')
+    game_round = models.ForeignKey(GameRound, on_delete=models.SET_NULL, null=True, blank=True)
+    player = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)  # 退出後も誰の移動か分かるように保持
+    amount = models.IntegerField()  # プレイヤーのチップの増減（負の値はポットへの移動）
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.game_id}: {self.user_id} {self.amount:+d} ({self.reason})"
+
+class OpponentStats(models.Model):
+    """ユーザーごとのプレイ傾向の集計（アクションの記録時に加算していく）"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='opponent_stats')
+    hands = models.IntegerField(default=0)  # 配られたハンド数
+    vpip_hands = models.IntegerField(default=0)  # プリフロップで自発的にチップを入れたハンド数
+    pfr_hands = models.IntegerField(default=0)  # プリフロップでレイズしたハンド数
+    three_bet_chances = models.IntegerField(default=0)  # プリフロップで1回のレイズに直面した回数
+    three_bets = models.IntegerField(default=0)  # そこでリレイズした回数
+    aggressive_actions = models.IntegerField(default=0)  # フロップ以降のベット・レイズ
+    passive_actions = models.IntegerField(default=0)  # フロップ以降のコール
+    fold_to_bet_chances = models.IntegerField(default=0)  # フロップ以降にベットに直面した回数
+    folds_to_bet = models.IntegerField(default=0)  # そこでフォールドした回数
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    COUNTER_FIELDS = (
+        'hands', 'vpip_hands', 'pfr_hands', 'three_bet_chances', 'three_bets',
+        'aggressive_actions', 'passive_actions', 'fold_to_bet_chances', 'folds_to_bet',
+    )
+    
+    @property
+    def vpip(self):
+        return self.vpip_hands / self.hands if self.hands else 0
+    
+    @property
+    def pfr(self):
+        return self.pfr_hands / self.hands if self.hands else 0
+    
+    @property
+    def three_bet(self):
+        return self.three_bets / self.three_bet_chances if self.three_bet_chances else 0
+    
+    @property
+    def aggression_factor(self):
+        """(ベット + レイズ) / コール"""
+        return self.aggressive_actions / max(1, self.passive_actions)
+    
+    @property
+    def fold_to_bet(self):
+        return self.folds_to_bet / self.fold_to_bet_chances if self.fold_to_bet_chances else 0
+    
+    def __str__(self):
+        return f"{self.user.username}: VPIP {self.vpip:.0%} PFR {self.pfr:.0%} AF {self.aggression_factor:.1f}"
+
 class AIPlayer:
     """AIプレイヤーの思考ロジック"""
     
@@ -303,6 +422,16 @@ class AIPlayer:
         self.community_cards = community_cards
         self.hand_cards = player.get_hand_cards()
     
+    @classmethod
+    def for_cards(cls, hand_cards, community_cards):
+        """カードだけから評価用のインスタンスを作成（DBを使わないシミュレーション用）"""
+        ai = cls.__new__(cls)
+        ai.player = None
+        ai.game_round = None
+        ai.community_cards = community_cards
+        ai.hand_cards = hand_cards
+        return ai
+    
     def evaluate_hand_strength(self):
         """ハンドの強さを0-10で評価"""
         all_cards = self.hand_cards + self.community_cards
@@ -315,15 +444,17 @@ class AIPlayer:
             return self._evaluate_preflop()
         
         # ベストハンドを評価
-        if len(all_cards) >= 5:
-            from itertools import combinations
-            best_rank = 0
-            for combo in combinations(all_cards, 5):
-                hand = PokerHand(list(combo))
-                best_rank = max(best_rank, hand.hand_rank)
-            return best_rank
+        from .utils.fast_evaluator import FastHandEvaluator
+        hole = FastHandEvaluator.cards_to_ints(self.hand_cards)
+        board = FastHandEvaluator.cards_to_ints(self.community_cards)
+        hand_rank = FastHandEvaluator.hand_rank(hole + board)
+        
+        # フロップ・ターンではストレート以上のドローも考慮
+        if len(hole) == 2 and len(board) in (3, 4):
+            from .utils.outs import OutsCalculator
+            return max(hand_rank, round(OutsCalculator.draw_probability(hole, board) * 10))
         
-        return self._evaluate_partial_hand(all_cards)
+        return hand_rank
     
     def _evaluate_preflop(self):
         """プリフロップでの手札評価"""
@@ -363,103 +494,23 @@ class AIPlayer:
         
         return 2
     
-    def _evaluate_partial_hand(self, cards):
-        """部分的なハンド（フロップ、ターン）の評価"""
-        values = [card.value for card in cards]
-        suits = [card.suit for card in cards]
-        
-        value_counts = {}
-        for value in values:
-            value_counts[value] = value_counts.get(value, 0) + 1
-        
-        counts = sorted(value_counts.values(), reverse=True)
-        
-        # ペア以上
-        if counts[0] >= 2:
-            if counts[0] == 3:  # スリーカード
-                return 7
-            elif len(counts) >= 2 and counts[1] >= 2:  # ツーペア
-                return 5
-            else:  # ワンペア
-                return 3
-        
-        # フラッシュドロー
-        suit_counts = {}
-        for suit in suits:
-            suit_counts[suit] = suit_counts.get(suit, 0) + 1
-        
-        if max(suit_counts.values()) >= 4:
-            return 4
-        
-        return 2
-    
-    def decide_action(self):
-        """AIの行動を決定"""
+    def decide_action(self, deadline=None):
+        """AIの行動をプレイヤーの戦略で決定（deadlineまでに得られた最良の評価で判断）"""
         try:
-            hand_strength = self.evaluate_hand_strength()
-            pot_size = self.game_round.game.pot
+            from .engine.orm_adapter import TableAdapter
+            from .services.ai_service import AIService
+            from .services.ai_strategies import DEFAULT_STRATEGY, STRATEGIES, get_strategy
             
-            # ランダム性を加える
-            import random
-            randomness = random.uniform(0.8, 1.2)
-            adjusted_strength = hand_strength * randomness
-            
-            # 現在のベット額を確認
-            active_players = Player.objects.filter(
-                game=self.game_round.game, 
-                is_active=True, 
-                is_folded=False
-            )
-            
-            if not active_players:
+            table, _ = TableAdapter.load(self.game_round.game, self.game_round, with_cards=True)
+            seat = table.seat_at(self.player.position)
+            if seat is None or not table.active_seats():
                 return ('fold', 0)
             
-            max_bet = max([p.current_bet for p in active_players])
-            call_amount = max_bet - self.player.current_bet
-            
-            # チップが足りない場合
-            if call_amount >= self.player.chips:
-                if adjusted_strength >= 6:  # 強いハンドなら オールイン
-                    return ('all_in', self.player.chips)
-                else:
-                    return ('fold', 0)
-            
-            # 行動決定ロジック
-            if adjusted_strength >= 7:  # 強いハンド
-                if call_amount > 0:
-                    # レイズするかコールするか
-                    if random.random() < 0.7 and self.player.chips > call_amount:
-                        raise_amount = min(pot_size // 2, self.player.chips - call_amount)
-                        return ('raise', max(self.game_round.game.big_blind, raise_amount))
-                    else:
-                        return ('call', call_amount)
-                else:
-                    # ベットするかチェックするか
-                    if random.random() < 0.8:
-                        bet_amount = min(pot_size // 3, self.player.chips)
-                        return ('raise', max(self.game_round.game.big_blind, bet_amount))
-                    else:
-                        return ('check', 0)
-            
-            elif adjusted_strength >= 4:  # 中程度のハンド
-                if call_amount > 0:
-                    if call_amount <= pot_size // 4 or call_amount <= self.game_round.game.big_blind * 2:  # ポットオッズが良い
-                        return ('call', call_amount)
-                    else:
-                        return ('fold', 0)
-                else:
-                    return ('check', 0)
-            
-            else:  # 弱いハンド
-                if call_amount > 0:
-                    # ブラフの可能性
-                    if random.random() < 0.1 and call_amount <= self.game_round.game.big_blind:
-                        return ('call', call_amount)
-                    else:
-                        return ('fold', 0)
-                else:
-                    return ('check', 0)
-                    
-        except Exception as e:
-            print(f"AI決定エラー: {e}")
+            budget = max(0, deadline - time.monotonic()) if deadline is not None else 0
+            name = self.player.ai_strategy if self.player.ai_strategy in STRATEGIES else DEFAULT_STRATEGY
+            strategy = get_strategy(name, budget)
+            action, amount = strategy.decide(strategy.features(table, seat), random)
+            return AIService.fit_action_to_stack(action, amount, table.call_amount(seat), seat.chips)
+        except Exception:
+            logger.exception('ai_decision_error', player_id=self.player.id)
             return ('fold', 0)
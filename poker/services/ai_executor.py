@@ -0,0 +1,112 @@
+"""
+AIターン実行ワーカー
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from ..models import Game, GameRound
+from ..signals import game_state_changed
+from ..utils.log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class AITurnExecutor:
+    """AIプレイヤーの手番をリクエスト外のスレッドプールで処理"""
+
+    _executor = None
+    _pid = None
+    _lock = threading.Lock()
+    _running = set()  # 処理中のゲームID
+    _pending = set()  # 処理中に再要求されたゲームID
+
+    @classmethod
+    def submit(cls, game_id):
+        """ゲームのAIターン処理をキューに登録（同じゲームは同時に1つだけ処理）"""
+        with cls._lock:
+            executor = cls._get_executor()
+            if game_id in cls._running:
+                # 処理中のワーカーに再実行させる
+                cls._pending.add(game_id)
+                return
+            cls._running.add(game_id)
+        executor.submit(cls._run, game_id)
+
+    @classmethod
+    def submit_task(cls, func, *args):
+        """テーブルの処理（持ち時間切れなど）をワーカースレッドで実行"""
+        with cls._lock:
+            executor = cls._get_executor()
+        executor.submit(cls._run_task, func, args)
+
+    @classmethod
+    def pending_count(cls):
+        """処理中・処理待ちのゲーム数を取得"""
+        with cls._lock:
+            return len(cls._running)
+
+    @classmethod
+    def _get_executor(cls):
+        """スレッドプールを取得（fork後のワーカープロセスでは作り直す）"""
+        if cls._executor is None or cls._pid != os.getpid():
+            cls._executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'POKER_AI_WORKERS', 2),
+                thread_name_prefix='poker-ai'
+            )
+            cls._pid = os.getpid()
+            cls._running = set()
+            cls._pending = set()
+        return cls._executor
+
+    @classmethod
+    def _run(cls, game_id):
+        """ワーカースレッドでゲームを次の人間プレイヤーの手番まで進める"""
+        close_old_connections()
+        try:
+            while True:
+                try:
+                    cls.drive(game_id)
+                except Exception:
+                    logger.exception('ai_worker_error', game_id=game_id)
+
+                with cls._lock:
+                    if game_id in cls._pending:
+                        cls._pending.discard(game_id)
+                        continue
+                    cls._running.discard(game_id)
+                    break
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _run_task(func, args):
+        close_old_connections()
+        try:
+            func(*args)
+        except Exception:
+            logger.exception('worker_task_error', task=func.__qualname__)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def drive(game_id):
+        """ゲームの行ロックを取ってAIの行動とフェーズ進行を処理し、状態変更を通知"""
+        from .game_service import GameService
+
+        with transaction.atomic():
+            # 複数プロセスから同じテーブルを同時に進めないよう行ロック
+            game = Game.objects.select_for_update().filter(id=game_id, status='in_progress').first()
+            if not game:
+                return
+
+            current_round = GameRound.objects.filter(game=game).last()
+            if not current_round or current_round.phase in ['showdown', 'finished']:
+                return
+
+            GameService.run_ai_turns(game, current_round)
+
+        game_state_changed.send(sender=Game, game_id=game_id)
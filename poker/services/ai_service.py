@@ -2,179 +2,288 @@
 AI関連サービス
 """
 import random
+import time
+from django.conf import settings
+from django.db import transaction
+from ..engine.orm_adapter import TableAdapter
 from ..models import Player, PlayerAction
-from ..services.card_service import HandEvaluator
-from ..services.betting_service import BettingService
-from ..utils.position_manager import PositionManager
+from ..services.icm_service import ICMService
+from ..services.opponent_stats_service import OpponentStatsService
+from ..services.range_tracker import RangeTracker
+from ..services.turn_clock import TurnClock
+from ..utils.log import get_logger
+from ..utils.metrics import metrics
+from ..utils.strategy_table import StrategyTable, load_strategy_table
+from ..utils.tracing import traced
+
+
+logger = get_logger(__name__)
 
 
 class AIService:
     """AI関連の操作を管理するサービス"""
     
     @staticmethod
+    def dispatch_ai_actions(game, current_round):
+        """AIプレイヤーの行動を依頼（バックグラウンド有効時はワーカーに登録して即座に戻る）"""
+        if getattr(settings, 'POKER_AI_BACKGROUND', False):
+            from .ai_executor import AITurnExecutor
+            game_id = game.id
+            # ワーカーのプロセスが止まっても再開できるよう、AIの手番なら依頼した時刻を保存
+            TurnClock.arm(game, current_round)
+            transaction.on_commit(lambda: AITurnExecutor.submit(game_id))
+        else:
+            AIService.process_ai_actions(game, current_round)
+    
+    @staticmethod
+    @traced('AIService.process_ai_actions')
     def process_ai_actions(game, current_round):
-        """AIプレイヤーの行動を処理"""
+        """連続するAIプレイヤーの行動をまとめて処理
+
+        テーブルを1回だけ読み込み、手番が回ってくるAIごとにそのプレイヤーの戦略で
+        順番にアクションを適用し、最後にまとめて保存する。相手のレンジの更新と、
+        続けて手番が回ってくるAIのエクイティの推定は1回だけ行う。
+        """
+        from .ai_strategies import DEFAULT_STRATEGY, get_strategy
+        
+        # 現在のラウンドを再読み込み（既に次のハンドが始まっている場合は何もしない）
+        current_round.refresh_from_db()
+        if current_round.phase in ('showdown', 'finished'):
+            return
+        
+        players = list(Player.objects.filter(game=game).select_related('user').order_by('position'))
+        table, players = TableAdapter.load(game, current_round, players=players, with_cards=True)
+        players_by_id = {p.id: p for p in players}
+        budget = getattr(settings, 'POKER_AI_DECISION_BUDGET', 0.05)
+        strategies = {}
+        ranges = None
+        equities = {}
+        icm = ICMService.tournament_context(game)
+        actions = []
+        stats_deltas = {}
+        preflop_raises, prior_actions = OpponentStatsService.round_context(current_round)
         max_iterations = 20  # 無限ループを防ぐ（増加）
-        iteration_count = 0
         
-        while iteration_count < max_iterations:
-            iteration_count += 1
-            
-            # 現在のラウンドを再読み込み
-            current_round.refresh_from_db()
-            
+        for _ in range(max_iterations):
             # ベッティングラウンドが完了している場合は終了
-            if BettingService.is_betting_round_complete(game, current_round):
+            if table.is_betting_round_complete():
                 break
             
-            # 現在のプレイヤーを取得
-            current_player = Player.objects.filter(
-                game=game, 
-                position=current_round.current_player_position,
-                is_active=True,
-                is_folded=False
-            ).first()
-            
-            if not current_player:
-                # プレイヤーが見つからない場合、次のプレイヤーに移動を試す
-                next_position = PositionManager.get_next_player_position(current_round)
-                if next_position is not None and next_position != current_round.current_player_position:
-                    current_round.current_player_position = next_position
-                    current_round.save()
-                    continue
-                else:
+            seat = table.current_seat()
+            if seat is None or seat.has_acted:
+                # 手番のプレイヤーがいない・行動済みの場合、次のプレイヤーに移動を試す
+                previous_position = table.current_position
+                next_position = table.move_to_next_player()
+                if next_position is None or next_position == previous_position:
                     break
-                
-            if not current_player.is_ai:
+                continue
+            
+            if not seat.is_ai:
                 break  # AIプレイヤーでない場合は終了
-                
-            if current_player.has_acted_this_round:
-                # すでに行動済みの場合、次のプレイヤーに移動
-                next_position = PositionManager.get_next_player_position(current_round)
-                if next_position is not None and next_position != current_round.current_player_position:
-                    current_round.current_player_position = next_position
-                    current_round.save()
-                    continue
-                else:
-                    break  # 全員が行動済み
             
-            # AIの行動を実行
-            print(f"AI Player at position {current_player.position} is taking action...")
-            AIService._execute_ai_action(current_player, game, current_round)
+            player = players_by_id[seat.player_id]
+            call_amount = table.call_amount(seat)
+            highest_bet = table.highest_bet
+            if seat.chips <= 0:
+                # オールイン済みのプレイヤーは行動できない
+                action, amount = ('check', 0) if call_amount == 0 else ('call', 0)
+            else:
+                name = player.ai_strategy or DEFAULT_STRATEGY
+                if name not in strategies:
+                    try:
+                        strategies[name] = get_strategy(name, budget)
+                    except ValueError:
+                        logger.warning('unknown_strategy', game_id=game.id, player_id=player.id, strategy=name)
+                        strategies[name] = get_strategy(DEFAULT_STRATEGY, budget)
+                strategy = strategies[name]
+                if ranges is None and budget > 0:
+                    ranges = RangeTracker.ranges(current_round)
+                    equities = AIService.batch_equities(table, ranges, budget)
+                started = time.perf_counter()
+                opponents = [other for other in table.active_seats() if other is not seat]
+                batched = equities.get(seat.position)
+                features = strategy.features(
+                    table, seat, ranges=ranges,
+                    opponent_profile=OpponentStatsService.profile(
+                        [players_by_id[other.player_id].user_id for other in opponents]
+                    ),
+                    icm=icm,
+                    # 推定後にフォールドがあって相手が変わった場合は個別に推定し直す
+                    equity=batched[1] if batched and batched[0] == [other.player_id for other in opponents] else None
+                )
+                action, amount = strategy.decide(features, random)
+                metrics.observe('ai_decision_seconds', time.perf_counter() - started, strategy=strategy.name)
+                metrics.inc('ai_decisions', strategy=strategy.name)
+                # チップが足りない場合の調整
+                action, amount = AIService.fit_action_to_stack(action, amount, call_amount, seat.chips)
+            try:
+                table.apply_action(seat, action, amount)
+            except ValueError as e:
+                # 不正なアクションはフォールドとして扱う
+                logger.warning('invalid_ai_action', game_id=game.id, player_id=player.id, action=action, error=str(e))
+                action, amount = 'fold', 0
+                table.apply_action(seat, action, amount)
+            
+            metrics.inc('actions', action=action, actor='ai')
+            logger.debug_sampled(
+                'ai_action', game_id=game.id, player_id=player.id, position=seat.position, action=action, amount=amount
+            )
+            actions.append(PlayerAction(
+                player=player, game_round=current_round, action=action, amount=amount, phase=table.phase
+            ))
+            
+            # 対戦相手の傾向の差分を集める（保存時にまとめて加算）
+            raised = table.highest_bet > highest_bet
+            deltas = stats_deltas.setdefault(player.user_id, {})
+            for field, count in OpponentStatsService.action_deltas(
+                table.phase, action, call_amount, raised, preflop_raises, prior_actions.get(player.id, ())
+            ).items():
+                deltas[field] = deltas.get(field, 0) + count
+            prior_actions.setdefault(player.id, []).append(action)
+            if raised and table.phase == 'preflop':
+                preflop_raises += 1
             
             # 次のプレイヤーに移動
-            AIService._move_to_next_player(current_round)
+            table.move_to_next_player()
+        
+        if actions:
+            PlayerAction.objects.bulk_create(actions)
+            OpponentStatsService.record(stats_deltas)
+        if actions or table.current_position != current_round.current_player_position:
+            TableAdapter.save(table, game, current_round, players)
+        
+        # 人間プレイヤーの手番になった場合は持ち時間を開始
+        TurnClock.arm(game, current_round)
     
     @staticmethod
-    def _execute_ai_action(ai_player, game, current_round):
-        """AIプレイヤーの具体的なアクションを実行"""
-        try:
-            # チップが0の場合はフォールド
-            if ai_player.chips <= 0:
-                BettingService.process_player_action(ai_player, game, current_round, 'fold', 0)
-                return
-            
-            # AIの行動を決定
-            community_cards = current_round.get_community_cards()
-            action, amount = AIService._decide_ai_action(ai_player, current_round, community_cards)
-            
-            # チップが足りない場合の調整
-            if action == 'call':
-                call_amount = current_round.highest_bet - ai_player.current_bet
-                amount = min(call_amount, ai_player.chips)
-                
-            elif action == 'raise':
-                call_amount = current_round.highest_bet - ai_player.current_bet
-                total_amount = call_amount + amount
-                if total_amount > ai_player.chips:
-                    amount = ai_player.chips
-                    action = 'all_in' if amount > 0 else 'fold'
-            
-            # アクションを処理
-            print(f"AI Player {ai_player.user.username} at position {ai_player.position} chose: {action} ({amount})")
-            BettingService.process_player_action(ai_player, game, current_round, action, amount)
-            
-        except Exception as e:
-            # エラーが発生した場合はフォールド
-            print(f"AIエラー: {e}")
-            BettingService.process_player_action(ai_player, game, current_round, 'fold', 0)
+    def batch_equities(table, ranges, budget):
+        """続けて手番が回ってくるAIのエクイティを同じサンプルでまとめて推定
+
+        {position: (相手のplayer_idのリスト, エクイティ)} を返す。判断時間は席の数の分だけ使う。
+        """
+        seats = AIService.pending_ai_seats(table)
+        if not seats:
+            return {}
+        active = table.active_seats()
+        results = RangeTracker.equities_against(
+            [(seat.player_id, seat.hand) for seat in seats], table.board,
+            [(other.player_id, ranges.get(other.player_id)) for other in active],
+            deadline=time.monotonic() + budget * len(seats)
+        )
+        return {
+            seat.position: ([other.player_id for other in active if other is not seat], equity)
+            for seat, (equity, samples) in zip(seats, results) if samples
+        }
     
     @staticmethod
-    def _move_to_next_player(current_round):
-        """次のプレイヤーに移動"""
-        next_position = PositionManager.get_next_player_position(current_round)
-        if next_position is not None:
-            current_round.current_player_position = next_position
-            current_round.save()
+    def pending_ai_seats(table):
+        """現在の手番から続けて行動するAIの席（行動が必要な人間の手番の前まで、チップのない席は除く）"""
+        active = table.active_seats()
+        start = next((i for i, seat in enumerate(active) if seat.position >= table.current_position), 0)
+        seats = []
+        for seat in active[start:] + active[:start]:
+            if seat.chips <= 0:
+                continue
+            if not seat.is_ai:
+                if not seat.has_acted or seat.current_bet < table.highest_bet:
+                    break
+                continue
+            seats.append(seat)
+        return seats
     
     @staticmethod
-    def _decide_ai_action(ai_player, game_round, community_cards):
-        """AIの行動を決定"""
-        try:
-            player_cards = ai_player.get_hand_cards()
-            hand_strength = HandEvaluator.evaluate_hand_strength(player_cards, community_cards)
-            pot_size = game_round.game.pot
-            
-            # ランダム性を加える
-            randomness = random.uniform(0.8, 1.2)
-            adjusted_strength = hand_strength * randomness
-            
-            # 現在のベット額を確認
-            active_players = Player.objects.filter(
-                game=game_round.game, 
-                is_active=True, 
-                is_folded=False
+    def decide(hand_strength, call_amount, chips, pot_size, big_blind, phase, position_bucket, highest_bet,
+               rng=random, strategy_table=None):
+        """戦略テーブルがあればテーブルを引き、該当する状態がなければchoose_actionで判断"""
+        strategy_table = strategy_table or load_strategy_table(getattr(settings, 'POKER_STRATEGY_TABLE', ''))
+        if strategy_table is not None:
+            key = StrategyTable.state_key(
+                phase, position_bucket, hand_strength, call_amount, pot_size, highest_bet, big_blind
             )
-            
-            if not active_players:
+            best = strategy_table.best_action(key) if key else None
+            if best:
+                return AIService.table_action(best, call_amount, chips, pot_size, big_blind)
+        return AIService.choose_action(hand_strength, call_amount, chips, pot_size, big_blind, rng)
+    
+    @staticmethod
+    def table_action(best, call_amount, chips, pot_size, big_blind):
+        """戦略テーブルの抽象アクションを具体的なアクションに変換"""
+        if best == 'raise':
+            if call_amount >= chips:
+                return ('all_in', chips)
+            raise_amount = min(pot_size // 2, chips - call_amount)
+            return ('raise', max(big_blind, raise_amount))
+        if call_amount == 0:
+            return ('check', 0)
+        if best == 'call':
+            return ('call', call_amount)
+        return ('fold', 0)
+    
+    @staticmethod
+    def abstract_action(action):
+        """具体的なアクションを戦略テーブルの抽象アクションに変換"""
+        if action in ('raise', 'all_in'):
+            return 'raise'
+        if action in ('check', 'call'):
+            return 'call'
+        return 'fold'
+    
+    @staticmethod
+    def fit_action_to_stack(action, amount, call_amount, chips):
+        """チップが足りない場合にアクションを調整"""
+        if action == 'call':
+            amount = min(call_amount, chips)
+        elif action == 'raise' and call_amount + amount > chips:
+            amount = chips
+            action = 'all_in' if amount > 0 else 'fold'
+        return action, amount
+    
+    @staticmethod
+    def choose_action(hand_strength, call_amount, chips, pot_size, big_blind, rng=random):
+        """ハンド強度（1-10）とベット状況から行動を決定（DBに依存しない）"""
+        # ランダム性を加える
+        randomness = rng.uniform(0.8, 1.2)
+        adjusted_strength = hand_strength * randomness
+        
+        # チップが足りない場合
+        if call_amount >= chips:
+            if adjusted_strength >= 6:  # 強いハンドなら オールイン
+                return ('all_in', chips)
+            else:
                 return ('fold', 0)
-            
-            max_bet = max([p.current_bet for p in active_players])
-            call_amount = max_bet - ai_player.current_bet
-            
-            # チップが足りない場合
-            if call_amount >= ai_player.chips:
-                if adjusted_strength >= 6:  # 強いハンドなら オールイン
-                    return ('all_in', ai_player.chips)
-                else:
-                    return ('fold', 0)
-            
-            # 行動決定ロジック
-            if adjusted_strength >= 7:  # 強いハンド
-                if call_amount > 0:
-                    # レイズするかコールするか
-                    if random.random() < 0.7 and ai_player.chips > call_amount:
-                        raise_amount = min(pot_size // 2, ai_player.chips - call_amount)
-                        return ('raise', max(game_round.game.big_blind, raise_amount))
-                    else:
-                        return ('call', call_amount)
+        
+        # 行動決定ロジック
+        if adjusted_strength >= 7:  # 強いハンド
+            if call_amount > 0:
+                # レイズするかコールするか
+                if rng.random() < 0.7 and chips > call_amount:
+                    raise_amount = min(pot_size // 2, chips - call_amount)
+                    return ('raise', max(big_blind, raise_amount))
                 else:
-                    # ベットするかチェックするか
-                    if random.random() < 0.8:
-                        bet_amount = min(pot_size // 3, ai_player.chips)
-                        return ('raise', max(game_round.game.big_blind, bet_amount))
-                    else:
-                        return ('check', 0)
-            
-            elif adjusted_strength >= 4:  # 中程度のハンド
-                if call_amount > 0:
-                    if call_amount <= pot_size // 4 or call_amount <= game_round.game.big_blind * 2:  # ポットオッズが良い
-                        return ('call', call_amount)
-                    else:
-                        return ('fold', 0)
+                    return ('call', call_amount)
+            else:
+                # ベットするかチェックするか
+                if rng.random() < 0.8:
+                    bet_amount = min(pot_size // 3, chips)
+                    return ('raise', max(big_blind, bet_amount))
                 else:
                     return ('check', 0)
-            
-            else:  # 弱いハンド
-                if call_amount > 0:
-                    # ブラフの可能性
-                    if random.random() < 0.1 and call_amount <= game_round.game.big_blind:
-                        return ('call', call_amount)
-                    else:
-                        return ('fold', 0)
+        
+        elif adjusted_strength >= 4:  # 中程度のハンド
+            if call_amount > 0:
+                if call_amount <= pot_size // 4 or call_amount <= big_blind * 2:  # ポットオッズが良い
+                    return ('call', call_amount)
                 else:
-                    return ('check', 0)
-                    
-        except Exception as e:
-            print(f"AI決定エラー: {e}")
-            return ('fold', 0)
+                    return ('fold', 0)
+            else:
+                return ('check', 0)
+        
+        else:  # 弱いハンド
+            if call_amount > 0:
+                # ブラフの可能性
+                if rng.random() < 0.1 and call_amount <= big_blind:
+                    return ('call', call_amount)
+                else:
+                    return ('fold', 0)
+            else:
+                return ('check', 0)
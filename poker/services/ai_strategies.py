@@ -0,0 +1,265 @@
+"""
+AI戦略（engine.Table上で動作し、DBを使わない）
+
+各戦略は1回の判断ごとに作るDecisionFeaturesを受け取り、必要な特徴量だけを参照する。
+特徴量は最初に参照されたときに1回だけ計算されるので、戦略を増やしても
+評価やクエリは増えない。
+"""
+import time
+from functools import cached_property
+
+from django.conf import settings
+
+from ..models import AIPlayer
+from ..utils.fast_evaluator import FastHandEvaluator
+from ..utils.strategy_table import StrategyTable, load_strategy_table
+from .ai_service import AIService
+from .card_service import HandEvaluator
+from .equity_service import EquityService
+from .icm_service import ICMService
+from .opponent_stats_service import OpponentStatsService
+from .range_tracker import RangeTracker
+
+
+class DecisionFeatures:
+    """1回の判断で戦略が使う特徴量（参照されたものだけを1回計算してキャッシュする）
+
+    rangesを渡した場合は相手のレンジ（player_id -> 重み）に対するエクイティ、
+    渡さない場合はランダムな相手に対するエクイティを使う。
+    opponent_profileがあればハンド強度を相手の傾向で補正する。
+    icmはトーナメントのテーブルの (他のテーブルのスタック, 残りの順位の賞金)。
+    equityを渡した場合（連続するAIの手番でまとめて推定した値）はそれを使い、推定し直さない。
+    """
+
+    def __init__(self, table, seat, decision_budget=0, ranges=None, opponent_profile=None, icm=None, equity=None):
+        self.table = table
+        self.seat = seat
+        self.decision_budget = decision_budget
+        self.ranges = ranges
+        self.opponent_profile = opponent_profile
+        self.icm = icm
+        self.batch_equity = equity
+        self._memo = {}
+
+    def memo(self, key, compute):
+        """戦略固有の値を1回だけ計算してキャッシュ"""
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    @cached_property
+    def hand_cards(self):
+        to_card = FastHandEvaluator.int_to_card
+        return [to_card(c) for c in self.seat.hand]
+
+    @cached_property
+    def community_cards(self):
+        to_card = FastHandEvaluator.int_to_card
+        return [to_card(c) for c in self.table.board]
+
+    @cached_property
+    def opponents(self):
+        return [other for other in self.table.active_seats() if other is not self.seat]
+
+    @property
+    def opponent_count(self):
+        return len(self.opponents)
+
+    @cached_property
+    def call_amount(self):
+        return self.table.call_amount(self.seat)
+
+    @property
+    def pot_odds(self):
+        """コールに必要なエクイティ（コール額 / コール後のポット）"""
+        if self.call_amount <= 0:
+            return 0.0
+        return self.call_amount / (self.table.pot + self.call_amount)
+
+    @property
+    def stack_to_pot(self):
+        return self.seat.chips / max(self.table.pot, 1)
+
+    @cached_property
+    def position_bucket(self):
+        return StrategyTable.position_bucket(
+            self.table.active_positions(), self.table.dealer_position, self.seat.position
+        )
+
+    @cached_property
+    def heuristic_strength(self):
+        return HandEvaluator.evaluate_hand_strength(self.hand_cards, self.community_cards)
+
+    @cached_property
+    def equity(self):
+        """判断時間内に推定したエクイティ（時間がない・推定できない場合はNone）"""
+        if self.batch_equity is not None:
+            return self.batch_equity
+        if self.decision_budget <= 0 or not self.opponents:
+            return None
+        deadline = time.monotonic() + self.decision_budget
+        if self.ranges is not None:
+            equity, samples = RangeTracker.equity_against(
+                self.seat.hand, self.table.board,
+                [self.ranges.get(other.player_id) for other in self.opponents], deadline=deadline
+            )
+        else:
+            equity, samples = EquityService.estimate_equity(
+                self.hand_cards, self.community_cards, self.opponent_count, deadline=deadline
+            )
+        return equity if samples else None
+
+    def refine(self, hand_strength):
+        """ヒューリスティックな強度をエクイティで置き換え、相手の傾向で補正する"""
+        if self.equity is not None:
+            hand_strength = EquityService.equity_to_strength(self.equity, self.opponent_count)
+        return OpponentStatsService.adjust_hand_strength(hand_strength, self.call_amount, self.opponent_profile)
+
+    @cached_property
+    def hand_strength(self):
+        return self.refine(self.heuristic_strength)
+
+    @cached_property
+    def win_probability(self):
+        """エクイティ（推定できない場合はハンド強度からの近似）"""
+        return self.equity if self.equity is not None else self.hand_strength / 10
+
+    @cached_property
+    def icm_required_equity(self):
+        """ベットしている（いなければ一番大きい）相手とのオールインでICM上必要な勝率（トーナメント外はNone）"""
+        if self.icm is None or not self.opponents:
+            return None
+        other_stacks, payouts = self.icm
+        villain = max(self.opponents, key=lambda other: (other.current_bet, other.chips + other.current_bet))
+        others = [other.chips for other in self.table.seats if other is not self.seat and other is not villain]
+        return ICMService.required_equity(
+            (self.seat.chips, self.seat.current_bet), (villain.chips, villain.current_bet),
+            others + list(other_stacks), self.table.pot, payouts
+        )
+
+
+class Strategy:
+    """戦略の基底クラス"""
+
+    name = None
+
+    def __init__(self, decision_budget=0):
+        self.decision_budget = decision_budget
+
+    def features(self, table, seat, ranges=None, opponent_profile=None, icm=None, equity=None):
+        """この戦略の判断時間で特徴量オブジェクトを作成"""
+        return DecisionFeatures(table, seat, self.decision_budget, ranges, opponent_profile, icm, equity)
+
+    def decide(self, features, rng):
+        """(action, amount) を返す"""
+        raise NotImplementedError
+
+    def hand_strength(self, features):
+        """戦略が判断に使うハンド強度"""
+        return features.hand_strength
+
+
+class HeuristicStrategy(Strategy):
+    """AIServiceの判断ロジック"""
+
+    name = 'heuristic'
+
+    def decide(self, features, rng):
+        table = features.table
+        return AIService.choose_action(
+            self.hand_strength(features), features.call_amount, features.seat.chips, table.pot,
+            table.big_blind, rng
+        )
+
+
+class AIPlayerStrategy(Strategy):
+    """models.AIPlayerのハンド評価を使う判断ロジック"""
+
+    name = 'aiplayer'
+
+    def hand_strength(self, features):
+        return features.memo('aiplayer_strength', lambda: features.refine(
+            AIPlayer.for_cards(features.hand_cards, features.community_cards).evaluate_hand_strength()
+        ))
+
+    def decide(self, features, rng):
+        table = features.table
+        return AIService.choose_action(
+            self.hand_strength(features), features.call_amount, features.seat.chips, table.pot,
+            table.big_blind, rng
+        )
+
+
+class TableStrategy(Strategy):
+    """POKER_STRATEGY_TABLEの戦略テーブルを引く判断ロジック（テーブルにない状態はヒューリスティック）"""
+
+    name = 'table'
+
+    def decide(self, features, rng):
+        table = features.table
+        strategy_table = load_strategy_table(getattr(settings, 'POKER_STRATEGY_TABLE', ''))
+        return AIService.decide(
+            self.hand_strength(features), features.call_amount, features.seat.chips, table.pot,
+            table.big_blind, table.phase, features.position_bucket, table.highest_bet, rng, strategy_table
+        )
+
+
+class ICMPushFoldStrategy(TableStrategy):
+    """スタックが短いトーナメントではICMでプッシュかフォールドを決め、それ以外は戦略テーブルで判断する"""
+
+    name = 'icm'
+    PUSH_FOLD_BLINDS = 12  # プッシュ/フォールドに切り替えるスタック（ビッグブラインド数）
+
+    def decide(self, features, rng):
+        seat = features.seat
+        required = None
+        if seat.chips <= self.PUSH_FOLD_BLINDS * features.table.big_blind:
+            required = features.icm_required_equity
+        if required is None:
+            return super().decide(features, rng)
+        if features.win_probability >= required:
+            return ('all_in', seat.chips)
+        return ('check', 0) if features.call_amount == 0 else ('fold', 0)
+
+
+class CallingStationStrategy(Strategy):
+    """常にチェックかコールする比較用の戦略"""
+
+    name = 'calling_station'
+
+    def decide(self, features, rng):
+        call_amount = features.call_amount
+        return ('check', 0) if call_amount == 0 else ('call', call_amount)
+
+
+class RandomStrategy(Strategy):
+    """ランダムに行動する比較用の戦略"""
+
+    name = 'random'
+
+    def decide(self, features, rng):
+        call_amount = features.call_amount
+        roll = rng.random()
+        if call_amount > 0 and roll < 0.3:
+            return ('fold', 0)
+        if roll > 0.85 and features.seat.chips > call_amount:
+            return ('raise', features.table.big_blind * rng.randint(1, 4))
+        return ('check', 0) if call_amount == 0 else ('call', call_amount)
+
+
+DEFAULT_STRATEGY = 'table'  # 戦略を指定していないAIプレイヤーの戦略
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (
+        HeuristicStrategy, AIPlayerStrategy, TableStrategy, ICMPushFoldStrategy, CallingStationStrategy,
+        RandomStrategy,
+    )
+}
+
+
+def get_strategy(name, decision_budget=0):
+    """名前から戦略のインスタンスを作成"""
+    if name not in STRATEGIES:
+        raise ValueError(f'Unknown strategy: {name} (available: {", ".join(sorted(STRATEGIES))})')
+    return STRATEGIES[name](decision_budget=decision_budget)
@@ -3,6 +3,9 @@
 """
 import random
 from ..models import Deck, Card
+from ..utils.fast_evaluator import FastHandEvaluator
+from ..utils.outs import OutsCalculator
+from ..utils.tracing import traced
 
 
 class CardService:
@@ -14,20 +17,13 @@ class CardService:
         return Deck()
     
     @staticmethod
+    @traced('CardService.deal_cards_to_players')
     def deal_cards_to_players(game, game_round):
         """プレイヤーにカードを配る"""
         from ..models import Player
         
-        # デッキを作成またはリセット
-        if not game.deck_cards or game.deck_cards == '[]':
-            deck = Deck()
-            game.set_deck_cards(deck.cards)
-            game.save()
-        else:
-            # 既存のデッキから復元
-            deck_cards = game.get_deck_cards()
-            deck = Deck()
-            deck.cards = deck_cards
+        # ハンドごとにシャッフルした新しいデッキを使う（前のハンドの残りから配ると途中でカードが尽きる）
+        deck = Deck()
         
         players = Player.objects.filter(game=game, is_active=True).order_by('position')
         
@@ -38,11 +34,11 @@ class CardService:
             player.current_bet = 0
             player.has_acted_this_round = False
             player.is_folded = False
-            player.save()
+            player.save(update_fields=['hand_cards', 'current_bet', 'has_acted_this_round', 'is_folded'])
         
         # デッキの状態を保存
         game.set_deck_cards(deck.cards)
-        game.save()
+        game.save(update_fields=['deck_cards'])
         
         # コミュニティカードをセット（最初は空）
         game_round.set_community_cards([])
@@ -50,6 +46,28 @@ class CardService:
         
         return deck
     
+    @staticmethod
+    def deal_run_out(game, current_round, street_cards):
+        """残りのストリートのコミュニティカードをまとめて配る（デッキの復元と保存は1回）
+
+        street_cardsはストリートごとの枚数のリスト。ストリートごとにバーンカードを捨てる。
+        """
+        deck = Deck()
+        deck.cards = game.get_deck_cards()
+        community_cards = current_round.get_community_cards()
+        
+        for num_cards in street_cards:
+            if deck.cards:
+                deck.deal_card()  # バーンカード
+            for _ in range(num_cards):
+                if deck.cards:
+                    community_cards.append(deck.deal_card())
+        
+        current_round.set_community_cards(community_cards)
+        game.set_deck_cards(deck.cards)
+        game.save(update_fields=['deck_cards'])
+        return community_cards
+    
     @staticmethod
     def deal_community_cards(game, current_round, num_cards):
         """コミュニティカードを配る"""
@@ -74,7 +92,7 @@ class CardService:
         
         # デッキの状態を保存
         game.set_deck_cards(deck.cards)
-        game.save()
+        game.save(update_fields=['deck_cards'])
         
         return community_cards
 
@@ -111,10 +129,12 @@ class HandEvaluator:
             # プリフロップでの評価
             return HandEvaluator._evaluate_preflop_strength(player_cards)
         
-        best_hand = HandEvaluator.get_best_hand(player_cards, community_cards)
-        if not best_hand:
+        if len(player_cards) + len(community_cards) < 5:
             return 1
         
+        # 最良5枚の役を高速評価で求める（PokerHand.hand_rankと同じ値）
+        hand_rank = FastHandEvaluator.hand_rank(FastHandEvaluator.cards_to_ints(player_cards + community_cards))
+        
         # ハンドランクに基づいて強さを返す
         hand_rank_mapping = {
             1: 2,   # ハイカード
@@ -128,7 +148,28 @@ class HandEvaluator:
             9: 10,  # ストレートフラッシュ
         }
         
-        return hand_rank_mapping.get(best_hand.hand_rank, 1)
+        strength = hand_rank_mapping.get(hand_rank, 1)
+        
+        # フロップ・ターンではストレート以上のドローも考慮
+        if len(player_cards) == 2 and len(community_cards) in (3, 4):
+            draw = OutsCalculator.draw_probability(
+                FastHandEvaluator.cards_to_ints(player_cards), FastHandEvaluator.cards_to_ints(community_cards)
+            )
+            strength = max(strength, round(draw * 10))
+        
+        return strength
+    
+    @staticmethod
+    def outs_hint(player_cards, community_cards):
+        """フロップ・ターンでのアウツと役が上がる確率（ヒント表示用、対象外ならNone）"""
+        if len(player_cards) != 2 or len(community_cards) not in (3, 4):
+            return None
+        
+        result = OutsCalculator.calculate(
+            FastHandEvaluator.cards_to_ints(player_cards), FastHandEvaluator.cards_to_ints(community_cards)
+        )
+        result['out_cards'] = [FastHandEvaluator.int_to_card(card).to_dict() for card in result['out_cards']]
+        return result
     
     @staticmethod
     def _evaluate_preflop_strength(player_cards):
@@ -137,10 +178,10 @@ class HandEvaluator:
             return 1
         
         card1, card2 = player_cards
-        rank1 = card1['rank']
-        rank2 = card2['rank']
-        suit1 = card1['suit']
-        suit2 = card2['suit']
+        rank1 = card1.rank
+        rank2 = card2.rank
+        suit1 = card1.suit
+        suit2 = card2.suit
         
         # ランクを数値に変換
         rank_values = {'2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, 
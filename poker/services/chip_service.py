@@ -0,0 +1,54 @@
+"""
+チップ移動サービス（台帳に記録し、F()式で残高を更新する）
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from ..models import ChipTransfer, Game, Player
+
+
+class ChipService:
+    """プレイヤーとポットの間のチップの移動
+
+    行を読み直さずに F('chips') + x / F('pot') - x で加減算するので、
+    複数のワーカーが同じゲームを更新しても残高がずれない。
+    """
+
+    @staticmethod
+    def apply(game, deltas, reason=None, game_round=None):
+        """プレイヤーごとのチップの増減 {player: 増減額} をポットとの間で移動する
+
+        プレイヤーの増減は1文のUPDATEで、ポットは合計の逆符号で1文のUPDATEで反映し、
+        台帳にまとめて記録する。reasonを省略した場合は増減の符号から bet / award とする。
+        渡したインスタンスの値も更新後の値に合わせる。
+        """
+        deltas = {player: amount for player, amount in deltas.items() if amount}
+        if not deltas:
+            return
+
+        pot_delta = -sum(deltas.values())
+        with transaction.atomic():
+            Player.objects.filter(id__in=[player.id for player in deltas]).update(
+                chips=F('chips') + Case(
+                    *[When(id=player.id, then=Value(amount)) for player, amount in deltas.items()],
+                    default=Value(0), output_field=IntegerField()
+                )
+            )
+            if pot_delta:
+                Game.objects.filter(id=game.id).update(pot=F('pot') + pot_delta)
+            ChipTransfer.objects.bulk_create([
+                ChipTransfer(
+                    game=game, game_round=game_round, player=player, user_id=player.user_id, amount=amount,
+                    reason=reason or ('award' if amount > 0 else 'bet'),
+                )
+                for player, amount in deltas.items()
+            ])
+
+        for player, amount in deltas.items():
+            player.chips += amount
+        game.pot += pot_delta
+
+    @staticmethod
+    def transfer_to_pot(game, player, amount, reason, game_round=None):
+        """プレイヤーのチップをポットに移す（ペナルティなど）"""
+        ChipService.apply(game, {player: -amount}, reason, game_round)
@@ -0,0 +1,70 @@
+"""
+エクイティ（勝率）計算サービス
+"""
+import random
+import time
+from ..utils.fast_evaluator import FastHandEvaluator, FULL_DECK
+
+
+class EquityService:
+    """モンテカルロ法によるエクイティ計算"""
+
+    BATCH_SIZE = 50  # 期限チェックの間隔（サンプル数）
+
+    @staticmethod
+    def estimate_equity(hole_cards, community_cards, num_opponents, deadline=None,
+                        min_samples=0, max_samples=2000, rng=None):
+        """ランダムな相手ハンドに対するエクイティを推定し (equity, samples) を返す
+
+        deadline（time.monotonic()基準）を過ぎた時点でそれまでの結果を返す。
+        min_samplesまでは期限に関係なくサンプリングする。
+        """
+        if num_opponents <= 0:
+            return 1.0, 0
+
+        rng = rng or random
+        evaluate = FastHandEvaluator.evaluate
+        hole = FastHandEvaluator.cards_to_ints(hole_cards)
+        board = FastHandEvaluator.cards_to_ints(community_cards)
+        known = set(hole + board)
+        deck = [card for card in FULL_DECK if card not in known]
+        board_needed = 5 - len(board)
+        draw_count = board_needed + 2 * num_opponents
+
+        if draw_count > len(deck):
+            return 0.0, 0
+
+        wins = 0.0
+        samples = 0
+        while samples < max_samples:
+            for _ in range(EquityService.BATCH_SIZE):
+                drawn = rng.sample(deck, draw_count)
+                full_board = board + drawn[:board_needed]
+                my_score = evaluate(hole + full_board)
+
+                best_opponent = 0
+                ties = 0
+                for i in range(board_needed, draw_count, 2):
+                    score = evaluate(drawn[i:i + 2] + full_board)
+                    if score > best_opponent:
+                        best_opponent = score
+                        ties = 0
+                    if score == my_score:
+                        ties += 1
+
+                if my_score > best_opponent:
+                    wins += 1
+                elif my_score == best_opponent:
+                    wins += 1.0 / (ties + 1)
+                samples += 1
+
+            if samples >= min_samples and deadline is not None and time.monotonic() >= deadline:
+                break
+
+        return wins / samples, samples
+
+    @staticmethod
+    def equity_to_strength(equity, num_opponents):
+        """エクイティをAIが使う1-10のハンド強度に変換（均等な取り分で5）"""
+        fair_share = 1.0 / (num_opponents + 1)
+        return max(1, min(10, 5 * equity / fair_share))
@@ -1,12 +1,30 @@
 """
 ゲーム管理サービス
 """
+import itertools
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from ..engine.orm_adapter import TableAdapter
+from ..engine.table import Table
 from ..models import Game, Player, GameRound
 from ..services.card_service import CardService
+from ..services.chip_service import ChipService
 from ..services.betting_service import BettingService
 from ..services.ai_service import AIService
+from ..services.opponent_stats_service import OpponentStatsService
+from ..services.turn_clock import TurnClock
+from ..signals import board_revealed, game_state_changed
+from ..utils.log import get_logger
+from ..utils.metrics import metrics
 from ..utils.position_manager import PositionManager
+from ..utils.scheduler import scheduler
+from ..utils.tracing import traced
+
+
+logger = get_logger(__name__)
 
 
 class GameService:
@@ -15,8 +33,7 @@ class GameService:
     @staticmethod
     def create_game(name, max_players, small_blind, big_blind, created_by):
         """新しいゲームを作成"""
-        # デバッグ用ログ
-        print(f"GameService.create_game called with: name='{name}' (type: {type(name)}), max_players={max_players}, small_blind={small_blind}, big_blind={big_blind}")
+        logger.debug('create_game', name=name, max_players=max_players, small_blind=small_blind, big_blind=big_blind)
         
         # バリデーション
         if name is None:
@@ -54,7 +71,7 @@ class GameService:
             
             # ディーラーポジションを設定
             game.dealer_position = position
-            game.save()
+            game.save(update_fields=['dealer_position'])
         
         return game
     
@@ -89,8 +106,12 @@ class GameService:
         return player
     
     @staticmethod
-    def add_ai_player(game):
-        """AIプレイヤーを追加"""
+    def add_ai_player(game, strategy=''):
+        """AIプレイヤーを追加（strategyは戦略名、空の場合は既定の戦略）"""
+        from .ai_strategies import STRATEGIES
+        if strategy and strategy not in STRATEGIES:
+            raise ValueError(f'不明な戦略です: {strategy}')
+        
         if game.status != 'waiting':
             raise ValueError('ゲームは既に開始されています')
         
@@ -122,7 +143,8 @@ class GameService:
             position=position,
             chips=1000,
             is_active=True,
-            is_ai=True
+            is_ai=True,
+            ai_strategy=strategy
         )
         
         return player
@@ -140,7 +162,7 @@ class GameService:
         # ゲームステータスを更新
         game.status = 'in_progress'
         game.current_round = 1
-        game.save()
+        game.save(update_fields=['status', 'current_round'])
         
         # 最初のラウンドを開始
         GameService.start_new_round(game)
@@ -163,6 +185,7 @@ class GameService:
             round_number=game.current_round,
             phase='preflop'
         )
+        metrics.inc('hands_started')
         
         # プレイヤーをリセット
         GameService._reset_players_for_new_round(game)
@@ -170,6 +193,9 @@ class GameService:
         # カードを配る（ブラインドも適用される）
         CardService.deal_cards_to_players(game, game_round)
         BettingService.apply_blinds(game, game_round)
+        OpponentStatsService.record_hands_dealt(
+            Player.objects.filter(game=game, is_active=True).values_list('user_id', flat=True)
+        )
         
         # プリフロップの開始プレイヤーを設定
         from ..utils.position_manager import PositionManager
@@ -179,7 +205,7 @@ class GameService:
             game_round.save()
         
         # AIプレイヤーの行動を処理
-        AIService.process_ai_actions(game, game_round)
+        AIService.dispatch_ai_actions(game, game_round)
         
         return game_round
     
@@ -188,25 +214,34 @@ class GameService:
         """新しいラウンド用にプレイヤーをリセット"""
         players = Player.objects.filter(game=game)
         for player in players:
+            player.total_bet = 0
             if player.chips > 0:
                 player.is_active = True
                 player.is_folded = False
                 player.current_bet = 0
                 player.has_acted_this_round = False
-                player.save()
             else:
                 player.is_active = False
-                player.save()
+            player.save(update_fields=[
+                'total_bet', 'is_active', 'is_folded', 'current_bet', 'has_acted_this_round'
+            ])
     
     @staticmethod
+    @traced('GameService.advance_game_phase')
     def advance_game_phase(game, current_round):
         """ゲームのフェーズを進める"""
         # アクティブプレイヤーが1人以下の場合は即座にショーダウンへ
         active_players = current_round.get_active_players()
-        if active_players.count() <= 1:
+        if current_round.phase != 'showdown' and active_players.count() <= 1:
             current_round.phase = 'showdown'
             current_round.save()
             GameService._process_showdown(game, current_round)
+            GameService._schedule_next_hand(game, current_round)
+            return
+        
+        # 行動が締め切られていれば（オールイン）残りのボードを一度に配ってショーダウン
+        if current_round.phase in Table.STREET_CARDS and BettingService.is_action_closed(game, current_round):
+            GameService._run_out(game, current_round)
             return
         
         if current_round.phase == 'preflop':
@@ -236,54 +271,157 @@ class GameService:
         
         current_round.save()
         
+        # ショーダウン後は一定時間おいてから次のハンドへ
+        if current_round.phase == 'showdown':
+            GameService._schedule_next_hand(game, current_round)
+        
         # 新しいフェーズのベッティングを開始（ショーダウン以外）
         if current_round.phase not in ['showdown', 'finished']:
             BettingService.reset_betting_round(game, current_round)
-            AIService.process_ai_actions(game, current_round)
+            AIService.dispatch_ai_actions(game, current_round)
     
     @staticmethod
-    def _process_showdown(game, current_round):
-        """ショーダウンを処理"""
-        from ..services.card_service import HandEvaluator
+    def _run_out(game, current_round):
+        """残りのコミュニティカードをまとめて配り、ショーダウンまでを1トランザクションで処理"""
+        shown = len(current_round.get_community_cards())
+        streets = []
+        phase = current_round.phase
+        while phase in Table.STREET_CARDS:
+            streets.append(Table.STREET_CARDS[phase])
+            phase = Table.NEXT_PHASE[phase]
+        
+        # UIには1ストリートずつ見せる（設定時のみ）。見せた枚数はどのワーカーからも読めるようラウンドに保存
+        reveal_delay = getattr(settings, 'POKER_RUNOUT_REVEAL_DELAY', 0)
+        with transaction.atomic():
+            CardService.deal_run_out(game, current_round, streets)
+            current_round.phase = 'showdown'
+            if reveal_delay > 0:
+                current_round.revealed_cards = shown
+            current_round.save()
+            GameService._process_showdown(game, current_round)
         
-        active_players = current_round.get_active_players()
+        if reveal_delay > 0:
+            game_id, round_id = game.id, current_round.id
+            counts = list(itertools.accumulate(streets, initial=shown))
+            transaction.on_commit(
+                lambda: GameService._schedule_reveals(game_id, round_id, counts, reveal_delay)
+            )
+        
+        GameService._schedule_next_hand(game, current_round, extra_delay=reveal_delay * len(streets))
+    
+    @staticmethod
+    def _schedule_reveals(game_id, round_id, counts, reveal_delay):
+        """ランアウトしたボードを一定間隔で1ストリートずつUIに見せる（counts[0]枚はランアウト時に保存済み）"""
+        for i, count in enumerate(counts[1:], start=1):
+            scheduler.schedule(reveal_delay * i, GameService._reveal_board, game_id, round_id, count)
+    
+    @staticmethod
+    def _reveal_board(game_id, round_id, count):
+        """スケジューラから呼ばれ、UIに見せるコミュニティカードの枚数を進める"""
+        close_old_connections()
+        try:
+            GameRound.objects.filter(id=round_id, game_id=game_id).update(revealed_cards=count)
+            board_revealed.send(sender=Game, game_id=game_id, round_id=round_id, count=count)
+        finally:
+            close_old_connections()
+    
+    @staticmethod
+    def submit_player_action(game_id, user, action, amount=0):
+        """人間プレイヤーのアクションをゲームの行ロック内で検証・適用し、コミット後にAIの手番を進める"""
+        with transaction.atomic():
+            # AIワーカー・スケジューラ・持ち時間の処理と同じテーブルを同時に進めないよう行ロック
+            game = Game.objects.select_for_update().filter(id=game_id, status='in_progress').first()
+            if not game:
+                raise ValueError('Game is not in progress')
+            
+            player = Player.objects.filter(user=user, game=game).select_related('user').first()
+            current_round = GameRound.objects.filter(game=game).last()
+            if not player:
+                raise ValueError('Not a player in this game')
+            if not current_round or current_round.phase in ['showdown', 'finished']:
+                raise ValueError('No active round')
+            
+            # プレイヤーがアクティブかチェック
+            if not player.is_active or player.is_folded:
+                raise ValueError('Player is not active')
+            
+            # 現在のプレイヤーの番かチェック（ロック取得後の状態で判定）
+            if player.position != current_round.current_player_position:
+                raise ValueError('Not your turn')
+            
+            logger.debug_sampled('player_action', game_id=game.id, player_id=player.id, position=player.position, action=action)
+            GameService.handle_player_action(game, player, current_round, action, amount)
+            transaction.on_commit(lambda: game_state_changed.send(sender=Game, game_id=game_id))
+            transaction.on_commit(lambda: GameService.continue_after_action(game_id))
+    
+    @staticmethod
+    def continue_after_action(game_id):
+        """アクションのコミット後にAIの行動とフェーズ進行を行う（バックグラウンド有効時はワーカーに任せる）"""
+        from .ai_executor import AITurnExecutor
         
-        # アクティブプレイヤーが1人の場合は即座に勝利
-        if active_players.count() == 1:
-            winner = active_players.first()
-            winner.chips += game.pot
-            winner.save()
-            game.pot = 0
-            game.save()
+        if getattr(settings, 'POKER_AI_BACKGROUND', False):
+            AITurnExecutor.submit(game_id)
+        else:
+            AITurnExecutor.drive(game_id)
+    
+    @staticmethod
+    def handle_player_action(game, player, current_round, action, amount=0):
+        """人間プレイヤーのアクションを適用し、次の手番を設定する（呼び出し側でゲームの行ロックを取得しておく）
+
+        AIの行動と以降のフェーズ進行は行わないので、呼び出し側でコミット後に進める。
+        """
+        TurnClock.cancel(game, current_round)
+        BettingService.process_player_action(player, game, current_round, action, amount)
+        
+        # アクション後すぐにアクティブプレイヤーをチェック
+        current_round.refresh_from_db()
+        active_count = current_round.get_active_players().count()
+        logger.debug_sampled('active_players', game_id=game.id, round_id=current_round.id, count=active_count)
+        
+        if active_count <= 1:
+            # アクティブプレイヤーが1人以下になった場合は即座にショーダウンへ
+            logger.debug('last_player_standing', game_id=game.id, round_id=current_round.id)
+            GameService.advance_game_phase(game, current_round)
             return
         
-        # 複数プレイヤーの場合はハンド評価
-        community_cards = current_round.get_community_cards()
-        player_hands = []
-        
-        for player in active_players:
-            player_cards = player.get_hand_cards()
-            best_hand = HandEvaluator.get_best_hand(player_cards, community_cards)
-            if best_hand:
-                player_hands.append({
-                    'player': player,
-                    'hand': best_hand,
-                    'rank': best_hand.hand_rank
-                })
-        
-        if player_hands:
-            # 最高ランクのプレイヤーを見つける
-            max_rank = max(hand['rank'] for hand in player_hands)
-            winners = [hand for hand in player_hands if hand['rank'] == max_rank]
+        # 次のプレイヤーを設定
+        next_position = PositionManager.get_next_player_position(current_round)
+        logger.debug_sampled('next_player', game_id=game.id, round_id=current_round.id, position=next_position)
+        if next_position is not None:
+            current_round.current_player_position = next_position
+            current_round.save()
+        
+        # 次の手番の期限を設定（AIの手番はコミット後にワーカーが進める）
+        TurnClock.arm(game, current_round)
+    
+    @staticmethod
+    def run_ai_turns(game, current_round):
+        """AIプレイヤーの行動を処理し、ベッティングが完了したらフェーズを進める"""
+        while True:
+            AIService.process_ai_actions(game, current_round)
             
-            # ポットを分配
-            pot_per_winner = game.pot // len(winners)
-            for winner_info in winners:
-                winner_info['player'].chips += pot_per_winner
-                winner_info['player'].save()
+            # ベッティングラウンドが完了したかチェック（AIの行動後に）
+            current_round.refresh_from_db()
+            if current_round.phase in ['showdown', 'finished']:
+                break
+            if not BettingService.is_betting_round_complete(game, current_round):
+                break
             
-            game.pot = 0
-            game.save()
+            logger.debug_sampled('betting_round_complete', game_id=game.id, round_id=current_round.id, phase=current_round.phase)
+            GameService.advance_game_phase(game, current_round)
+    
+    @staticmethod
+    @traced('GameService._process_showdown')
+    def _process_showdown(game, current_round):
+        """ショーダウンを処理（フォールドしたプレイヤーの投入額も含めてサイドポットごとに分配）"""
+        table, players = TableAdapter.load(game, current_round, with_cards=True)
+        
+        # コミュニティカードが揃っていない場合は評価できない（1人残りの場合を除く）
+        if len(table.active_seats()) > 1 and len(table.board) < 3:
+            return
+        
+        table.showdown()
+        TableAdapter.save(table, game, current_round, players, reason='award')
     
     @staticmethod
     def _finish_round(game, current_round):
@@ -297,41 +435,59 @@ class GameService:
         
         # 次のラウンドの準備
         game.current_round += 1
-        game.save()
+        game.save(update_fields=['current_round'])
+        
+        # トーナメントのテーブルは脱落の記録とテーブルの移動・解散を行い、続けられる場合だけ次のハンドへ
+        if game.tournament_id:
+            from .tournament_service import TournamentService
+            if TournamentService.on_hand_finished(game):
+                GameService.start_new_round(game)
+            return
         
         # チップがあるプレイヤーが2人以上いる場合は続行
         active_players = Player.objects.filter(game=game, chips__gt=0).count()
         if active_players >= 2:
-            # 少し待ってから新しいラウンドを開始
-            import time
-            time.sleep(1)  # ショーダウン結果を確認する時間
             GameService.start_new_round(game)
         else:
             # ゲーム終了
             game.status = 'finished'
-            game.save()
+            game.save(update_fields=['status'])
     
     @staticmethod
-    def leave_game(game, user):
-        """ゲームから退出"""
-        player = Player.objects.filter(user=user, game=game).first()
-        if not player:
-            raise ValueError('このゲームに参加していません')
-        
-        if game.status == 'in_progress':
-            # ゲーム進行中の退出はペナルティ
-            penalty = min(player.chips // 2, 100)
-            player.chips -= penalty
-            game.pot += penalty
+    def _schedule_next_hand(game, current_round, extra_delay=0):
+        """ショーダウン結果を確認する時間を置いてからラウンドを終了し次のハンドを開始"""
+        delay = getattr(settings, 'POKER_NEXT_HAND_DELAY', 1)
+        if delay > 0:
+            delay += extra_delay
+            # 予定時刻を保存しておき、スケジューラのあるプロセスが止まっても状態の読み込み時に再開できるようにする
+            current_round.next_hand_at = timezone.now() + timedelta(seconds=delay)
+            current_round.save(update_fields=['next_hand_at'])
+            # リクエストスレッドをブロックしないようスケジューラで実行
+            scheduler.schedule(delay, GameService._finish_scheduled_round, game.id, current_round.id)
+        else:
+            GameService.advance_game_phase(game, current_round)
+    
+    @staticmethod
+    def _finish_scheduled_round(game_id, round_id):
+        """スケジューラから呼ばれるラウンド終了処理"""
+        close_old_connections()
+        try:
+            GameService.finish_showdown(game_id, round_id)
+        finally:
+            close_old_connections()
+    
+    @staticmethod
+    def finish_showdown(game_id, round_id):
+        """ショーダウン中のラウンドを終了して次のハンドを開始（既に終了済みなら何もしない）"""
+        with transaction.atomic():
+            # AIワーカーと同じテーブルを同時に進めないよう行ロック
+            game = Game.objects.select_for_update().filter(id=game_id, status='in_progress').first()
+            current_round = GameRound.objects.filter(id=round_id, game=game, phase='showdown').first()
             
-            player.is_active = False
-            player.is_folded = True
-            game.save()
-        
-        player.delete()
+            # 既に他のリクエストで終了済みの場合は何もしない
+            if not game or not current_round:
+                return
+            
+            GameService.advance_game_phase(game, current_round)
         
-        # プレイヤーが少なくなった場合はゲーム終了
-        remaining_players = Player.objects.filter(game=game).count()
-        if remaining_players < 2 and game.status == 'in_progress':
-            game.status = 'finished'
-            game.save()
+        game_state_changed.send(sender=Game, game_id=game_id)
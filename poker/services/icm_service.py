@@ -0,0 +1,160 @@
+"""
+ICM（Independent Chip Model）によるトーナメントの賞金エクイティ計算
+"""
+from functools import lru_cache
+from math import comb
+
+import numpy as np
+
+
+def _expected_payouts(stacks, payouts):
+    """残りのプレイヤーの部分集合ごとにメモ化した動的計画法で各プレイヤーの期待賞金を求める
+
+    Malmuth-Harvilleモデル（残っているプレイヤーの中でチップに比例した確率で上位に入る）で、
+    上位から順に順位を決める。賞金のある順位より下は計算しないので、
+    状態数は賞金のある順位数までの部分集合の数になる。
+    """
+    n = len(stacks)
+    places = min(len(payouts), n)
+    zeros = np.zeros(n)
+    memo = {}
+
+    def expected(mask, total, place):
+        if place >= places or total <= 0:
+            return zeros
+        if mask in memo:
+            return memo[mask]
+        result = np.zeros(n)
+        for i in range(n):
+            if not mask >> i & 1 or stacks[i] <= 0:
+                continue
+            p = stacks[i] / total
+            result += p * expected(mask & ~(1 << i), total - stacks[i], place + 1)
+            result[i] += p * payouts[place]
+        memo[mask] = result
+        return result
+
+    return expected((1 << n) - 1, sum(stacks), 0)
+
+
+@lru_cache(maxsize=1024)
+def _exact_equities(stacks, payouts):
+    """厳密なICMエクイティ（同じスタックと賞金の組み合わせは再計算しない）"""
+    return tuple(float(value) for value in _expected_payouts(stacks, payouts))
+
+
+class ICMService:
+    """スタックから賞金のエクイティを計算し、プッシュ/フォールドの判断に使う"""
+
+    EXACT_COST_LIMIT = 20000  # 厳密計算の上限（状態数×人数）、超える場合はモンテカルロ法
+    MONTE_CARLO_SAMPLES = 20000
+
+    # 参加人数ごとの賞金の配分（賞金総額に対する割合）
+    PAYOUT_STRUCTURES = (
+        (6, (0.65, 0.35)),
+        (10, (0.5, 0.3, 0.2)),
+        (20, (0.4, 0.25, 0.15, 0.12, 0.08)),
+    )
+    LARGE_FIELD_PAID_RATIO = 0.15  # 大人数の場合に賞金が出る割合
+    LARGE_FIELD_DECAY = 0.75  # 大人数の場合の順位ごとの賞金の減り方
+
+    @staticmethod
+    def payout_structure(entrants):
+        """参加人数に応じた賞金の配分（1位から順、合計1）"""
+        for max_entrants, payouts in ICMService.PAYOUT_STRUCTURES:
+            if entrants <= max_entrants:
+                return payouts
+        paid = max(len(ICMService.PAYOUT_STRUCTURES[-1][1]), int(entrants * ICMService.LARGE_FIELD_PAID_RATIO))
+        weights = [ICMService.LARGE_FIELD_DECAY ** place for place in range(paid)]
+        total = sum(weights)
+        return tuple(weight / total for weight in weights)
+
+    @staticmethod
+    def exact_cost(players, places):
+        """厳密計算で展開する状態数×人数の見積もり"""
+        places = min(places, players)
+        return players * sum(comb(players, taken) for taken in range(places))
+
+    @staticmethod
+    def equities(stacks, payouts, samples=None, seed=None):
+        """各スタックの賞金エクイティをスタックと同じ順で返す
+
+        payoutsは残っているプレイヤーが争う順位の賞金（1位から順）。
+        チップのないプレイヤーは最下位として扱い0になる。
+        """
+        stacks = tuple(max(int(stack), 0) for stack in stacks)
+        payouts = tuple(float(payout) for payout in payouts)
+        if not stacks or not payouts:
+            return [0.0] * len(stacks)
+
+        if ICMService.exact_cost(len(stacks), len(payouts)) <= ICMService.EXACT_COST_LIMIT:
+            return list(_exact_equities(stacks, payouts))
+        return ICMService.monte_carlo_equities(stacks, payouts, samples, seed)
+
+    @staticmethod
+    def monte_carlo_equities(stacks, payouts, samples=None, seed=None):
+        """人数が多い場合のモンテカルロ法によるICMエクイティ
+
+        チップに比例した確率で上位から順に選ぶ順位の分布は、チップを率とする指数分布の
+        小さい順に並べたものと同じなので、全サンプルの順位をnumpyで一度に作る。
+        """
+        samples = samples or ICMService.MONTE_CARLO_SAMPLES
+        rng = np.random.default_rng(seed)
+        stack_array = np.asarray(stacks, dtype=float)
+        n = len(stack_array)
+        places = min(len(payouts), n)
+
+        with np.errstate(divide='ignore'):
+            keys = rng.exponential(size=(samples, n)) / stack_array
+        order = np.argsort(keys, axis=1)[:, :places]
+
+        result = np.zeros(n)
+        for place in range(places):
+            result += np.bincount(order[:, place], minlength=n) * payouts[place]
+        return [float(value) for value in result / samples]
+
+    @staticmethod
+    def required_equity(hero, villain, others, pot, payouts):
+        """相手1人とのオールインでICM上必要な勝率（判断に影響しない場合はNone）
+
+        hero・villainは (チップ, このベッティングラウンドの投入額)、othersはその他のスタック。
+        フォールドするとポットは相手のものになる。
+        """
+        hero_chips, hero_bet = hero
+        villain_chips, villain_bet = villain
+        effective = min(hero_chips + hero_bet, villain_chips + villain_bet)
+        final_pot = pot - hero_bet - villain_bet + 2 * effective
+        hero_rest = hero_chips + hero_bet - effective
+        villain_rest = villain_chips + villain_bet - effective
+
+        others = list(others)
+        fold, win, lose = (
+            ICMService.equities([hero_stack, villain_stack] + others, payouts)[0]
+            for hero_stack, villain_stack in (
+                (hero_chips, villain_chips + pot),
+                (hero_rest + final_pot, villain_rest),
+                (hero_rest, villain_rest + final_pot),
+            )
+        )
+        if win <= lose:
+            return None
+        return min(max((fold - lose) / (win - lose), 0.0), 1.0)
+
+    @staticmethod
+    def tournament_context(game):
+        """トーナメントのテーブルなら (他のテーブルのスタック, 残りの順位の賞金) を返す"""
+        from ..models import Player, TournamentEntry
+
+        if not game.tournament_id:
+            return None
+
+        # 他のテーブルでハンド中のプレイヤーはハンド開始時のスタックで数える
+        other_stacks = tuple(
+            chips + total_bet for chips, total_bet in
+            Player.objects.filter(game__tournament_id=game.tournament_id, game__status='in_progress')
+            .exclude(game=game).values_list('chips', 'total_bet')
+        )
+        entrants = TournamentEntry.objects.filter(tournament_id=game.tournament_id).count()
+        table_players = Player.objects.filter(game=game).count()
+        payouts = ICMService.payout_structure(entrants)[:len(other_stacks) + table_players]
+        return other_stacks, payouts
@@ -0,0 +1,275 @@
+"""
+実際のビューを通して複数テーブルを同時に進める負荷試験
+"""
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from ..models import Game, Player
+
+
+def _init_worker():
+    """ワーカープロセスでDjangoを初期化（spawn方式のプラットフォーム用）"""
+    import django
+    django.setup()
+
+
+class _MeasuredClient:
+    """テストクライアントのリクエストごとに実時間とクエリ数を記録する"""
+
+    def __init__(self, user, samples):
+        self.client = Client(HTTP_HOST=LoadTestService.host())
+        self.client.force_login(user)
+        self.username = user.username
+        self.samples = samples
+
+    def request(self, view, method, path, **kwargs):
+        """リクエストを送り、(ビュー名, 実時間ms, クエリ数, ステータス) を記録"""
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = getattr(self.client, method)(path, **kwargs)
+        self.samples.append((view, (time.perf_counter() - started) * 1000, queries, response.status_code))
+        return response
+
+
+class LoadTestService:
+    """ユーザーとテーブルを作成し、start_gameとplayer_actionをビュー経由で並列に実行する"""
+
+    POLL_INTERVAL = 0.02  # どのテーブルも人間の手番でないときに待つ時間（秒）
+    RAISE_RATE = 0.1
+    FOLD_RATE = 0.05
+
+    @staticmethod
+    def host():
+        """テストクライアントのHostヘッダ（ALLOWED_HOSTSに合わせる）"""
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*']
+        return hosts[0].lstrip('.') if hosts else 'localhost'
+
+    @staticmethod
+    def run(tables, humans=1, ais=3, hands=10, workers=4, processes=1, duration=120, seed=0, keep=False):
+        """負荷試験を実行して集計結果を返す
+
+        テーブルごとに人間humans人とAI ais人を座らせ、各テーブルのround_numberがhandsを超えるか
+        durationを過ぎるまで人間の手番をビュー経由で進める。processes > 1の場合はテーブルを
+        プロセスに分け、各プロセスでworkers個のスレッドがテーブルを受け持つ。
+        """
+        if humans < 1 or humans + ais < 2 or humans + ais > 8:
+            raise ValueError('1テーブルは人間1人以上・合計2-8人である必要があります')
+
+        run_id = uuid.uuid4().hex[:8]
+        started = time.perf_counter()
+        setup_samples = []
+        table_ids = LoadTestService._setup(run_id, tables, humans, ais, setup_samples)
+        setup_elapsed = time.perf_counter() - started
+
+        try:
+            started = time.perf_counter()
+            deadline = time.time() + duration
+            chunks = [table_ids[i::processes] for i in range(processes)]
+            if processes <= 1:
+                results = [LoadTestService.drive_tables(table_ids, hands, workers, deadline, seed)]
+            else:
+                # フォーク前に接続を閉じ、子プロセスに共有させない
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+                    futures = [
+                        pool.submit(LoadTestService.drive_tables, chunk, hands, workers, deadline, seed + i)
+                        for i, chunk in enumerate(chunks) if chunk
+                    ]
+                    results = [future.result() for future in futures]
+            elapsed = time.perf_counter() - started
+        finally:
+            LoadTestService._teardown(run_id, table_ids, keep)
+
+        samples = [sample for result in results for sample in result['samples']]
+        hands_played = sum(result['hands'] for result in results)
+        actions = sum(1 for view, _, _, status in samples if view == 'player_action' and status == 200)
+        return {
+            'database': connection.vendor,
+            'tables': tables,
+            'humans': humans,
+            'ais': ais,
+            'workers': workers,
+            'processes': processes,
+            'ai_background': getattr(settings, 'POKER_AI_BACKGROUND', False),
+            'setup_elapsed': setup_elapsed,
+            'elapsed': elapsed,
+            'hands': hands_played,
+            'hands_per_second': hands_played / elapsed if elapsed else 0.0,
+            'actions': actions,
+            'actions_per_second': actions / elapsed if elapsed else 0.0,
+            'requests': len(samples),
+            'views': LoadTestService.summarize(setup_samples + samples),
+        }
+
+    @staticmethod
+    def _setup(run_id, tables, humans, ais, samples):
+        """ユーザーを一括作成し、作成・参加・AI追加・開始をビュー経由で行う"""
+        User.objects.bulk_create([
+            User(username=f'loadtest_{run_id}_{i}', is_active=True)
+            for i in range(tables * humans)
+        ])
+        users = list(User.objects.filter(username__startswith=f'loadtest_{run_id}_').order_by('id'))
+
+        table_ids = []
+        for t in range(tables):
+            seated = users[t * humans:(t + 1) * humans]
+            owner = _MeasuredClient(seated[0], samples)
+            owner.request('create_game', 'post', reverse('create_game'), data={
+                'game_name': f'loadtest {run_id} #{t + 1}',
+                'max_players': humans + ais,
+                'small_blind': 10,
+                'big_blind': 20,
+            })
+            game = Game.objects.filter(created_by=seated[0]).latest('id')
+            for user in seated[1:]:
+                _MeasuredClient(user, samples).request('join_game', 'post', reverse('join_game', args=[game.id]))
+            for _ in range(ais):
+                owner.request('add_ai_player', 'get', reverse('add_ai_player', args=[game.id]))
+            owner.request('start_game', 'post', reverse('start_game', args=[game.id]))
+            table_ids.append(game.id)
+        return table_ids
+
+    @staticmethod
+    def _teardown(run_id, table_ids, keep):
+        """テーブルを終了させ、keepでなければ作成したユーザーとゲームを削除"""
+        from .ai_executor import AITurnExecutor
+
+        # AIワーカーとスケジューラが進行中のテーブルを触らないよう先に終了させる
+        Game.objects.filter(id__in=table_ids).update(status='finished')
+        wait_until = time.monotonic() + 10
+        while AITurnExecutor.pending_count() and time.monotonic() < wait_until:
+            time.sleep(LoadTestService.POLL_INTERVAL)
+        if not keep:
+            Game.objects.filter(id__in=table_ids).delete()
+            User.objects.filter(username__startswith=f'loadtest_{run_id}_').delete()
+
+    @staticmethod
+    def drive_tables(table_ids, hands, workers, deadline, seed=0):
+        """テーブルをworkers個のスレッドに分け、人間の手番をビュー経由で進める"""
+        samples = []
+        hands_played = []
+        lock = threading.Lock()
+
+        def drive(worker_index):
+            rng = random.Random(seed * 1000003 + worker_index)
+            worker_samples = []
+            played = LoadTestService._drive(table_ids[worker_index::workers], hands, deadline, rng, worker_samples)
+            with lock:
+                samples.extend(worker_samples)
+                hands_played.append(played)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='poker-loadtest') as pool:
+                for future in [pool.submit(drive, i) for i in range(min(workers, len(table_ids)))]:
+                    future.result()
+        finally:
+            connections.close_all()
+        return {'samples': samples, 'hands': sum(hands_played)}
+
+    @staticmethod
+    def _drive(table_ids, hands, deadline, rng, samples):
+        """担当テーブルの状態を順に取得し、人間の手番ならアクションを送る（終わったハンド数を返す）"""
+        try:
+            clients = {}
+            for player in Player.objects.filter(game_id__in=table_ids, is_ai=False).select_related('user'):
+                clients.setdefault(player.game_id, []).append(_MeasuredClient(player.user, samples))
+
+            rounds = {}
+            remaining = set(table_ids)
+            while remaining and time.time() < deadline:
+                acted = False
+                for game_id in list(remaining):
+                    for client in clients.get(game_id, []):
+                        state = json.loads(
+                            client.request('game_state', 'get', reverse('game_state', args=[game_id])).content
+                        )
+                        current = state['round']
+                        if current is not None:
+                            rounds[game_id] = current['round_number']
+                        if state['status'] != 'in_progress' or rounds.get(game_id, 0) > hands:
+                            # 終わったテーブルは他のテーブルを待つ間に進まないよう終了させる
+                            Game.objects.filter(id=game_id).update(status='finished')
+                            remaining.discard(game_id)
+                            break
+                        if not LoadTestService._is_my_turn(state, client.username):
+                            continue
+
+                        client.request(
+                            'player_action', 'post', reverse('player_action', args=[game_id]),
+                            data=json.dumps(LoadTestService._choose_action(state, rng)),
+                            content_type='application/json',
+                        )
+                        acted = True
+                if not acted:
+                    time.sleep(LoadTestService.POLL_INTERVAL)
+            return sum(min(number - 1, hands) for number in rounds.values())
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def _is_my_turn(state, username):
+        current = state['round']
+        if current is None or current['phase'] in ('showdown', 'finished'):
+            return False
+        return any(
+            player['username'] == username and player['position'] == current['current_player_position']
+            and player['is_active'] and not player['is_folded'] and player['chips'] > 0
+            for player in state['players']
+        )
+
+    @staticmethod
+    def _choose_action(state, rng):
+        """人間プレイヤーの代わりの単純な行動（大半はチェック/コール）"""
+        roll = rng.random()
+        if roll < LoadTestService.RAISE_RATE:
+            return {'action': 'raise', 'amount': 20}
+        if state['call_amount'] > 0:
+            return {'action': 'fold'} if roll < LoadTestService.RAISE_RATE + LoadTestService.FOLD_RATE else {'action': 'call'}
+        return {'action': 'check'}
+
+    @staticmethod
+    def summarize(samples):
+        """ビューごとのリクエスト数・レイテンシのパーセンタイル・平均クエリ数"""
+        by_view = {}
+        for view, elapsed, queries, status in samples:
+            by_view.setdefault(view, []).append((elapsed, queries, status))
+
+        rows = []
+        for view, entries in sorted(by_view.items()):
+            latencies = sorted(elapsed for elapsed, _, _ in entries)
+            rows.append({
+                'view': view,
+                'requests': len(entries),
+                'errors': sum(1 for _, _, status in entries if status >= 400),
+                'p50_ms': LoadTestService.percentile(latencies, 50),
+                'p95_ms': LoadTestService.percentile(latencies, 95),
+                'p99_ms': LoadTestService.percentile(latencies, 99),
+                'queries_per_request': sum(queries for _, queries, _ in entries) / len(entries),
+            })
+        return rows
+
+    @staticmethod
+    def percentile(sorted_values, q):
+        """ソート済みの値のパーセンタイル（最近順位法）"""
+        if not sorted_values:
+            return 0.0
+        rank = math.ceil(q / 100 * len(sorted_values))
+        return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
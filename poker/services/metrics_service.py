@@ -0,0 +1,123 @@
+"""
+運用メトリクス（Prometheusのテキスト形式）
+"""
+import threading
+import time
+
+from ..models import Game
+from ..utils.metrics import DECISION_BUCKETS, format_labels, metrics
+
+
+class MetricsService:
+    """プロセス内のカウンタとキュー・キャッシュの状態をPrometheusのテキスト形式にまとめる"""
+
+    GAMES_TTL = 15  # 進行中のゲーム数を数え直す間隔（秒）
+
+    _lock = threading.Lock()
+    _games = None  # (有効期限, 進行中のゲーム数)
+
+    @classmethod
+    def games_in_progress(cls):
+        """進行中のゲーム数（全プロセスの状態なのでDBで数え、GAMES_TTLの間は使い回す）"""
+        now = time.monotonic()
+        with cls._lock:
+            if cls._games and cls._games[0] > now:
+                return cls._games[1]
+        count = Game.objects.filter(status='in_progress').count()
+        with cls._lock:
+            cls._games = (now + cls.GAMES_TTL, count)
+        return count
+
+    @staticmethod
+    def pending_tasks():
+        """キューごとの実行待ちの件数"""
+        from .ai_executor import AITurnExecutor
+        from .turn_clock import turn_wheel
+        from ..utils.scheduler import scheduler
+
+        return {
+            'scheduler': scheduler.pending_count(),
+            'turn_clock': turn_wheel.pending_count(),
+            'ai_executor': AITurnExecutor.pending_count(),
+        }
+
+    @staticmethod
+    def cache_stats():
+        """キャッシュごとの (ヒット数, ミス数)"""
+        from .icm_service import _exact_equities
+        from .opponent_stats_service import OpponentStatsService
+        from .range_tracker import combo_percentiles
+
+        stats = {}
+        for name, cached in (('combo_percentiles', combo_percentiles), ('icm_equities', _exact_equities)):
+            info = cached.cache_info()
+            stats[name] = (info.hits, info.misses)
+        stats['opponent_stats'] = OpponentStatsService.cache_stats()
+        return stats
+
+    @staticmethod
+    def prometheus():
+        """全メトリクスをPrometheusのテキスト形式で返す"""
+        lines = [
+            '# HELP poker_games_in_progress Games with status in_progress.',
+            '# TYPE poker_games_in_progress gauge',
+            f'poker_games_in_progress {MetricsService.games_in_progress()}',
+        ]
+        lines += MetricsService._counter_lines('hands_started', 'Hands dealt by this process.', unlabeled=True)
+        lines += MetricsService._counter_lines('actions', 'Player actions applied by this process.')
+        lines += MetricsService._counter_lines('ai_decisions', 'AI decisions made by this process.')
+
+        lines += [
+            '# HELP poker_ai_decision_seconds Time spent by AI strategies choosing an action.',
+            '# TYPE poker_ai_decision_seconds histogram',
+        ]
+        for labels, count, total, buckets in metrics.histograms('ai_decision_seconds'):
+            cumulative = 0
+            for bound, bucket_count in zip(DECISION_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'poker_ai_decision_seconds_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'poker_ai_decision_seconds_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'poker_ai_decision_seconds_sum{format_labels(labels)} {total:.6f}')
+            lines.append(f'poker_ai_decision_seconds_count{format_labels(labels)} {count}')
+
+        lines += [
+            '# HELP poker_pending_tasks Tasks waiting in in-process queues.',
+            '# TYPE poker_pending_tasks gauge',
+        ]
+        lines += [f'poker_pending_tasks{{queue="{queue}"}} {count}'
+                  for queue, count in MetricsService.pending_tasks().items()]
+
+        stats = MetricsService.cache_stats()
+        lines += [
+            '# HELP poker_cache_hits_total Cache lookups served from the cache.',
+            '# TYPE poker_cache_hits_total counter',
+        ]
+        lines += [f'poker_cache_hits_total{{cache="{name}"}} {hits}' for name, (hits, _) in stats.items()]
+        lines += [
+            '# HELP poker_cache_misses_total Cache lookups that had to be computed or loaded.',
+            '# TYPE poker_cache_misses_total counter',
+        ]
+        lines += [f'poker_cache_misses_total{{cache="{name}"}} {misses}' for name, (_, misses) in stats.items()]
+        lines += [
+            '# HELP poker_cache_hit_ratio Share of cache lookups served from the cache.',
+            '# TYPE poker_cache_hit_ratio gauge',
+        ]
+        lines += [f'poker_cache_hit_ratio{{cache="{name}"}} {hits / (hits + misses) if hits + misses else 0:.6f}'
+                  for name, (hits, misses) in stats.items()]
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _counter_lines(name, description, unlabeled=False):
+        """カウンタの累計と直近1分間の件数（ラベルのないカウンタはイベントがなくても0を出す）"""
+        counters = metrics.counters(name) or ([((), 0, 0)] if unlabeled else [])
+        lines = [
+            f'# HELP poker_{name}_total {description}',
+            f'# TYPE poker_{name}_total counter',
+        ]
+        lines += [f'poker_{name}_total{format_labels(labels)} {total}' for labels, total, _ in counters]
+        lines += [
+            f'# HELP poker_{name}_per_minute {description[:-1]} in the last 60 seconds.',
+            f'# TYPE poker_{name}_per_minute gauge',
+        ]
+        lines += [f'poker_{name}_per_minute{format_labels(labels)} {last_minute}' for labels, _, last_minute in counters]
+        return lines
@@ -0,0 +1,189 @@
+"""
+対戦相手の傾向（VPIP / PFR / 3ベット / アグレッション / フォールド率）の集計サービス
+"""
+import copy
+import threading
+import time
+from functools import partial
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from ..models import OpponentStats, PlayerAction
+
+VOLUNTARY_ACTIONS = ('call', 'raise', 'all_in')
+RAISE_ACTIONS = ('raise', 'all_in')
+
+
+class OpponentStatsService:
+    """アクションごとに集計テーブルへ差分を加算し、読み取りはプロセス内のキャッシュから行う"""
+
+    CACHE_TTL = 60  # 他のプロセスでの更新を取り込むまでの秒数
+    MIN_HANDS = 30  # 傾向を判断に使うのに必要なハンド数
+
+    _cache = {}  # user_id -> (有効期限, OpponentStats)
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+
+    @staticmethod
+    def action_deltas(phase, action, call_amount, raised, preflop_raises=0, prior_actions=()):
+        """1回のアクションで加算するカウンタを返す
+
+        preflop_raisesはこのアクションより前のプリフロップのレイズ回数、
+        prior_actionsは同じハンドでそのプレイヤーが既に行ったアクション（プリフロップのみ使用）。
+        """
+        deltas = {}
+        if phase == 'preflop':
+            if action in VOLUNTARY_ACTIONS and not any(a in VOLUNTARY_ACTIONS for a in prior_actions):
+                deltas['vpip_hands'] = 1
+            if raised and not any(a in RAISE_ACTIONS for a in prior_actions):
+                deltas['pfr_hands'] = 1
+            if preflop_raises == 1:
+                deltas['three_bet_chances'] = 1
+                if raised:
+                    deltas['three_bets'] = 1
+        elif phase in ('flop', 'turn', 'river'):
+            if raised:
+                deltas['aggressive_actions'] = 1
+            elif action in VOLUNTARY_ACTIONS and call_amount > 0:
+                deltas['passive_actions'] = 1
+            if call_amount > 0:
+                deltas['fold_to_bet_chances'] = 1
+                if action == 'fold':
+                    deltas['folds_to_bet'] = 1
+        return deltas
+
+    @staticmethod
+    def round_context(current_round):
+        """プリフロップの (レイズ回数, プレイヤーID -> 既に行ったアクション) を1回のクエリで取得"""
+        prior_actions = {}
+        raises = 0
+        if current_round.phase == 'preflop':
+            for player_id, action in PlayerAction.objects.filter(
+                game_round=current_round
+            ).values_list('player_id', 'action'):
+                prior_actions.setdefault(player_id, []).append(action)
+                if action in RAISE_ACTIONS:
+                    raises += 1
+        return raises, prior_actions
+
+    @classmethod
+    def record(cls, deltas_by_user):
+        """{user_id: {フィールド: 加算数}} をF()式で加算し、コミット後にキャッシュにも反映"""
+        now = timezone.now()
+        applied = {}
+        for user_id, deltas in deltas_by_user.items():
+            if not deltas:
+                continue
+            updates = {field: F(field) + count for field, count in deltas.items()}
+            if not OpponentStats.objects.filter(user_id=user_id).update(updated_at=now, **updates):
+                try:
+                    # 呼び出し側のトランザクションを壊さないようセーブポイント内で作成
+                    with transaction.atomic():
+                        OpponentStats.objects.create(user_id=user_id, **deltas)
+                except IntegrityError:
+                    # 同時に作成された場合は加算し直す
+                    OpponentStats.objects.filter(user_id=user_id).update(updated_at=now, **updates)
+            applied[user_id] = deltas
+
+        if applied:
+            transaction.on_commit(partial(cls._apply_to_cache, applied))
+
+    @classmethod
+    def record_hands_dealt(cls, user_ids):
+        """ハンドが配られたユーザーのハンド数を加算（人数によらず一定回数のクエリ）"""
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        now = timezone.now()
+        existing = set(OpponentStats.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        if existing:
+            OpponentStats.objects.filter(user_id__in=existing).update(updated_at=now, hands=F('hands') + 1)
+        missing = user_ids - existing
+        if missing:
+            try:
+                with transaction.atomic():
+                    OpponentStats.objects.bulk_create([OpponentStats(user_id=user_id, hands=1) for user_id in missing])
+            except IntegrityError:
+                # 同時に作成された場合は1件ずつ加算し直す
+                cls.record({user_id: {'hands': 1} for user_id in missing})
+                missing = set()
+
+        transaction.on_commit(partial(cls._apply_to_cache, {user_id: {'hands': 1} for user_id in existing | missing}))
+
+    @classmethod
+    def _apply_to_cache(cls, deltas_by_user):
+        """キャッシュ済みの集計にも加算を反映（ロールバックされた加算を残さないようコミット後に呼ぶ）"""
+        with cls._lock:
+            for user_id, deltas in deltas_by_user.items():
+                cached = cls._cache.get(user_id)
+                if cached:
+                    for field, count in deltas.items():
+                        setattr(cached[1], field, getattr(cached[1], field) + count)
+
+    @classmethod
+    def get_many(cls, user_ids):
+        """ユーザーごとの集計のコピーを返す（キャッシュにないものだけ1回のクエリで読み込む）"""
+        now = time.monotonic()
+        result = {}
+        missing = []
+        with cls._lock:
+            for user_id in user_ids:
+                cached = cls._cache.get(user_id)
+                if cached and cached[0] > now:
+                    result[user_id] = copy.copy(cached[1])
+                else:
+                    missing.append(user_id)
+            cls._hits += len(result)
+            cls._misses += len(missing)
+
+        if missing:
+            loaded = {stats.user_id: stats for stats in OpponentStats.objects.filter(user_id__in=missing)}
+            with cls._lock:
+                for user_id in missing:
+                    stats = loaded.get(user_id) or OpponentStats(user_id=user_id)
+                    cls._cache[user_id] = (now + cls.CACHE_TTL, stats)
+                    result[user_id] = copy.copy(stats)
+        return result
+
+    @classmethod
+    def profile(cls, user_ids):
+        """十分なハンド数のある相手の傾向をまとめる（該当者がいない場合はNone）"""
+        known = [stats for stats in cls.get_many(user_ids).values() if stats.hands >= cls.MIN_HANDS]
+        if not known:
+            return None
+        return {
+            'vpip': sum(stats.vpip for stats in known) / len(known),
+            'aggression_factor': sum(stats.aggression_factor for stats in known) / len(known),
+            'fold_to_bet': sum(stats.fold_to_bet for stats in known) / len(known),
+        }
+
+    @staticmethod
+    def adjust_hand_strength(hand_strength, call_amount, profile):
+        """相手の傾向に合わせてハンド強度を補正
+
+        ベットに直面している場合、よくブラフする相手（AF > 3）なら強め、
+        受け身な相手（AF < 1）のベットなら弱めに見る。
+        ベットに直面していない場合、ベットに降りやすい相手（60%以上）には強めに見て仕掛ける。
+        """
+        if not profile:
+            return hand_strength
+        if call_amount > 0:
+            if profile['aggression_factor'] > 3:
+                hand_strength += 1
+            elif profile['aggression_factor'] < 1:
+                hand_strength -= 1
+        elif profile['fold_to_bet'] > 0.6:
+            hand_strength += 1
+        return max(1, min(10, hand_strength))
+
+    @classmethod
+    def cache_stats(cls):
+        """キャッシュの (ヒット数, ミス数)"""
+        with cls._lock:
+            return cls._hits, cls._misses
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._lock:
+            cls._cache.clear()
@@ -0,0 +1,154 @@
+"""
+レンジ対レンジのエクイティ計算サービス
+"""
+import itertools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from ..utils.fast_evaluator import FastHandEvaluator, FULL_DECK
+from ..utils.hand_range import parse_cards, parse_range
+
+
+def _showdown(hands, board, totals):
+    """1回のショーダウンの結果をtotals（プレイヤーごとの勝ち分）に加算"""
+    evaluate = FastHandEvaluator.evaluate
+    scores = [evaluate(list(hand) + board) for hand in hands]
+    best = max(scores)
+    winners = [i for i, score in enumerate(scores) if score == best]
+    share = 1.0 / len(winners)
+    for i in winners:
+        totals[i] += share
+
+
+def _sample_chunk(ranges, board, dead, samples, seed):
+    """モンテカルロ法で1チャンク分をサンプリングし (勝ち分, 有効サンプル数) を返す（ワーカープロセス用）"""
+    rng = random.Random(seed)
+    known = set(board) | set(dead)
+    board_needed = 5 - len(board)
+    totals = [0.0] * len(ranges)
+    valid = 0
+
+    for _ in range(samples):
+        # カードが重なったら全員分を選び直す（重ならない組み合わせの中で一様になる）
+        for _ in range(100):
+            used = set(known)
+            hands = []
+            for combo_list in ranges:
+                combo = rng.choice(combo_list)
+                if combo[0] in used or combo[1] in used:
+                    break
+                used.update(combo)
+                hands.append(combo)
+            else:
+                break
+        else:
+            continue
+
+        deck = [card for card in FULL_DECK if card not in used]
+        _showdown(hands, board + rng.sample(deck, board_needed), totals)
+        valid += 1
+
+    return totals, valid
+
+
+class RangeEquityService:
+    """レンジ同士のエクイティを、組み合わせが少なければ全列挙、多ければ並列サンプリングで計算"""
+
+    EXACT_LIMIT = 50000  # 全列挙するショーダウン数の上限
+    DEFAULT_SAMPLES = 20000
+    MAX_PLAYERS = 6
+
+    @staticmethod
+    def calculate(ranges, board='', dead='', samples=None, processes=1, seed=None):
+        """各レンジのエクイティを計算
+
+        rangesはレンジ表記の文字列（"QQ+, AKs"）かコンボのリスト、board/deadは
+        カード表記の文字列（"Ah7d2c"）か整数カードのリスト。
+        """
+        board = parse_cards(board) if isinstance(board, str) else list(board)
+        dead = parse_cards(dead) if isinstance(dead, str) else list(dead)
+        if not all(isinstance(card, int) and 0 <= card < 52 for card in board + dead):
+            raise ValueError('Cards must be integers from 0 to 51')
+        if len(board) > 5:
+            raise ValueError('Board cannot have more than 5 cards')
+        if set(board) & set(dead):
+            raise ValueError('Board and dead cards overlap')
+        if not 2 <= len(ranges) <= RangeEquityService.MAX_PLAYERS:
+            raise ValueError(f'Between 2 and {RangeEquityService.MAX_PLAYERS} ranges are required')
+
+        excluded = board + dead
+        combo_lists = []
+        for hand_range in ranges:
+            if isinstance(hand_range, str):
+                combos = parse_range(hand_range, excluded)
+            else:
+                combos = [tuple(sorted(combo)) for combo in hand_range if not set(combo) & set(excluded)]
+            if not combos:
+                raise ValueError(f'Range has no combinations left: {hand_range}')
+            combo_lists.append(combos)
+
+        board_needed = 5 - len(board)
+        remaining = 52 - len(excluded) - 2 * len(combo_lists)
+        showdowns = math.prod(len(combos) for combos in combo_lists) * math.comb(remaining, board_needed)
+
+        if showdowns <= RangeEquityService.EXACT_LIMIT:
+            totals, count = RangeEquityService._enumerate(combo_lists, board, dead)
+            method = 'exact'
+        else:
+            totals, count = RangeEquityService._sample(
+                combo_lists, board, dead, samples or RangeEquityService.DEFAULT_SAMPLES, processes, seed
+            )
+            method = 'monte_carlo'
+
+        if count == 0:
+            raise ValueError('Ranges have no non-conflicting combinations')
+
+        return {
+            'equities': [total / count for total in totals],
+            'combos': [len(combos) for combos in combo_lists],
+            'method': method,
+            'samples': count,
+        }
+
+    @staticmethod
+    def _enumerate(combo_lists, board, dead):
+        """カードが重ならないコンボの組み合わせと残りのボードをすべて評価"""
+        known = set(board) | set(dead)
+        board_needed = 5 - len(board)
+        totals = [0.0] * len(combo_lists)
+        count = 0
+
+        for hands in itertools.product(*combo_lists):
+            used = set(known)
+            for hand in hands:
+                used.update(hand)
+            if len(used) != len(known) + 2 * len(hands):
+                continue
+            deck = [card for card in FULL_DECK if card not in used]
+            for runout in itertools.combinations(deck, board_needed):
+                _showdown(hands, board + list(runout), totals)
+                count += 1
+
+        return totals, count
+
+    @staticmethod
+    def _sample(combo_lists, board, dead, samples, processes, seed):
+        """サンプリングをプロセスに分割して実行"""
+        seed = random.randrange(2 ** 32) if seed is None else seed
+        if processes <= 1:
+            return _sample_chunk(combo_lists, board, dead, samples, seed)
+
+        chunk_sizes = [samples // processes + (1 if i < samples % processes else 0) for i in range(processes)]
+        totals = [0.0] * len(combo_lists)
+        count = 0
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [
+                pool.submit(_sample_chunk, combo_lists, board, dead, size, seed * 1000003 + i)
+                for i, size in enumerate(chunk_sizes)
+            ]
+            for future in futures:
+                chunk_totals, chunk_count = future.result()
+                totals = [a + b for a, b in zip(totals, chunk_totals)]
+                count += chunk_count
+        return totals, count
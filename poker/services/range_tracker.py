@@ -0,0 +1,328 @@
+"""
+対戦相手ごとのハンドレンジ（1326通りのコンボの重み）をアクション履歴からベイズ更新する
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from ..models import PlayerAction
+from ..utils.fast_evaluator import FastHandEvaluator, FULL_DECK
+from ..utils.hand_range import ALL_COMBOS
+from .opponent_stats_service import OpponentStatsService
+
+COMBOS = np.array(ALL_COMBOS, dtype=np.int8)  # (1326, 2)
+COMBO_COUNT = len(ALL_COMBOS)
+
+# カードごとに、そのカードを含むコンボのマスク (52, 1326)
+CARD_COMBO_MASK = np.zeros((52, COMBO_COUNT), dtype=bool)
+CARD_COMBO_MASK[COMBOS[:, 0], np.arange(COMBO_COUNT)] = True
+CARD_COMBO_MASK[COMBOS[:, 1], np.arange(COMBO_COUNT)] = True
+
+BOARD_SIZES = {'preflop': 0, 'flop': 3, 'turn': 4, 'river': 5}
+
+
+def live_mask(dead_cards):
+    """dead_cardsを含まないコンボのマスク"""
+    if not dead_cards:
+        return np.ones(COMBO_COUNT, dtype=bool)
+    return ~CARD_COMBO_MASK[list(dead_cards)].any(axis=0)
+
+
+def _chen_score(first, second):
+    """プリフロップのハンドの強さ（Chenの公式）"""
+    high, low = max(first >> 2, second >> 2), min(first >> 2, second >> 2)
+    points = {12: 10, 11: 8, 10: 7, 9: 6}.get(high, (high + 2) / 2)
+    if high == low:
+        return max(5, points * 2)
+    if first & 3 == second & 3:
+        points += 2
+    gap = high - low - 1
+    points -= (0, 1, 2, 4)[gap] if gap < 4 else 5
+    if gap <= 1 and high < 10:
+        points += 1
+    return math.ceil(points)
+
+
+def _percentiles(scores, live):
+    """スコアを生きているコンボの中での順位（0-1、同点は平均）に変換"""
+    live_scores = np.sort(scores[live])
+    if len(live_scores) <= 1:
+        return np.where(live, 0.5, 0).astype(np.float32)
+    below = np.searchsorted(live_scores, scores, side='left')
+    not_above = np.searchsorted(live_scores, scores, side='right')
+    percentiles = (below + not_above - 1) / 2 / (len(live_scores) - 1)
+    return np.where(live, percentiles, 0).astype(np.float32)
+
+
+@lru_cache(maxsize=512)
+def combo_percentiles(board):
+    """ボード（整数カードのタプル）上での各コンボの強さの順位（0が最弱、1が最強）"""
+    live = live_mask(board)
+    if not board:
+        scores = np.array([_chen_score(a, b) for a, b in ALL_COMBOS], dtype=np.float64)
+    else:
+        evaluate = FastHandEvaluator.evaluate
+        cards = list(board)
+        scores = np.array(
+            [evaluate([a, b] + cards) if ok else -1 for (a, b), ok in zip(ALL_COMBOS, live)],
+            dtype=np.float64
+        )
+    return _percentiles(scores, live)
+
+
+class HandRangeModel:
+    """コンボの強さの順位からアクションの尤度を計算するモデル
+
+    プリフロップは相手のVPIP / PFRから「参加する・レイズする上位何割か」を、
+    フロップ以降はアグレッションファクターからレイズする割合を決める。
+    ブラフやスロープレイの分として、どのコンボにも最低限の尤度を残す。
+    """
+
+    SOFTNESS = 0.08
+    FLOOR = 0.03
+    DEFAULT_PROFILE = {'vpip': 0.35, 'pfr': 0.15, 'aggression_factor': 1.5}
+
+    @staticmethod
+    def _sigmoid(values, threshold):
+        return 1 / (1 + np.exp(-(values - threshold) / HandRangeModel.SOFTNESS))
+
+    @staticmethod
+    def likelihood(action, phase, percentiles, profile=None):
+        """各コンボがそのアクションを選ぶ尤度"""
+        profile = profile or HandRangeModel.DEFAULT_PROFILE
+        if phase == 'preflop':
+            continue_threshold = 1 - profile['vpip']
+            raise_threshold = 1 - profile['pfr']
+        else:
+            continue_threshold = 0.4
+            raise_threshold = 1 - min(0.5, max(0.05, 0.15 * profile['aggression_factor']))
+
+        continues = HandRangeModel._sigmoid(percentiles, continue_threshold)
+        raises = HandRangeModel._sigmoid(percentiles, raise_threshold)
+
+        if action == 'fold':
+            likelihood = 1 - continues
+        elif action == 'call':
+            likelihood = continues * (1 - raises)
+        elif action == 'check':
+            # 強いハンドでもチェックすることはある
+            likelihood = 1 - 0.8 * raises
+        else:  # raise / all_in
+            likelihood = raises
+
+        return np.maximum(likelihood, HandRangeModel.FLOOR)
+
+
+class RangeTracker:
+    """ハンドごとに各プレイヤーのレンジを保持し、新しいPlayerActionの分だけ更新する"""
+
+    MAX_ROUNDS = 256  # 保持するハンド数（古いものから捨てる）
+    BATCH_SIZE = 64  # エクイティ計算で一度にサンプリングする数
+
+    _rounds = OrderedDict()  # round_id -> {'last_action_id': int, 'weights': {player_id: 重み}}
+    _lock = threading.Lock()
+
+    @classmethod
+    def ranges(cls, current_round):
+        """各プレイヤーのレンジ（player_id -> 重み）を最新のアクションまで更新して返す"""
+        with cls._lock:
+            state = cls._rounds.pop(current_round.id, None) or {'last_action_id': 0, 'weights': {}}
+            cls._rounds[current_round.id] = state
+            while len(cls._rounds) > cls.MAX_ROUNDS:
+                cls._rounds.popitem(last=False)
+
+        new_actions = list(
+            PlayerAction.objects.filter(game_round=current_round, id__gt=state['last_action_id'])
+            .order_by('id')
+            .values_list('id', 'player_id', 'player__user_id', 'action', 'phase')
+        )
+        if new_actions:
+            board = FastHandEvaluator.cards_to_ints(current_round.get_community_cards())
+            profiles = OpponentStatsService.get_many({user_id for _, _, user_id, _, _ in new_actions})
+            for action_id, player_id, user_id, action, phase in new_actions:
+                cls._apply(state['weights'], player_id, action, phase, board, profiles.get(user_id))
+                state['last_action_id'] = action_id
+
+        return state['weights']
+
+    @staticmethod
+    def _apply(weights, player_id, action, phase, board, stats):
+        """1回のアクションでレンジを更新（そのときのボードでの強さの順位を使う）"""
+        if phase not in BOARD_SIZES:
+            return
+        street_board = tuple(board[:BOARD_SIZES[phase]])
+        profile = None
+        if stats is not None and stats.hands >= OpponentStatsService.MIN_HANDS:
+            profile = {'vpip': stats.vpip, 'pfr': stats.pfr, 'aggression_factor': stats.aggression_factor}
+
+        current = weights.get(player_id)
+        if current is None:
+            current = live_mask(street_board).astype(np.float32)
+        updated = current * HandRangeModel.likelihood(action, phase, combo_percentiles(street_board), profile)
+        total = updated.sum()
+        # 数値的に潰れた場合は更新前のレンジを残す
+        weights[player_id] = (updated / total).astype(np.float32) if total > 0 else current
+
+    @staticmethod
+    def equity_against(hole_cards, board_cards, ranges, deadline=None, min_samples=0, max_samples=2000,
+                       seed=None):
+        """重み付きレンジの相手全員に対するエクイティを推定し (equity, samples) を返す
+
+        相手のコンボはレンジの重みに比例してまとめてサンプリングし、
+        相手同士でカードが重なるサンプルは配列演算で除外する。
+        """
+        if not ranges:
+            return 1.0, 0
+
+        rng = np.random.default_rng(seed)
+        py_rng = random.Random(int(rng.integers(2 ** 32)))
+        dead = list(hole_cards) + list(board_cards)
+        live = live_mask(dead)
+
+        probabilities = []
+        for weights in ranges:
+            weights = np.where(live, weights if weights is not None else 1.0, 0).astype(np.float64)
+            total = weights.sum()
+            if total <= 0:
+                weights = live.astype(np.float64)
+                total = weights.sum()
+            probabilities.append(weights / total)
+
+        evaluate = FastHandEvaluator.evaluate
+        hole = list(hole_cards)
+        board = list(board_cards)
+        dead_set = set(dead)
+        deck = [card for card in FULL_DECK if card not in dead_set]
+        board_needed = 5 - len(board)
+
+        wins = 0.0
+        samples = 0
+        while samples < max_samples:
+            picks = [COMBOS[rng.choice(COMBO_COUNT, size=RangeTracker.BATCH_SIZE, p=p)] for p in probabilities]
+            valid = np.ones(RangeTracker.BATCH_SIZE, dtype=bool)
+            for i in range(len(picks)):
+                for j in range(i + 1, len(picks)):
+                    valid &= (picks[i][:, :, None] != picks[j][:, None, :]).all(axis=(1, 2))
+
+            for index in np.flatnonzero(valid):
+                hands = [pick[index].tolist() for pick in picks]
+                used = {card for hand in hands for card in hand}
+                full_board = board + py_rng.sample([card for card in deck if card not in used], board_needed)
+                my_score = evaluate(hole + full_board)
+
+                best_opponent = 0
+                ties = 0
+                for hand in hands:
+                    score = evaluate(hand + full_board)
+                    if score > best_opponent:
+                        best_opponent = score
+                        ties = 0
+                    if score == my_score:
+                        ties += 1
+
+                if my_score > best_opponent:
+                    wins += 1
+                elif my_score == best_opponent:
+                    wins += 1.0 / (ties + 1)
+                samples += 1
+
+            if samples >= max(min_samples, 1) and deadline is not None and time.monotonic() >= deadline:
+                break
+
+        return (wins / samples if samples else 0.0), samples
+
+    @staticmethod
+    def equities_against(hands, board_cards, ranges, deadline=None, min_samples=0, max_samples=2000, seed=None):
+        """複数の手札のエクイティを同じサンプルでまとめて推定し、手札ごとの (equity, samples) を返す
+
+        handsは (player_id, 手札) のリスト、rangesはハンドに残っている全員の (player_id, 重み) のリストで、
+        各手札は自分以外の全員を相手とする。全員のコンボはボードと重ならないようにまとめてサンプリングし、
+        手札ごとに自分のカードや相手同士と重なるサンプルを除外するので、各手札から見た分布は
+        equity_againstと同じ（他のプレイヤーの手札の情報は使わない）。
+        """
+        rng = np.random.default_rng(seed)
+        py_rng = random.Random(int(rng.integers(2 ** 32)))
+        board = list(board_cards)
+        live = live_mask(board)
+
+        probabilities = []
+        for _, weights in ranges:
+            weights = np.where(live, weights if weights is not None else 1.0, 0).astype(np.float64)
+            total = weights.sum()
+            if total <= 0:
+                weights = live.astype(np.float64)
+                total = weights.sum()
+            probabilities.append(weights / total)
+
+        heroes = []
+        for player_id, hole_cards in hands:
+            hole = list(hole_cards)
+            opponents = [i for i, (other_id, _) in enumerate(ranges) if other_id != player_id]
+            heroes.append((hole, opponents, CARD_COMBO_MASK[hole].any(axis=0)))
+
+        # 相手がいない手札はequity_againstと同じく (1.0, 0)
+        pending = [i for i, (_, opponents, _) in enumerate(heroes) if opponents]
+        results = [[0.0, 0] for _ in hands]
+
+        evaluate = FastHandEvaluator.evaluate
+        board_set = set(board)
+        deck = [card for card in FULL_DECK if card not in board_set]
+        board_needed = 5 - len(board)
+        draw_count = board_needed + 2 * len(ranges) + 2
+        batch = RangeTracker.BATCH_SIZE
+
+        while any(results[i][1] < max_samples for i in pending):
+            indices = [rng.choice(COMBO_COUNT, size=batch, p=p) for p in probabilities]
+            picks = [COMBOS[index] for index in indices]
+            conflicts = {}
+            for a in range(len(picks)):
+                for b in range(a + 1, len(picks)):
+                    conflicts[a, b] = (picks[a][:, :, None] == picks[b][:, None, :]).any(axis=(1, 2))
+            # 手札によらず共有する残りのボードの候補（自分と相手のカードを飛ばして先頭から使う）
+            orders = [py_rng.sample(deck, draw_count) for _ in range(batch)]
+
+            for i in pending:
+                if results[i][1] >= max_samples:
+                    continue
+                hole, opponents, hole_mask = heroes[i]
+                valid = np.ones(batch, dtype=bool)
+                for position, a in enumerate(opponents):
+                    valid &= ~hole_mask[indices[a]]
+                    for b in opponents[position + 1:]:
+                        valid &= ~conflicts[a, b]
+
+                for index in np.flatnonzero(valid):
+                    opponent_hands = [picks[a][index].tolist() for a in opponents]
+                    used = set(hole).union(*opponent_hands)
+                    full_board = board + [card for card in orders[index] if card not in used][:board_needed]
+                    my_score = evaluate(hole + full_board)
+
+                    best_opponent = 0
+                    ties = 0
+                    for hand in opponent_hands:
+                        score = evaluate(hand + full_board)
+                        if score > best_opponent:
+                            best_opponent = score
+                            ties = 0
+                        if score == my_score:
+                            ties += 1
+
+                    if my_score > best_opponent:
+                        results[i][0] += 1
+                    elif my_score == best_opponent:
+                        results[i][0] += 1.0 / (ties + 1)
+                    results[i][1] += 1
+
+            if (deadline is not None and time.monotonic() >= deadline
+                    and all(results[i][1] >= max(min_samples, 1) for i in pending)):
+                break
+
+        return [
+            ((wins / samples if samples else 0.0), samples) if i in pending else (1.0, 0)
+            for i, (wins, samples) in enumerate(results)
+        ]
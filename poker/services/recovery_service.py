@@ -0,0 +1,65 @@
+"""
+止まったテーブルの再開サービス
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import GameRound, Player
+from .turn_clock import TurnClock
+from ..utils.log import get_logger
+
+
+logger = get_logger(__name__)
+
+BETTING_PHASES = ('preflop', 'flop', 'turn', 'river')
+
+
+class StallRecovery:
+    """ワーカーの再起動などで失われた予定の処理を、状態の読み込み時に検出して再開する
+
+    次のハンドの開始予定（GameRound.next_hand_at）や手番の期限（GameRound.turn_deadline）を
+    POKER_RECOVERY_GRACE秒過ぎても進んでいないラウンドを対象にする。再開する処理は行ロック内で
+    状態を確認してから進めるので、元の予定と重なっても二重には進まない。
+    """
+
+    @staticmethod
+    def is_stalled(game, current_round, now=None):
+        """予定の時刻を過ぎても進んでいないか（DBは参照しない）"""
+        if game.status != 'in_progress':
+            return False
+        now = now or timezone.now()
+        grace = timedelta(seconds=getattr(settings, 'POKER_RECOVERY_GRACE', 10))
+        if current_round.phase == 'showdown':
+            return current_round.next_hand_at is not None and current_round.next_hand_at + grace < now
+        if current_round.phase in BETTING_PHASES:
+            return current_round.turn_deadline is not None and current_round.turn_deadline + grace < now
+        return False
+
+    @staticmethod
+    def recover(game_id, round_id):
+        """止まっているテーブルを再開"""
+        from .game_service import GameService
+
+        current_round = GameRound.objects.filter(id=round_id, game_id=game_id).select_related('game').first()
+        if not current_round or not StallRecovery.is_stalled(current_round.game, current_round):
+            return
+
+        if current_round.phase == 'showdown':
+            logger.warning('stalled_round_recovered', game_id=game_id, round_id=round_id)
+            GameService.finish_showdown(game_id, round_id)
+            return
+
+        player = Player.objects.filter(
+            game_id=game_id, position=current_round.current_player_position, is_active=True, is_folded=False
+        ).only('is_ai').first()
+        if player and player.is_ai:
+            logger.warning('stalled_ai_turn_recovered', game_id=game_id, round_id=round_id, phase=current_round.phase)
+            # 依頼し直した時刻を期限にして、処理中の間に何度も依頼しないようにする
+            GameRound.objects.filter(id=round_id).update(turn_deadline=timezone.now())
+            GameService.continue_after_action(game_id)
+        elif player:
+            # 持ち時間のタイマーを持っていたプロセスが止まった（期限が一致する場合だけ処理される）
+            logger.warning('stalled_turn_timeout_recovered', game_id=game_id, round_id=round_id, phase=current_round.phase)
+            TurnClock.expire(game_id, round_id, current_round.turn_deadline)
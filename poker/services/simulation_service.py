@@ -0,0 +1,369 @@
+"""
+AI同士の自己対戦シミュレーション（DBを使わない）
+"""
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from ..engine.table import Seat, Table
+from ..utils.strategy_table import ACTIONS, StrategyTable
+
+
+def _init_worker():
+    """ワーカープロセスでDjangoを初期化（spawn方式のプラットフォーム用）"""
+    import django
+    django.setup()
+
+
+class _RecordingStrategy:
+    """戦略の判断を抽象化した状態とともに記録するラッパー"""
+
+    def __init__(self, strategy, exploration, decisions):
+        self.strategy = strategy
+        self.exploration = exploration
+        self.decisions = decisions
+
+    def features(self, table, seat, **context):
+        return self.strategy.features(table, seat, **context)
+
+    def decide(self, features, rng):
+        from .ai_service import AIService
+
+        table = features.table
+        if rng.random() < self.exploration:
+            action, amount = AIService.table_action(
+                rng.choice(ACTIONS), features.call_amount, features.seat.chips, table.pot, table.big_blind
+            )
+        else:
+            action, amount = self.strategy.decide(features, rng)
+
+        key = StrategyTable.state_key(
+            table.phase, features.position_bucket, self.strategy.hand_strength(features),
+            features.call_amount, table.pot, table.highest_bet, table.big_blind,
+        )
+        if key is not None:
+            self.decisions.append((features.seat.position, key, ACTIONS.index(AIService.abstract_action(action))))
+        return action, amount
+
+
+class SimulationService:
+    """固定シードで指定戦略同士のハンドを大量にプレイして成績を集計"""
+
+    CHUNK_HANDS = 500  # 1チャンクのハンド数（プロセス数によらず同じシードで同じ結果になるよう固定）
+
+    @staticmethod
+    def play_hand(table, strategies, rng):
+        """1ハンドを最後までプレイし、アクション数を返す（strategiesはポジション -> 戦略）"""
+        from .ai_service import AIService
+
+        table.start_hand()
+        actions = 0
+        while not table.hand_over:
+            seat = table.current_seat()
+            call_amount = table.call_amount(seat)
+            if seat.chips == 0:
+                # オールイン済みのプレイヤーは行動できない
+                action, amount = ('check', 0) if call_amount == 0 else ('call', 0)
+            else:
+                strategy = strategies[seat.position]
+                action, amount = strategy.decide(strategy.features(table, seat), rng)
+                action, amount = AIService.fit_action_to_stack(action, amount, call_amount, seat.chips)
+
+            try:
+                table.act(action, amount)
+            except ValueError:
+                # 不正なアクションはフォールドとして扱う
+                table.act('fold')
+            actions += 1
+
+        table.finish_hand()
+        return actions
+
+    @staticmethod
+    def play_hands(strategy_names, hands, seed, starting_chips=1000, small_blind=10, big_blind=20,
+                   decision_budget=0):
+        """1ワーカー分のハンドをプレイし、戦略ごとの集計を返す
+
+        各ハンドはスタックをリセットして独立にプレイし、ディーラーは毎ハンド回す。
+        """
+        from .ai_strategies import get_strategy
+
+        rng = random.Random(seed)
+        strategies = {i: get_strategy(name, decision_budget) for i, name in enumerate(strategy_names)}
+        seats = [Seat(i, starting_chips, player_id=i, is_ai=True) for i in range(len(strategy_names))]
+        table = Table(seats, small_blind, big_blind, dealer_position=0, rng=rng)
+
+        stats = {
+            name: {'seat_hands': 0, 'net': 0, 'net_sq': 0, 'wins': 0}
+            for name in strategy_names
+        }
+        actions = 0
+
+        for _ in range(hands):
+            for seat in seats:
+                seat.chips = starting_chips
+            actions += SimulationService.play_hand(table, strategies, rng)
+
+            for seat in seats:
+                net = seat.chips - starting_chips
+                entry = stats[strategy_names[seat.position]]
+                entry['seat_hands'] += 1
+                entry['net'] += net
+                entry['net_sq'] += net * net
+                if net > 0:
+                    entry['wins'] += 1
+
+        return {'hands': hands, 'actions': actions, 'stats': stats}
+
+    @staticmethod
+    def run(strategy_names, hands, seed=0, processes=1, starting_chips=1000, small_blind=10,
+            big_blind=20, decision_budget=0):
+        """ハンドを複数プロセスに分割してプレイし、集計結果を返す"""
+        started = time.perf_counter()
+        results = SimulationService._run_chunks(
+            SimulationService.play_hands, strategy_names, hands, seed, processes,
+            starting_chips=starting_chips,
+            small_blind=small_blind,
+            big_blind=big_blind,
+            decision_budget=decision_budget,
+        )
+        elapsed = time.perf_counter() - started
+
+        return SimulationService._merge(results, elapsed, big_blind)
+
+    @staticmethod
+    def _run_chunks(func, strategy_names, hands, seed, processes, **options):
+        """ハンド数をCHUNK_HANDSごとのチャンクに分け、func(strategy_names, size, seed, **options) を並列に実行
+
+        チャンクの分け方とシードはハンド数だけで決まり、結果はチャンク順に返す。
+        """
+        chunk_sizes = [
+            min(SimulationService.CHUNK_HANDS, hands - start)
+            for start in range(0, hands, SimulationService.CHUNK_HANDS)
+        ] or [0]
+
+        if processes <= 1:
+            return [
+                func(strategy_names, size, seed * 1000003 + i, **options)
+                for i, size in enumerate(chunk_sizes)
+            ]
+
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+            futures = [
+                pool.submit(func, strategy_names, size, seed * 1000003 + i, **options)
+                for i, size in enumerate(chunk_sizes)
+            ]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def collect_strategy_stats(strategy_names, hands, seed, exploration=0.1, starting_chips=1000,
+                               small_blind=10, big_blind=20, decision_budget=0):
+        """1ワーカー分のハンドをプレイし、抽象化した状態とアクションごとの収支（BB単位）を集計
+
+        各判断の収支はそのハンドの最終的な収支とする。explorationの確率でランダムな
+        アクションを選び、戦略が選ばないアクションにもサンプルが集まるようにする。
+        """
+        from .ai_strategies import get_strategy
+
+        rng = random.Random(seed)
+        decisions = []
+        strategies = {
+            i: _RecordingStrategy(get_strategy(name, decision_budget), exploration, decisions)
+            for i, name in enumerate(strategy_names)
+        }
+        seats = [Seat(i, starting_chips, player_id=i, is_ai=True) for i in range(len(strategy_names))]
+        table = Table(seats, small_blind, big_blind, dealer_position=0, rng=rng)
+
+        totals = {}
+        decision_count = 0
+        for _ in range(hands):
+            for seat in seats:
+                seat.chips = starting_chips
+            del decisions[:]
+            SimulationService.play_hand(table, strategies, rng)
+
+            for position, key, action_index in decisions:
+                result = (seats[position].chips - starting_chips) / big_blind
+                entry = totals.setdefault(key, [[0.0, 0], [0.0, 0], [0.0, 0]])
+                entry[action_index][0] += result
+                entry[action_index][1] += 1
+            decision_count += len(decisions)
+
+        return {'hands': hands, 'decisions': decision_count, 'totals': totals}
+
+    @staticmethod
+    def build_strategy_table(strategy_names, hands, output, seed=0, processes=1, **options):
+        """自己対戦から戦略テーブルを作成してoutputに書き出す"""
+        started = time.perf_counter()
+        results = SimulationService._run_chunks(
+            SimulationService.collect_strategy_stats, strategy_names, hands, seed, processes, **options
+        )
+
+        totals = {}
+        for result in results:
+            for key, entry in result['totals'].items():
+                total = totals.setdefault(key, [[0.0, 0], [0.0, 0], [0.0, 0]])
+                for action_total, action_entry in zip(total, entry):
+                    action_total[0] += action_entry[0]
+                    action_total[1] += action_entry[1]
+
+        StrategyTable.write(output, totals)
+        elapsed = time.perf_counter() - started
+
+        return {
+            'hands': sum(result['hands'] for result in results),
+            'decisions': sum(result['decisions'] for result in results),
+            'states': len(totals),
+            'elapsed': elapsed,
+        }
+
+    @staticmethod
+    def blind_schedule(small_blind, big_blind, levels=20, growth=1.5):
+        """基本ブラインドから段階的に上がるブラインドレベルの一覧を作成"""
+        schedule = []
+        for level in range(levels):
+            factor = growth ** level
+            schedule.append((max(1, round(small_blind * factor)), max(2, round(big_blind * factor))))
+        return schedule
+
+    @staticmethod
+    def play_tournament(strategy_names, seed, starting_chips=1000, blind_levels=None, hands_per_level=10,
+                        max_hands=5000, decision_budget=0):
+        """1ゲームを最後の1人になるまでプレイし、順位を返す
+
+        席順と最初のディーラーはランダムに決め、ディーラーはハンドごとに
+        チップのあるプレイヤーの中で時計回りに進める（PositionManagerと同じ規則）。
+        """
+        from .ai_strategies import get_strategy
+
+        rng = random.Random(seed)
+        blind_levels = blind_levels or SimulationService.blind_schedule(10, 20)
+        positions = list(range(len(strategy_names)))
+        rng.shuffle(positions)
+
+        names = {}
+        strategies = {}
+        seats = []
+        for name, position in zip(strategy_names, positions):
+            names[position] = name
+            strategies[position] = get_strategy(name, decision_budget)
+            seats.append(Seat(position, starting_chips, player_id=position, is_ai=True))
+        table = Table(seats, dealer_position=rng.choice(positions), rng=rng)
+
+        eliminated = []  # 脱落順の席
+        hands = 0
+        while len(table.players_with_chips()) > 1 and hands < max_hands:
+            level = min(hands // hands_per_level, len(blind_levels) - 1)
+            table.small_blind, table.big_blind = blind_levels[level]
+            stacks_before = {seat.position: seat.chips for seat in table.seats}
+            SimulationService.play_hand(table, strategies, rng)
+            hands += 1
+
+            # 同じハンドで脱落した場合は開始時のスタックが多い方を上位とする
+            busted = [
+                seat for seat in table.seats
+                if seat.chips == 0 and stacks_before[seat.position] > 0
+            ]
+            busted.sort(key=lambda seat: stacks_before[seat.position])
+            eliminated.extend(busted)
+
+        # 残っているプレイヤーはチップの多い順に上位
+        survivors = sorted(table.players_with_chips(), key=lambda seat: seat.chips, reverse=True)
+        finish_order = survivors + list(reversed(eliminated))
+
+        return {
+            'seed': seed,
+            'hands': hands,
+            'places': [names[seat.position] for seat in finish_order],
+        }
+
+    @staticmethod
+    def run_tournaments(strategy_names, games, seed=0, processes=1, on_result=None, **options):
+        """トーナメントを複数プロセスで並列にプレイし、終わった順に集計する
+
+        on_resultを渡すと1ゲーム終わるごとに結果を受け取れる。
+        """
+        seeds = [seed * 1000003 + i for i in range(games)]
+        places = {name: [] for name in strategy_names}
+        total_hands = 0
+
+        def collect(result):
+            nonlocal total_hands
+            total_hands += result['hands']
+            for place, name in enumerate(result['places'], start=1):
+                places[name].append(place)
+            if on_result:
+                on_result(result)
+
+        started = time.perf_counter()
+        if processes <= 1:
+            for game_seed in seeds:
+                collect(SimulationService.play_tournament(strategy_names, game_seed, **options))
+        else:
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(SimulationService.play_tournament, strategy_names, game_seed, **options)
+                    for game_seed in seeds
+                ]
+                for future in as_completed(futures):
+                    collect(future.result())
+        elapsed = time.perf_counter() - started
+
+        report = []
+        for name, finishes in places.items():
+            n = len(finishes)
+            wins = sum(1 for place in finishes if place == 1)
+            win_rate = wins / n if n else 0
+            report.append({
+                'strategy': name,
+                'entries': n,
+                'win_rate': win_rate,
+                'ci95_win_rate': 1.96 * math.sqrt(win_rate * (1 - win_rate) / n) if n else 0,
+                'average_place': sum(finishes) / n if n else 0,
+            })
+        report.sort(key=lambda row: row['average_place'])
+
+        return {
+            'games': games,
+            'hands': total_hands,
+            'elapsed': elapsed,
+            'games_per_second': games / elapsed if elapsed > 0 else 0,
+            'strategies': report,
+        }
+
+    @staticmethod
+    def _merge(results, elapsed, big_blind):
+        """ワーカーごとの集計をまとめ、勝率と95%信頼区間を計算"""
+        hands = sum(result['hands'] for result in results)
+        actions = sum(result['actions'] for result in results)
+
+        totals = {}
+        for result in results:
+            for name, entry in result['stats'].items():
+                total = totals.setdefault(name, {'seat_hands': 0, 'net': 0, 'net_sq': 0, 'wins': 0})
+                for key in total:
+                    total[key] += entry[key]
+
+        report = []
+        for name, total in totals.items():
+            n = total['seat_hands']
+            mean = total['net'] / n if n else 0
+            variance = (total['net_sq'] / n - mean * mean) if n else 0
+            margin = 1.96 * math.sqrt(max(variance, 0) / n) if n else 0
+            report.append({
+                'strategy': name,
+                'seat_hands': n,
+                'win_rate': total['wins'] / n if n else 0,
+                'bb_per_100': mean / big_blind * 100,
+                'ci95_bb_per_100': margin / big_blind * 100,
+            })
+        report.sort(key=lambda row: row['bb_per_100'], reverse=True)
+
+        return {
+            'hands': hands,
+            'actions': actions,
+            'elapsed': elapsed,
+            'hands_per_second': hands / elapsed if elapsed > 0 else 0,
+            'strategies': report,
+        }
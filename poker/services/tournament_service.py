@@ -0,0 +1,279 @@
+"""
+マルチテーブルトーナメントの管理（ブラインドレベル・脱落・テーブルの移動と解散）
+"""
+import heapq
+import math
+import random
+from collections import Counter, defaultdict
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from ..models import Game, GameRound, Player, Tournament, TournamentEntry
+from ..utils.position_manager import PositionManager
+from ..utils.scheduler import scheduler
+
+
+class TableBalancer:
+    """全テーブルの人数からテーブルの移動・解散を決める（DBを使わない）"""
+
+    @staticmethod
+    def plan(source_id, counts, table_size):
+        """ハンドを終えたテーブルから動かす人数を決め、([(移動先のgame_id, 人数)], 解散するか) を返す
+
+        ハンドの途中のテーブルからは動かせないので、移動元はハンドを終えたテーブルだけ。
+        必要なテーブル数より多ければこのテーブルを解散して人数の少ないテーブルから埋め、
+        そうでなければ最も少ないテーブルとの差が1以下になるまで移す。
+        """
+        others = [(count, game_id) for game_id, count in counts.items() if game_id != source_id]
+        if not others:
+            return [], False
+
+        needed = math.ceil(sum(counts.values()) / table_size)
+        breaking = len(counts) > needed
+        remaining = counts[source_id]
+        heapq.heapify(others)
+        moves = Counter()
+        while remaining > 0:
+            count, game_id = others[0]
+            if not breaking and remaining - count <= 1:
+                break
+            heapq.heapreplace(others, (count + 1, game_id))
+            moves[game_id] += 1
+            remaining -= 1
+
+        return sorted(moves.items()), breaking
+
+
+class TournamentService:
+    """トーナメントの作成・開始と、ハンド終了ごとの脱落の記録とテーブルの調整"""
+
+    MOVED_PLAYER_RESET = {
+        'is_active': False,  # 移動先のハンドが終わるまでは参加しない
+        'is_folded': True,
+        'current_bet': 0,
+        'total_bet': 0,
+        'has_acted_this_round': False,
+        'hand_cards': '[]',
+    }
+
+    @staticmethod
+    def create_tournament(name, created_by=None, **options):
+        """トーナメントを作成（optionsはTournamentのフィールド）"""
+        if not name or not name.strip():
+            raise ValueError('トーナメント名は必須です')
+        if options.get('table_size', 8) < 2:
+            raise ValueError('1テーブルの人数は2人以上である必要があります')
+        return Tournament.objects.create(name=name.strip(), created_by=created_by, **options)
+
+    @staticmethod
+    def register(tournament, user, is_ai=False, ai_strategy=''):
+        """トーナメントに参加登録"""
+        if tournament.status != 'waiting':
+            raise ValueError('トーナメントは既に開始されています')
+        entry, created = TournamentEntry.objects.get_or_create(
+            tournament=tournament, user=user, defaults={'is_ai': is_ai, 'ai_strategy': ai_strategy}
+        )
+        if not created:
+            raise ValueError('既にこのトーナメントに参加しています')
+        return entry
+
+    @staticmethod
+    def blinds(tournament, level=None):
+        """レベルのブラインド (small_blind, big_blind)"""
+        from .simulation_service import SimulationService
+
+        level = tournament.level if level is None else level
+        return SimulationService.blind_schedule(
+            tournament.small_blind, tournament.big_blind, levels=level + 1, growth=tournament.blind_growth
+        )[level]
+
+    @staticmethod
+    def start(tournament, rng=random):
+        """参加者をテーブルに振り分けて全テーブルの最初のハンドを開始
+
+        テーブルと席はまとめて作成し、席はPositionManagerの規則で空席から選ぶ。
+        """
+        from .game_service import GameService
+
+        if tournament.status != 'waiting':
+            raise ValueError('トーナメントは既に開始されています')
+        entries = list(tournament.entries.all())
+        if len(entries) < 2:
+            raise ValueError('トーナメントを開始するには最低2人の参加者が必要です')
+
+        table_count = math.ceil(len(entries) / tournament.table_size)
+        small_blind, big_blind = TournamentService.blinds(tournament, 0)
+
+        with transaction.atomic():
+            games = Game.objects.bulk_create([
+                Game(
+                    name=f'{tournament.name} #{i + 1}',
+                    created_by=tournament.created_by,
+                    status='in_progress',
+                    max_players=tournament.table_size,
+                    current_round=1,
+                    small_blind=small_blind,
+                    big_blind=big_blind,
+                    tournament=tournament,
+                )
+                for i in range(table_count)
+            ])
+
+            # 参加者を順番に各テーブルへ配り、人数の差を1以下にする
+            rng.shuffle(entries)
+            occupied = defaultdict(set)
+            players = []
+            for i, entry in enumerate(entries):
+                game = games[i % table_count]
+                position = PositionManager.choose_available_position(occupied[game.id], tournament.table_size, rng)
+                occupied[game.id].add(position)
+                players.append(Player(
+                    user_id=entry.user_id, game=game, position=position, chips=tournament.starting_chips,
+                    is_ai=entry.is_ai, ai_strategy=entry.ai_strategy,
+                ))
+            Player.objects.bulk_create(players)
+
+            for game in games:
+                game.dealer_position = rng.choice(sorted(occupied[game.id]))
+            Game.objects.bulk_update(games, ['dealer_position'])
+
+            tournament.status = 'in_progress'
+            tournament.level = 0
+            tournament.save(update_fields=['status', 'level'])
+
+            for game in games:
+                GameService.start_new_round(game)
+
+        TournamentService._schedule_level(tournament)
+        return games
+
+    @staticmethod
+    def _schedule_level(tournament):
+        """次のブラインドレベルへの切り替えを予約"""
+        if tournament.level_duration > 0:
+            scheduler.schedule(
+                tournament.level_duration, TournamentService._advance_level, tournament.id, tournament.level
+            )
+
+    @staticmethod
+    def _advance_level(tournament_id, level):
+        """スケジューラから呼ばれるブラインドレベルの切り替え（次のハンドから適用）"""
+        close_old_connections()
+        try:
+            with transaction.atomic():
+                tournament = Tournament.objects.select_for_update().filter(
+                    id=tournament_id, status='in_progress', level=level
+                ).first()
+                if not tournament:
+                    return
+
+                tournament.level = level + 1
+                tournament.save(update_fields=['level'])
+                small_blind, big_blind = TournamentService.blinds(tournament)
+                Game.objects.filter(tournament=tournament, status='in_progress').update(
+                    small_blind=small_blind, big_blind=big_blind
+                )
+
+            TournamentService._schedule_level(tournament)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def on_hand_finished(game, rng=random):
+        """テーブルのハンド終了時に脱落を記録してテーブルを調整し、このテーブルで次のハンドを配るかを返す"""
+        with transaction.atomic():
+            # 複数のテーブルが同時にハンドを終えても調整が重ならないようトーナメントの行をロック
+            tournament = Tournament.objects.select_for_update().get(id=game.tournament_id)
+            if tournament.status != 'in_progress':
+                return False
+
+            TournamentService._record_eliminations(tournament, game)
+
+            # 全テーブルの席を1回のクエリで読み込み、移動はメモリ上で決める
+            # （他のテーブルでハンド中にオールインしてチップが0の席も残っている人数に数える）
+            seats = list(
+                Player.objects.filter(game__tournament=tournament, game__status='in_progress')
+                .values_list('game_id', 'position')
+            )
+            if len(seats) <= 1:
+                TournamentService._finish(tournament)
+                return False
+
+            counts = Counter(game_id for game_id, _ in seats)
+            moves, breaking = TableBalancer.plan(game.id, counts, tournament.table_size)
+            if moves:
+                TournamentService._apply_moves(tournament, game, seats, moves, rng)
+
+            if breaking:
+                game.status = 'finished'
+                game.save(update_fields=['status'])
+                return False
+
+            return counts[game.id] - sum(count for _, count in moves) >= 2
+
+    @staticmethod
+    def _record_eliminations(tournament, game):
+        """チップがなくなったプレイヤーの順位を記録してテーブルから外す
+
+        同じハンドで脱落した場合は、そのハンドに多く投入した（多く持っていた）方を上位とする。
+        """
+        busted = list(Player.objects.filter(game=game, chips__lte=0).order_by('-total_bet', 'position'))
+        if not busted:
+            return
+
+        remaining = Player.objects.filter(game__tournament=tournament).count() - len(busted)
+        entries = {
+            entry.user_id: entry
+            for entry in TournamentEntry.objects.filter(
+                tournament=tournament, user_id__in=[player.user_id for player in busted]
+            )
+        }
+        now = timezone.now()
+        for i, player in enumerate(busted):
+            entry = entries[player.user_id]
+            entry.finish_position = remaining + i + 1
+            entry.eliminated_at = now
+        TournamentEntry.objects.bulk_update(entries.values(), ['finish_position', 'eliminated_at'])
+        Player.objects.filter(id__in=[player.id for player in busted]).delete()
+
+    @staticmethod
+    def _apply_moves(tournament, source, seats, moves, rng):
+        """移動先の空席を決めてプレイヤーをまとめて移し、待機中の移動先テーブルではハンドを始める"""
+        from .game_service import GameService
+
+        occupied = defaultdict(set)
+        for game_id, position in seats:
+            occupied[game_id].add(position)
+
+        movers = list(Player.objects.filter(game=source))
+        rng.shuffle(movers)
+        moved = []
+        for game_id, count in moves:
+            for _ in range(count):
+                player = movers.pop()
+                position = PositionManager.choose_available_position(occupied[game_id], tournament.table_size, rng)
+                occupied[game_id].add(position)
+                player.game_id = game_id
+                player.position = position
+                for field, value in TournamentService.MOVED_PLAYER_RESET.items():
+                    setattr(player, field, value)
+                moved.append(player)
+
+        Player.objects.bulk_update(moved, ['game', 'position', *TournamentService.MOVED_PLAYER_RESET])
+
+        # 人数不足でハンドを配れずに待っていたテーブルは再開する
+        for game in Game.objects.filter(id__in=[game_id for game_id, _ in moves], status='in_progress'):
+            last_round = GameRound.objects.filter(game=game).last()
+            if last_round is None or last_round.phase == 'finished':
+                GameService.start_new_round(game)
+
+    @staticmethod
+    def _finish(tournament):
+        """最後の1人を優勝としてトーナメントを終了"""
+        winner = Player.objects.filter(game__tournament=tournament).first()
+        if winner is not None:
+            TournamentEntry.objects.filter(tournament=tournament, user_id=winner.user_id).update(finish_position=1)
+        tournament.status = 'finished'
+        tournament.save(update_fields=['status'])
+        Game.objects.filter(tournament=tournament).update(status='finished')
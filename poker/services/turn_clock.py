@@ -0,0 +1,118 @@
+"""
+手番の持ち時間管理サービス
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Game, GameRound, Player
+from ..signals import game_state_changed
+from ..utils.log import get_logger
+from ..utils.timing_wheel import TimingWheel
+
+
+logger = get_logger(__name__)
+
+# プロセス内の全テーブルの持ち時間を1つのホイールで管理
+turn_wheel = TimingWheel()
+
+
+class TurnClock:
+    """人間プレイヤーの手番に期限を設定し、時間切れでチェックまたはフォールドする
+
+    期限はGameRound.turn_deadlineにも保存し、時間切れの処理は行ロック内で期限が一致する場合だけ行う。
+    同じ席に手番が戻った場合や、別のプロセスでアクションが処理された場合の古いタイマーは何もしない。
+    """
+
+    @staticmethod
+    def arm(game, current_round):
+        """現在の手番の期限を設定（ベッティング外では解除）
+
+        人間の手番は持ち時間を開始する。AIの手番はワーカーに処理を依頼した時刻を期限として保存し、
+        ワーカーのプロセスが止まった場合に状態の読み込み時に再開できるようにする（タイマーは使わない）。
+        """
+        if current_round.phase in ['showdown', 'finished']:
+            TurnClock.cancel(game, current_round)
+            return
+
+        player = Player.objects.filter(
+            game=game,
+            position=current_round.current_player_position,
+            is_active=True,
+            is_folded=False
+        ).only('id', 'is_ai').first()
+
+        if player and player.is_ai:
+            turn_wheel.cancel(game.id)
+            current_round.turn_deadline = timezone.now()
+            current_round.save(update_fields=['turn_deadline'])
+            return
+
+        timeout = getattr(settings, 'POKER_TURN_TIMEOUT', 0)
+        if not player or not timeout:
+            TurnClock.cancel(game, current_round)
+            return
+
+        current_round.turn_deadline = timezone.now() + timedelta(seconds=timeout)
+        current_round.save(update_fields=['turn_deadline'])
+        turn_wheel.arm(
+            game.id, timeout, TurnClock._on_timeout,
+            game.id, current_round.id, current_round.turn_deadline
+        )
+
+    @staticmethod
+    def cancel(game, current_round=None):
+        """テーブルの持ち時間を解除（ラウンドを渡すと他のプロセスのタイマーも無効になるよう期限を消す）"""
+        turn_wheel.cancel(game.id)
+        if current_round is not None and current_round.turn_deadline is not None:
+            current_round.turn_deadline = None
+            current_round.save(update_fields=['turn_deadline'])
+
+    @staticmethod
+    def _on_timeout(game_id, round_id, deadline):
+        """ホイールのスレッドから呼ばれ、時間切れの処理をワーカーに渡す（他のテーブルのタイマーを遅らせない）"""
+        from .ai_executor import AITurnExecutor
+        AITurnExecutor.submit_task(TurnClock.expire, game_id, round_id, deadline)
+
+    @staticmethod
+    def expire(game_id, round_id, deadline):
+        """時間切れ：コール不要ならチェック、必要ならフォールド"""
+        from .ai_executor import AITurnExecutor
+        from .betting_service import BettingService
+        from .game_service import GameService
+
+        with transaction.atomic():
+            game = Game.objects.select_for_update().filter(id=game_id, status='in_progress').first()
+            if not game:
+                return
+
+            # 期限設定後に手番が進んでいれば（期限が更新・解除されていれば）何もしない
+            current_round = GameRound.objects.filter(game=game).last()
+            if (
+                not current_round
+                or current_round.id != round_id
+                or current_round.turn_deadline != deadline
+                or current_round.phase in ['showdown', 'finished']
+                or BettingService.is_betting_round_complete(game, current_round)
+            ):
+                return
+
+            position = current_round.current_player_position
+            player = Player.objects.filter(
+                game=game,
+                position=position,
+                is_active=True,
+                is_folded=False,
+                is_ai=False
+            ).first()
+            if not player:
+                return
+
+            action = 'check' if BettingService.get_call_amount(player, current_round) == 0 else 'fold'
+            logger.info('turn_timeout', game_id=game_id, position=position, action=action)
+            GameService.handle_player_action(game, player, current_round, action, 0)
+            transaction.on_commit(lambda: AITurnExecutor.submit(game_id))
+
+        game_state_changed.send(sender=Game, game_id=game_id)
@@ -0,0 +1,12 @@
+"""
+ゲーム状態変更の通知シグナル
+"""
+from django.dispatch import Signal
+
+
+# ゲームの状態が更新されたときに送信（引数: game_id）
+game_state_changed = Signal()
+
+# オールインのランアウトでUIに見せるコミュニティカードの枚数が変わったときに送信
+# （引数: game_id, round_id, count）
+board_revealed = Signal()
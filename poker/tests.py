@@ -1,3 +1,934 @@
-from django.test import TestCase
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .engine.orm_adapter import TableAdapter
+from .engine.pots import SidePots
+from .engine.table import Seat, Table
+from .models import ChipTransfer, Game, GameRound, OpponentStats, Player, PlayerAction, TournamentEntry
+from .services.chip_service import ChipService
+from .services.game_service import GameService
+from .services.icm_service import ICMService
+from .services.metrics_service import MetricsService
+from .services.opponent_stats_service import OpponentStatsService
+from .services.range_tracker import RangeTracker
+from .services.tournament_service import TableBalancer, TournamentService
+from .services.turn_clock import TurnClock
+from .utils.fast_evaluator import FastHandEvaluator
+from .utils.hand_range import ALL_COMBOS, parse_cards, parse_range
+from .utils.metrics import _MinuteWindow, format_labels, metrics
+from .utils.outs import OutsCalculator
+from .utils.strategy_table import DIMENSIONS, ENTRY_COUNT, StrategyTable, load_strategy_table
+from .utils.timing_wheel import TimingWheel
+from .views_async import MAX_EQUITY_SAMPLES
+
+
+def _cards(text):
+    """'Ah Td' 形式の文字列を整数カードのリストに変換"""
+    return ['23456789TJQKA'.index(card[0]) * 4 + 'hdcs'.index(card[1]) for card in text.split()]
+
+
+class SidePotTests(SimpleTestCase):
+    """投入額の異なるオールインからのサイドポットの組み立てと分配"""
+
+    def _all_in_table(self):
+        """4人が100 / 300 / 600 / 1000でオールインし、1人が50を入れてフォールドしたリバー"""
+        seats = [
+            Seat(0, 0, player_id=0, total_bet=100, hand=_cards('Ac Ad')),
+            Seat(1, 0, player_id=1, total_bet=300, hand=_cards('Kc Kd')),
+            Seat(2, 0, player_id=2, total_bet=600, hand=_cards('Qc Qd')),
+            Seat(3, 0, player_id=3, total_bet=1000, hand=_cards('4h 8s')),
+            Seat(4, 950, player_id=4, total_bet=50, hand=_cards('5h 6h'), is_active=False, is_folded=True),
+        ]
+        table = Table(seats, dealer_position=4)
+        table.phase = 'river'
+        table.board = _cards('2c 7d 9h Js 3c')
+        table.pot = sum(seat.total_bet for seat in seats)
+        return table
+
+    def test_pots_are_split_at_each_all_in_level(self):
+        table = self._all_in_table()
+        pots = [(amount, [seat.position for seat in eligible]) for amount, eligible in table.pots()]
+        self.assertEqual(pots, [
+            (450, [0, 1, 2, 3]),  # 100 x 4 + フォールドした席の50
+            (600, [1, 2, 3]),
+            (600, [2, 3]),
+            (400, [3]),  # 誰もコールしていない分は本人に戻る
+        ])
+        self.assertEqual(sum(amount for amount, _ in pots), table.pot)
+
+    def test_showdown_awards_each_pot_to_its_best_eligible_hand(self):
+        table = self._all_in_table()
+        awards = {seat.position: amount for seat, amount in table.showdown()}
+        self.assertEqual(awards, {0: 450, 1: 600, 2: 600, 3: 400})
+        self.assertEqual(table.pot, 0)
+        self.assertEqual(table.seat_at(4).chips, 950)
+
+    def test_build_adds_unrecorded_pot_to_main_pot(self):
+        seats = [Seat(0, 0, total_bet=100), Seat(1, 0, total_bet=200)]
+        self.assertEqual([amount for amount, _ in SidePots.build(seats, pot=330)], [230, 100])
+
+    def test_uneven_all_ins_conserve_chips(self):
+        for seed in range(20):
+            seats = [Seat(i, chips, player_id=i) for i, chips in enumerate((100, 300, 600, 1000))]
+            table = Table(seats, dealer_position=0, rng=random.Random(seed))
+            table.start_hand()
+            while not table.hand_over:
+                table.act('all_in')
+
+            self.assertEqual(len(table.board), 5)
+            self.assertEqual(table.pot, 0)
+            self.assertEqual(sum(seat.chips for seat in table.seats), 2000)
+            # 一番多く持っていた席にはコールされなかった400が必ず戻る
+            self.assertGreaterEqual(table.seat_at(3).chips, 400)
+
+
+class HeadsUpOrderTests(SimpleTestCase):
+    """ヘッズアップのブラインドと手番の順序"""
+
+    def test_dealer_posts_small_blind_and_acts_first_preflop(self):
+        table = Table([Seat(0, 1000, player_id=0), Seat(3, 1000, player_id=3)], dealer_position=3)
+        table.start_hand()
+
+        self.assertEqual(table.small_blind_position(), 3)
+        self.assertEqual(table.big_blind_position(), 0)
+        self.assertEqual(table.seat_at(3).current_bet, 10)
+        self.assertEqual(table.seat_at(0).current_bet, 20)
+        self.assertEqual(table.current_position, 3)
+
+    def test_big_blind_acts_first_after_the_flop(self):
+        table = Table([Seat(0, 1000, player_id=0), Seat(3, 1000, player_id=3)], dealer_position=3)
+        table.start_hand()
+        table.act('call')
+        self.assertEqual(table.current_position, 0)
+        table.act('check')
+
+        self.assertEqual(table.phase, 'flop')
+        self.assertEqual(table.current_position, 0)
+
+    def test_small_blind_acts_first_after_the_flop_with_three_players(self):
+        table = Table([Seat(i, 1000, player_id=i) for i in range(3)], dealer_position=0)
+        table.start_hand()
+        self.assertEqual(table.current_position, 0)  # UTG（ディーラー）
+        table.act('call')
+        table.act('call')
+        table.act('check')
+
+        self.assertEqual(table.phase, 'flop')
+        self.assertEqual(table.current_position, 1)
+
+
+class TableAdapterTests(TestCase):
+    """TableAdapterでの読み込み・保存を通したチップの保存"""
+
+    def setUp(self):
+        users = [User.objects.create(username=f'player{i}') for i in range(3)]
+        self.game = Game.objects.create(
+            name='adapter', created_by=users[0], status='in_progress', dealer_position=0, current_round=1
+        )
+        self.round = GameRound.objects.create(game=self.game, round_number=1)
+        for position, (user, chips) in enumerate(zip(users, (500, 300, 200))):
+            Player.objects.create(user=user, game=self.game, position=position, chips=chips)
+
+    def _total(self):
+        self.game.refresh_from_db()
+        return sum(Player.objects.filter(game=self.game).values_list('chips', flat=True)) + self.game.pot
+
+    def test_chips_are_conserved_through_save_and_load(self):
+        table, players = TableAdapter.load(self.game, self.round)
+        table.rng = random.Random(1)
+        table.start_hand()
+        TableAdapter.save(table, self.game, self.round, players, reason='blind')
+        self.assertEqual(self._total(), 1000)
+        self.assertEqual(self.game.pot, 30)
+
+        reloaded, _ = TableAdapter.load(self.game, self.round)
+        self.assertEqual(
+            [(seat.position, seat.chips, seat.current_bet, seat.total_bet) for seat in reloaded.seats],
+            [(seat.position, seat.chips, seat.current_bet, seat.total_bet) for seat in table.seats],
+        )
+        self.assertEqual((reloaded.pot, reloaded.highest_bet, reloaded.current_position),
+                         (table.pot, table.highest_bet, table.current_position))
+
+        while not table.hand_over:
+            table.act('all_in')
+        TableAdapter.save(table, self.game, self.round, players, reason='award')
+
+        self.assertEqual(self._total(), 1000)
+        self.assertEqual(self.game.pot, 0)
+        self.assertEqual(
+            sorted(Player.objects.filter(game=self.game).values_list('position', 'chips')),
+            sorted((seat.position, seat.chips) for seat in table.seats),
+        )
+
+
+@override_settings(POKER_AI_BACKGROUND=False, POKER_TURN_TIMEOUT=0, POKER_NEXT_HAND_DELAY=1, POKER_RUNOUT_REVEAL_DELAY=0.5)
+class RunOutTests(TestCase):
+    """プリフロップのオールインで残りのボードをまとめて配るランアウト"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'player{i}') for i in range(2)]
+        self.game = GameService.create_game('runout', 2, 10, 20, self.users[0])
+        GameService.join_game(self.game, self.users[1])
+
+    def _user_to_act(self, current_round):
+        current_round.refresh_from_db()
+        return Player.objects.get(game=self.game, position=current_round.current_player_position).user
+
+    @mock.patch('poker.services.game_service.scheduler')
+    def test_preflop_all_in_runs_out_the_board_and_delays_the_next_hand(self, scheduler):
+        GameService.start_game(self.game)
+        current_round = GameRound.objects.get(game=self.game)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GameService.submit_player_action(self.game.id, self._user_to_act(current_round), 'all_in')
+        with self.captureOnCommitCallbacks(execute=True):
+            GameService.submit_player_action(self.game.id, self._user_to_act(current_round), 'call')
+
+        current_round.refresh_from_db()
+        self.game.refresh_from_db()
+        self.assertEqual(current_round.phase, 'showdown')
+        self.assertEqual(len(current_round.get_community_cards()), 5)
+        self.assertEqual(self.game.pot, 0)
+        self.assertEqual(sum(Player.objects.filter(game=self.game).values_list('chips', flat=True)), 2000)
+
+        # フロップ・ターン・リバーの3ストリートを見せる分だけ次のハンドを遅らせる
+        scheduler.schedule.assert_any_call(
+            2.5, GameService._finish_scheduled_round, self.game.id, current_round.id
+        )
+        reveals = [c.args for c in scheduler.schedule.call_args_list if c.args[1] == GameService._reveal_board]
+        self.assertEqual([(args[0], args[4]) for args in reveals], [(0.5, 3), (1.0, 4), (1.5, 5)])
+
+        # 見せた枚数はラウンドに保存され、どのワーカーの画面・APIでも同じように隠す
+        self.assertEqual(current_round.revealed_cards, 0)
+        self.client.force_login(self.users[0])
+        response = self.client.get(reverse('game_detail', args=[self.game.id]))
+        self.assertEqual(response.context['community_cards'], [])
+        self.assertIsNone(response.context['outs_hint'])
+
+        GameService._reveal_board(self.game.id, current_round.id, 3)
+        current_round.refresh_from_db()
+        self.assertEqual(len(current_round.get_visible_community_cards()), 3)
+        state = self.client.get(reverse('game_state', args=[self.game.id])).json()
+        self.assertEqual(len(state['round']['community_cards']), 3)
+
+
+class EquityCalculatorViewTests(TestCase):
+    """エクイティ計算APIの入力の検証と同時実行の制限"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='student')
+        self.client.force_login(self.user)
+
+    def _post(self, data):
+        return self.client.post(reverse('equity_calculator'), json.dumps(data), content_type='application/json')
+
+    def test_invalid_input_is_rejected(self):
+        for data in (
+            {'ranges': ['AA', 'KK'], 'board': [99]},
+            {'ranges': ['AA', 'KK'], 'dead': 'Zz'},
+            {'ranges': ['AA', 'KK'], 'samples': -5},
+            {'ranges': ['AA', 'KK'], 'samples': MAX_EQUITY_SAMPLES + 1},
+            ['AA', 'KK'],
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self._post(data).status_code, 400)
+
+    def test_calculates_equity(self):
+        response = self._post({'ranges': ['AA', 'KK'], 'board': 'Ah7d2c', 'samples': 100})
+        self.assertEqual(response.status_code, 200)
+
+    def test_one_calculation_per_user(self):
+        with mock.patch('poker.views_async._equity_users', {self.user.id}):
+            self.assertEqual(self._post({'ranges': ['AA', 'KK']}).status_code, 429)
+        self.assertEqual(self._post({'ranges': ['AA', 'KK'], 'samples': 100}).status_code, 200)
+
+    def test_requires_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('equity_calculator'), '{}', content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+
+class PlayerActionViewTests(TestCase):
+    """アクションAPIのエラー応答"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='player')
+        self.game = GameService.create_game('action', 2, 10, 20, self.user)
+        self.client.force_login(self.user)
+        self.url = reverse('player_action', args=[self.game.id])
+
+    def test_malformed_body_is_a_bad_request(self):
+        for body in ('{"action": ', '["fold"]'):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+
+    def test_unexpected_error_is_logged(self):
+        with mock.patch.object(GameService, 'submit_player_action', side_effect=RuntimeError('boom')), \
+                self.assertLogs('poker.views_async', 'ERROR') as logs:
+            response = self.client.post(self.url, '{"action": "fold"}', content_type='application/json')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('player_action_error', logs.output[0])
+
+
+@override_settings(POKER_AI_BACKGROUND=False, POKER_TURN_TIMEOUT=0, POKER_NEXT_HAND_DELAY=1, POKER_RECOVERY_GRACE=10)
+class StallRecoveryTests(TestCase):
+    """予定の処理を持っていたワーカーが止まったテーブルの再開"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'player{i}') for i in range(2)]
+        self.game = GameService.create_game('recovery', 2, 10, 20, self.users[0])
+        GameService.join_game(self.game, self.users[1])
+        self.client.force_login(self.users[0])
+
+    def _to_act(self, current_round):
+        current_round.refresh_from_db()
+        return Player.objects.get(game=self.game, position=current_round.current_player_position).user
+
+    @mock.patch('poker.services.game_service.scheduler')
+    def test_overdue_next_hand_is_started_on_state_read(self, scheduler):
+        GameService.start_game(self.game)
+        current_round = GameRound.objects.get(game=self.game)
+        with self.captureOnCommitCallbacks(execute=True):
+            GameService.submit_player_action(self.game.id, self._to_act(current_round), 'fold')
+        current_round.refresh_from_db()
+        self.assertEqual(current_round.phase, 'showdown')
+        self.assertIsNotNone(current_round.next_hand_at)
+
+        # 予定時刻を過ぎていても猶予の間は元のスケジューラに任せる
+        self.client.get(reverse('game_state', args=[self.game.id]))
+        self.assertEqual(GameRound.objects.filter(game=self.game).count(), 1)
+
+        # スケジューラを持っていたワーカーが止まった
+        GameRound.objects.filter(id=current_round.id).update(
+            next_hand_at=current_round.next_hand_at - timedelta(seconds=60)
+        )
+        with self.assertLogs('poker.services.recovery_service', 'WARNING'):
+            state = self.client.get(reverse('game_state', args=[self.game.id])).json()
+        current_round.refresh_from_db()
+        self.assertEqual(current_round.phase, 'finished')
+        self.assertEqual(state['round']['round_number'], 2)
+        self.assertEqual(state['round']['phase'], 'preflop')
+
+    @override_settings(POKER_AI_BACKGROUND=True)
+    def test_overdue_ai_turn_is_dispatched_again_on_state_read(self):
+        self.game.player_set.filter(user=self.users[1]).update(is_ai=True)
+        with mock.patch('poker.services.ai_executor.AITurnExecutor.submit') as submit:
+            GameService.start_game(self.game)
+            current_round = GameRound.objects.get(game=self.game)
+            # ヘッズアップのプリフロップはディーラー（作成者）から
+            with self.captureOnCommitCallbacks(execute=True):
+                GameService.submit_player_action(self.game.id, self._to_act(current_round), 'call')
+        submit.assert_called_with(self.game.id)
+        current_round.refresh_from_db()
+        self.assertTrue(Player.objects.get(game=self.game, position=current_round.current_player_position).is_ai)
+        self.assertIsNotNone(current_round.turn_deadline)
+
+        # AIワーカーを持っていたプロセスが止まった
+        GameRound.objects.filter(id=current_round.id).update(
+            turn_deadline=current_round.turn_deadline - timedelta(seconds=60)
+        )
+        with self.settings(POKER_AI_BACKGROUND=False), \
+                self.assertLogs('poker.services.recovery_service', 'WARNING'):
+            self.client.get(reverse('game_state', args=[self.game.id]))
+        self.assertTrue(PlayerAction.objects.filter(game_round__game=self.game, player__is_ai=True).exists())
+
+    @override_settings(POKER_TURN_TIMEOUT=30)
+    @mock.patch('poker.services.turn_clock.turn_wheel')
+    def test_turn_timeout_runs_on_the_worker_and_is_recovered_on_state_read(self, turn_wheel):
+        GameService.start_game(self.game)
+        current_round = GameRound.objects.get(game=self.game)
+        user = self._to_act(current_round)
+        key, timeout, callback, *args = turn_wheel.arm.call_args.args
+        self.assertEqual((key, timeout), (self.game.id, 30))
+
+        # ホイールのスレッドではワーカーに渡すだけ
+        with mock.patch('poker.services.ai_executor.AITurnExecutor.submit_task') as submit_task:
+            callback(*args)
+        submit_task.assert_called_once_with(TurnClock.expire, *args)
+        self.assertFalse(PlayerAction.objects.filter(game_round=current_round).exists())
+
+        # タイマーを持っていたプロセスが止まった
+        GameRound.objects.filter(id=current_round.id).update(
+            turn_deadline=current_round.turn_deadline - timedelta(seconds=60)
+        )
+        with self.assertLogs('poker.services', 'INFO'):
+            self.client.get(reverse('game_state', args=[self.game.id]))
+        self.assertTrue(Player.objects.get(game=self.game, user=user).is_folded)
+
+
+class OpponentStatsTests(TestCase):
+    """対戦相手の傾向の集計とキャッシュ"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='opponent')
+        OpponentStatsService.clear_cache()
+        self.addCleanup(OpponentStatsService.clear_cache)
+
+    def test_action_deltas(self):
+        deltas = OpponentStatsService.action_deltas
+        # オープンレイズ
+        self.assertEqual(deltas('preflop', 'raise', 20, True), {'vpip_hands': 1, 'pfr_hands': 1})
+        # 1回のレイズにコール
+        self.assertEqual(deltas('preflop', 'call', 40, False, preflop_raises=1),
+                         {'vpip_hands': 1, 'three_bet_chances': 1})
+        # 自分のレイズへのリレイズに対する4ベットはVPIP・PFRに数え直さない
+        self.assertEqual(deltas('preflop', 'raise', 80, True, preflop_raises=2, prior_actions=['raise']), {})
+        # ビッグブラインドのチェック
+        self.assertEqual(deltas('preflop', 'check', 0, False), {})
+        self.assertEqual(deltas('flop', 'raise', 0, True), {'aggressive_actions': 1})
+        self.assertEqual(deltas('turn', 'call', 50, False), {'passive_actions': 1, 'fold_to_bet_chances': 1})
+        self.assertEqual(deltas('river', 'fold', 50, False), {'fold_to_bet_chances': 1, 'folds_to_bet': 1})
+
+    def test_cache_is_updated_only_after_commit(self):
+        OpponentStatsService.record_hands_dealt([self.user.id])
+        self.assertEqual(OpponentStatsService.get_many([self.user.id])[self.user.id].hands, 1)
+
+        # ロールバックされた加算はキャッシュに残らない
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            OpponentStatsService.record({self.user.id: {'hands': 1, 'vpip_hands': 1}})
+            raise RuntimeError
+        stats = OpponentStatsService.get_many([self.user.id])[self.user.id]
+        self.assertEqual((stats.hands, stats.vpip_hands), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OpponentStatsService.record({self.user.id: {'hands': 1, 'vpip_hands': 1}})
+        stats = OpponentStatsService.get_many([self.user.id])[self.user.id]
+        self.assertEqual((stats.hands, stats.vpip_hands), (2, 1))
+        self.assertEqual(OpponentStats.objects.get(user=self.user).hands, 2)
+
+    def test_get_many_returns_copies(self):
+        OpponentStatsService.get_many([self.user.id])[self.user.id].hands = 100
+        self.assertEqual(OpponentStatsService.get_many([self.user.id])[self.user.id].hands, 0)
+
+
+class TimingWheelTests(SimpleTestCase):
+    """タイミングホイールの登録・置き換え・取消と周回"""
+
+    def setUp(self):
+        self.wheel = TimingWheel(tick=1, slots=4)
+        # ティックはテストから進める
+        patcher = mock.patch.object(self.wheel, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fired = []
+
+    def _advance(self, ticks):
+        for _ in range(ticks):
+            for callback, args in self.wheel._advance():
+                callback(*args)
+
+    def test_timers_fire_after_their_delay_including_extra_rounds(self):
+        self.wheel.arm('a', 2, self.fired.append, 'a')
+        self.wheel.arm('b', 6, self.fired.append, 'b')  # ホイールを1周以上
+        self.wheel.arm('c', 0.1, self.fired.append, 'c')  # 1ティック未満は1ティック後
+        self.assertEqual(self.wheel.pending_count(), 3)
+
+        self._advance(1)
+        self.assertEqual(self.fired, ['c'])
+        self._advance(1)
+        self.assertEqual(self.fired, ['c', 'a'])
+        self._advance(3)
+        self.assertEqual(self.fired, ['c', 'a'])
+        self._advance(1)
+        self.assertEqual(self.fired, ['c', 'a', 'b'])
+        self.assertEqual(self.wheel.pending_count(), 0)
+
+    def test_arm_replaces_and_cancel_removes_the_key_timer(self):
+        self.wheel.arm('a', 1, self.fired.append, 'first')
+        self.wheel.arm('a', 3, self.fired.append, 'second')
+        self.assertEqual(self.wheel.pending_count(), 1)
+        self._advance(2)
+        self.assertEqual(self.fired, [])
+        self._advance(1)
+        self.assertEqual(self.fired, ['second'])
+
+        self.wheel.arm('b', 1, self.fired.append, 'b')
+        self.assertTrue(self.wheel.cancel('b'))
+        self.assertFalse(self.wheel.cancel('b'))
+        self._advance(4)
+        self.assertEqual(self.fired, ['second'])
+
+    def test_callback_errors_do_not_stop_the_wheel_thread(self):
+        wheel = TimingWheel(tick=0.01, slots=8)
+        done = threading.Event()
+        with self.assertLogs('poker.utils.timing_wheel', 'ERROR'):
+            wheel.arm('a', 0.01, mock.Mock(side_effect=RuntimeError))
+            wheel.arm('b', 0.05, done.set)
+            self.assertTrue(done.wait(2))
+
+
+class StrategyTableTests(SimpleTestCase):
+    """mmapした戦略テーブルの書き出しと読み取り"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'strategy.bin')
+
+    def _open(self):
+        table = StrategyTable(self.path)
+        self.addCleanup(table.close)
+        return table
+
+    def test_state_key_and_index(self):
+        # コール20 / (ポット60 + 20) = 0.25、最高ベット40はBBの3倍まで
+        self.assertEqual(StrategyTable.state_key('flop', 1, 7.4, 20, 60, 40, 20), (1, 1, 6, 3, 2))
+        self.assertEqual(StrategyTable.state_key('preflop', 0, 10, 0, 30, 0, 20), (0, 0, 9, 0, 0))
+        self.assertIsNone(StrategyTable.state_key('showdown', 0, 5, 0, 0, 0, 20))
+        self.assertEqual(StrategyTable.index((0, 0, 0, 0, 0)), 0)
+        self.assertEqual(StrategyTable.index(tuple(size - 1 for size in DIMENSIONS)), ENTRY_COUNT - 1)
+        # ディーラーの次（3）が最も早く、ディーラー（2）が最も遅い
+        self.assertEqual(StrategyTable.position_bucket([0, 1, 2, 3, 4, 5], 2, 3), 0)
+        self.assertEqual(StrategyTable.position_bucket([0, 1, 2, 3, 4, 5], 2, 2), 2)
+
+    def test_written_totals_are_read_back(self):
+        key = (2, 1, 6, 3, 2)
+        StrategyTable.write(self.path, {key: [[10.0, 2], [3.0, 3], [0.0, 0]]})
+        table = self._open()
+        self.assertEqual(table.lookup(key), ((5.0, 1.0, 0.0), (2, 3, 0)))
+        self.assertEqual(table.best_action(key, min_samples=2), 'fold')
+        self.assertEqual(table.best_action(key, min_samples=3), 'call')
+        self.assertIsNone(table.best_action((0, 0, 0, 0, 0)))
+
+    def test_incompatible_or_truncated_files_are_rejected(self):
+        StrategyTable.write(self.path, {})
+        with open(self.path, 'r+b') as f:
+            f.truncate(100)
+        with self.assertRaises(ValueError):
+            StrategyTable(self.path)
+        with open(self.path, 'wb') as f:
+            f.write(b'XXXX' + bytes(200))
+        with self.assertRaises(ValueError):
+            StrategyTable(self.path)
+
+    def test_load_picks_up_tables_created_or_rebuilt_later(self):
+        key = (0, 0, 9, 0, 0)
+        self.assertIsNone(load_strategy_table(self.path))
+        StrategyTable.write(self.path, {key: [[0.0, 0], [1.0, 30], [0.0, 0]]})
+        table = load_strategy_table(self.path)
+        self.addCleanup(table.close)
+        self.assertIs(load_strategy_table(self.path), table)
+        self.assertEqual(table.best_action(key), 'call')
+
+        StrategyTable.write(self.path, {key: [[0.0, 0], [1.0, 30], [90.0, 30]]})
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        rebuilt = load_strategy_table(self.path)
+        self.addCleanup(rebuilt.close)
+        self.assertIsNot(rebuilt, table)
+        self.assertEqual(rebuilt.best_action(key), 'raise')
+
+
+class HandRangeTests(SimpleTestCase):
+    """ハンドレンジ表記とカード表記の解析"""
+
+    def test_range_notation_expands_to_combos(self):
+        for text, count in (
+            ('QQ+', 18), ('AKs', 4), ('AKo', 12), ('AK', 16), ('ATs+', 16),
+            ('A5s-A2s', 16), ('22-55', 24), ('KhQh', 1), ('random', 1326), ('qq+, ako', 30),
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(len(parse_range(text)), count)
+
+        self.assertEqual(parse_range('KhQh'), [tuple(sorted(_cards('Kh Qh')))])
+        self.assertEqual(sorted(parse_range('T9s')), sorted(parse_range('9Ts')))
+
+    def test_overlapping_and_dead_combos_are_removed(self):
+        self.assertEqual(len(parse_range('AKs, AhKh')), 4)
+        self.assertEqual(len(parse_range('QQ+, KK')), 18)
+        combos = parse_range('AA, AKs', dead_cards=_cards('Ah'))
+        self.assertEqual(len(combos), 3 + 3)
+        self.assertTrue(all(_cards('Ah')[0] not in combo for combo in combos))
+
+    def test_invalid_notation_is_rejected(self):
+        for text in ('', 'AAs', 'XY', 'AK-QJ', 'A5s-A2o', 'AKx'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_range(text)
+
+    def test_card_notation(self):
+        self.assertEqual(parse_cards('Ah 10d, 2c'), _cards('Ah Td 2c'))
+        self.assertEqual(parse_cards(''), [])
+        for text in ('AhAh', 'Ax', 'Ah1'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_cards(text)
+
+
+class OutsCalculatorTests(SimpleTestCase):
+    """アウツとドローの計算"""
+
+    def _brute_force(self, hole, board, count):
+        """count枚を足した全組み合わせを評価器で判定し、役が上がる割合を求める"""
+        category = FastHandEvaluator.category
+        evaluate = FastHandEvaluator.evaluate
+        current = category(evaluate(hole + board))
+        remaining = [card for card in range(52) if card not in hole + board]
+        improved = total = 0
+        for cards in itertools.combinations(remaining, count):
+            total += 1
+            made = category(evaluate(hole + board + list(cards)))
+            board_only = category(evaluate(board + list(cards))) if len(board) + count >= 5 else -1
+            if made > current and made > board_only:
+                improved += 1
+        return improved / total
+
+    def test_flush_draw(self):
+        hole, board = _cards('Ah Kh'), _cards('2h 7h Qc')
+        result = OutsCalculator.calculate(hole, board)
+        self.assertEqual(result['category'], 'High Card')
+        # エースかキングでワンペア、ハートでフラッシュ（ボードのペアになるだけのカードは含まない）
+        self.assertEqual(result['outs'], {'One Pair': 6, 'Flush': 9})
+        self.assertEqual(result['total_outs'], 15)
+        self.assertAlmostEqual(result['one_card'], 15 / 47)
+        self.assertAlmostEqual(result['two_cards'], self._brute_force(hole, board, 2))
+        self.assertEqual(result['draws'], {'flush_draw': True, 'open_ended': False, 'gutshot': False})
+
+    def test_open_ended_straight_draw(self):
+        hole, board = _cards('9h 8d'), _cards('7c 6s 2d')
+        result = OutsCalculator.calculate(hole, board)
+        self.assertEqual(result['outs'], {'One Pair': 6, 'Straight': 8})
+        self.assertEqual(result['draws'], {'flush_draw': False, 'open_ended': True, 'gutshot': False})
+        self.assertAlmostEqual(result['two_cards'], self._brute_force(hole, board, 2))
+        # ストレート以上の8アウツをリバーまでに引く確率
+        self.assertAlmostEqual(OutsCalculator.draw_probability(hole, board), 1 - 39 / 47 * 38 / 46)
+
+    def test_turn_outs(self):
+        hole, board = _cards('9h 8d'), _cards('7c 6s 2d Kh')
+        result = OutsCalculator.calculate(hole, board)
+        self.assertEqual(result['outs'], {'One Pair': 6, 'Straight': 8})
+        self.assertIsNone(result['two_cards'])
+        self.assertAlmostEqual(result['one_card'], self._brute_force(hole, board, 1))
+        self.assertEqual(OutsCalculator.draws(_cards('Jh 9d'), _cards('Qc 8s 2d'))['gutshot'], True)
+
+    def test_requires_a_flop_or_turn(self):
+        with self.assertRaises(ValueError):
+            OutsCalculator.calculate(_cards('Ah Kh'), _cards('2h 7h Qc Jd 3s'))
+        with self.assertRaises(ValueError):
+            OutsCalculator.calculate(_cards('Ah'), _cards('2h 7h Qc'))
+
+
+class RangeTrackerTests(SimpleTestCase):
+    """アクション履歴によるレンジの更新とレンジに対するエクイティ"""
+
+    def _weights(self, text):
+        combos = set(parse_range(text))
+        return np.array([1.0 if combo in combos else 0.0 for combo in ALL_COMBOS], dtype=np.float32)
+
+    def _weight_of(self, weights, text):
+        return weights[ALL_COMBOS.index(tuple(sorted(_cards(text))))]
+
+    def test_preflop_raise_shifts_weight_to_strong_hands(self):
+        weights = {}
+        RangeTracker._apply(weights, 1, 'raise', 'preflop', [], None)
+        self.assertAlmostEqual(float(weights[1].sum()), 1.0, places=4)
+        self.assertGreater(self._weight_of(weights[1], 'Ah As'), 10 * self._weight_of(weights[1], '7h 2c'))
+
+        RangeTracker._apply(weights, 2, 'fold', 'preflop', [], None)
+        self.assertLess(self._weight_of(weights[2], 'Ah As'), self._weight_of(weights[2], '7h 2c'))
+
+    def test_postflop_raise_is_weighed_by_strength_on_the_board(self):
+        weights = {}
+        board = _cards('Ah Kd 7c')
+        RangeTracker._apply(weights, 1, 'call', 'preflop', board, None)
+        # プリフロップのアクションはボードが出る前の順位で評価する
+        self.assertGreater(self._weight_of(weights[1], 'Ac Kc'), self._weight_of(weights[1], '3h 2d'))
+        RangeTracker._apply(weights, 1, 'raise', 'flop', board, None)
+        self.assertGreater(self._weight_of(weights[1], '7h 7d'), self._weight_of(weights[1], 'Ac Kc'))
+        self.assertGreater(self._weight_of(weights[1], 'Ac Kc'), 10 * self._weight_of(weights[1], '3h 2d'))
+
+    def test_equity_against_a_fixed_range(self):
+        # AA対KKはおよそ82%
+        equity, samples = RangeTracker.equity_against(
+            _cards('Ah As'), [], [self._weights('KK')], min_samples=4000, max_samples=4000, seed=1
+        )
+        self.assertGreaterEqual(samples, 4000)
+        self.assertAlmostEqual(equity, 0.82, delta=0.03)
+
+        (aces, _), (kings, _) = RangeTracker.equities_against(
+            [(1, _cards('Ah As')), (2, _cards('Kh Ks'))], [],
+            [(1, self._weights('AA')), (2, self._weights('KK'))], min_samples=4000, max_samples=4000, seed=1
+        )
+        self.assertAlmostEqual(aces, 0.82, delta=0.03)
+        self.assertAlmostEqual(kings, 0.18, delta=0.03)
+
+
+@override_settings(POKER_AI_BACKGROUND=False, POKER_TURN_TIMEOUT=0)
+class ChipServiceTests(TestCase):
+    """チップの移動と台帳"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'player{i}') for i in range(3)]
+        self.game = GameService.create_game('chips', 3, 10, 20, self.users[0])
+        for user in self.users[1:]:
+            GameService.join_game(self.game, user)
+
+    def _chips_in_play(self):
+        self.game.refresh_from_db()
+        return sum(Player.objects.filter(game=self.game).values_list('chips', flat=True)) + self.game.pot
+
+    def test_transfers_update_balances_and_the_ledger(self):
+        first, second, _ = Player.objects.filter(game=self.game).order_by('position')
+        total = self._chips_in_play()
+
+        ChipService.apply(self.game, {first: -50, second: -30})
+        ChipService.apply(self.game, {second: 80})
+        ChipService.transfer_to_pot(self.game, first, 5, 'penalty')
+
+        self.assertEqual(self._chips_in_play(), total)
+        self.assertEqual(self.game.pot, 5)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.chips, second.chips), (total // 3 - 55, total // 3 + 50))
+        self.assertEqual(
+            list(ChipTransfer.objects.filter(game=self.game).order_by('id').values_list('player_id', 'amount', 'reason')),
+            [(first.id, -50, 'bet'), (second.id, -30, 'bet'), (second.id, 80, 'award'), (first.id, -5, 'penalty')]
+        )
+
+    @mock.patch('poker.services.game_service.scheduler')
+    def test_ledger_balances_the_pot_through_a_hand(self, scheduler):
+        total = self._chips_in_play()
+        GameService.start_game(self.game)
+        current_round = GameRound.objects.get(game=self.game)
+        self.assertEqual(sum(ChipTransfer.objects.filter(game=self.game).values_list('amount', flat=True)), -30)
+
+        for _ in range(2):
+            current_round.refresh_from_db()
+            if current_round.phase == 'showdown':
+                break
+            user = Player.objects.get(game=self.game, position=current_round.current_player_position).user
+            with self.captureOnCommitCallbacks(execute=True):
+                GameService.submit_player_action(self.game.id, user, 'fold')
+
+        current_round.refresh_from_db()
+        self.assertEqual(current_round.phase, 'showdown')
+        self.assertEqual(self._chips_in_play(), total)
+        self.assertEqual(self.game.pot, 0)
+        # ポットへの移動と払い戻しの合計は0
+        self.assertEqual(sum(ChipTransfer.objects.filter(game=self.game).values_list('amount', flat=True)), 0)
+
+
+class TableBalancerTests(SimpleTestCase):
+    """テーブルの移動・解散の計画"""
+
+    def test_balances_to_within_one_player(self):
+        self.assertEqual(TableBalancer.plan(1, {1: 8, 2: 5}, 9), ([(2, 1)], False))
+        self.assertEqual(TableBalancer.plan(1, {1: 6, 2: 5, 3: 2}, 6), ([(3, 2)], False))
+
+    def test_needed_tables_are_kept(self):
+        # 21人は9人掛けで3テーブル必要なので、3人のテーブルも解散しない
+        self.assertEqual(TableBalancer.plan(3, {1: 9, 2: 9, 3: 3}, 9), ([], False))
+        self.assertEqual(TableBalancer.plan(1, {1: 5}, 9), ([], False))
+
+    def test_surplus_table_is_broken_into_the_smallest_tables(self):
+        self.assertEqual(TableBalancer.plan(3, {1: 7, 2: 7, 3: 3}, 9), ([(1, 2), (2, 1)], True))
+        self.assertEqual(TableBalancer.plan(3, {1: 8, 2: 6, 3: 2}, 9), ([(2, 2)], True))
+
+
+@override_settings(POKER_AI_BACKGROUND=False, POKER_TURN_TIMEOUT=0)
+class TournamentTests(TestCase):
+    """トーナメントの脱落の順位とテーブルの解散"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f'player{i}') for i in range(5)]
+        self.tournament = TournamentService.create_tournament(
+            'mtt', self.users[0], table_size=3, level_duration=0
+        )
+        for user in self.users:
+            TournamentService.register(self.tournament, user)
+
+    def _bust(self, players):
+        """playersの順に多く投入してチップを失ったことにする"""
+        for total_bet, player in zip(range(len(players) * 100, 0, -100), players):
+            Player.objects.filter(id=player.id).update(chips=0, total_bet=total_bet)
+
+    def _finish_position(self, player):
+        return TournamentEntry.objects.get(tournament=self.tournament, user_id=player.user_id).finish_position
+
+    def test_eliminations_are_ranked_and_surplus_tables_broken(self):
+        games = TournamentService.start(self.tournament, rng=random.Random(0))
+        self.assertEqual(sorted(game.player_set.count() for game in games), [2, 3])
+        large, small = sorted(games, key=lambda game: -game.player_set.count())
+
+        # 3人のテーブルで2人が同じハンドで脱落すると、多く投入した方が上位
+        first_out, second_out, survivor = large.player_set.order_by('position')
+        self._bust([second_out, first_out])
+        self.assertFalse(TournamentService.on_hand_finished(large, rng=random.Random(0)))
+        self.assertEqual((self._finish_position(second_out), self._finish_position(first_out)), (4, 5))
+
+        # 残り3人は1テーブルに収まるので、脱落の出たテーブルを解散して移る
+        large.refresh_from_db()
+        self.assertEqual(large.status, 'finished')
+        survivor.refresh_from_db()
+        self.assertEqual(survivor.game_id, small.id)
+        self.assertTrue(survivor.is_folded)
+        self.assertEqual(small.player_set.count(), 3)
+
+        third_out, *winner = small.player_set.exclude(id=survivor.id)
+        self._bust([survivor, third_out])
+        self.assertFalse(TournamentService.on_hand_finished(small, rng=random.Random(0)))
+        self.tournament.refresh_from_db()
+        self.assertEqual(self.tournament.status, 'finished')
+        self.assertEqual(
+            (self._finish_position(winner[0]), self._finish_position(survivor), self._finish_position(third_out)),
+            (1, 2, 3)
+        )
+
+
+class ICMServiceTests(SimpleTestCase):
+    """ICM（Malmuth-Harville）のエクイティ"""
+
+    def test_three_player_split(self):
+        # 1位の確率はチップに比例し、2位以下は残りのチップに比例する
+        # P1: 50*0.5 + 30*(0.3*5/7 + 0.2*5/8) + 20*(1 - 0.5 - 0.3*5/7 - 0.2*5/8)
+        equities = ICMService.equities([5000, 3000, 2000], [50, 30, 20])
+        for equity, expected in zip(equities, (38.392857, 32.75, 28.857143)):
+            self.assertAlmostEqual(equity, expected, places=5)
+
+    def test_busted_players_get_nothing(self):
+        self.assertEqual(ICMService.equities([5000, 0, 2000], [50, 30, 20])[1], 0.0)
+        self.assertAlmostEqual(sum(ICMService.equities([5000, 0, 2000], [50, 30, 20])), 80)
+        self.assertEqual(ICMService.equities([1000, 1000], []), [0.0, 0.0])
+
+    def test_monte_carlo_matches_the_exact_split(self):
+        stacks, payouts = [5000, 3000, 2000, 1000, 500, 500], [50, 30, 20]
+        exact = ICMService.equities(stacks, payouts)
+        estimated = ICMService.monte_carlo_equities(stacks, payouts, samples=200000, seed=1)
+        for value, expected in zip(estimated, exact):
+            self.assertAlmostEqual(value, expected, delta=0.3)
+        self.assertAlmostEqual(sum(estimated), 100)
+
+    def test_required_equity(self):
+        # 勝者総取りならチップの割合どおり（1000 / 2150）
+        self.assertAlmostEqual(ICMService.required_equity((1000, 0), (1000, 0), [], 150, (1.0,)), 1000 / 2150)
+        # 賞金が分かれるとチップを失う痛手が大きく、より高い勝率が必要
+        self.assertGreater(ICMService.required_equity((1000, 0), (1000, 0), [1000], 150, (0.5, 0.3, 0.2)), 0.7)
+
+    def test_payout_structure(self):
+        self.assertEqual(ICMService.payout_structure(5), (0.65, 0.35))
+        payouts = ICMService.payout_structure(100)
+        self.assertEqual(len(payouts), 15)
+        self.assertAlmostEqual(sum(payouts), 1)
+        self.assertEqual(list(payouts), sorted(payouts, reverse=True))
+
+
+class RequestProfilerTests(TestCase):
+    """スタッフ向けのリクエストのプロファイル"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(POKER_PROFILE_DIR=self.directory, POKER_PROFILE_SAMPLE_INTERVAL=0.0005)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create(username='player')
+        self.staff = User.objects.create(username='staff', is_staff=True)
+
+    def test_only_staff_requests_are_profiled(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'), {'profile': '1'})
+        self.assertEqual(response['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(os.listdir(self.directory), [])
+
+        self.client.force_login(self.staff)
+        with self.assertLogs('poker.middleware', 'INFO'):
+            summary = self.client.get(reverse('home'), HTTP_X_PROFILE='cprofile').json()
+        self.assertEqual((summary['path'], summary['status'], summary['mode']), ('/', 200, 'cprofile'))
+        self.assertGreater(summary['sql']['queries'], 0)
+        self.assertTrue(any('poker/views.py' in entry['function'] for entry in summary['project_functions']))
+        self.assertTrue(os.path.exists(summary['profile_file']))
+        self.assertTrue(summary['profile_file'].endswith('.prof'))
+
+    def test_sampling_mode_and_unknown_modes(self):
+        self.client.force_login(self.staff)
+        with self.assertLogs('poker.middleware', 'INFO'):
+            summary = self.client.get(reverse('home'), {'profile': 'sample'}).json()
+        self.assertTrue(summary['profile_file'].endswith('.folded'))
+        self.assertEqual(self.client.get(reverse('home'), {'profile': 'bogus'}).status_code, 400)
+
+
+class MetricsTests(TestCase):
+    """運用メトリクスの集計・Prometheus形式とアクセス制限"""
+
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        MetricsService._games = None
+        self.addCleanup(setattr, MetricsService, '_games', None)
+
+    def test_minute_window(self):
+        window = _MinuteWindow()
+        window.add(100.2, 1)
+        window.add(100.9, 2)
+        window.add(130, 1)
+        self.assertEqual(window.total(130), 4)
+        self.assertEqual(window.total(159.9), 4)
+        self.assertEqual(window.total(160), 1)
+        # 同じバケットは60秒後に使い回す
+        window.add(160, 5)
+        self.assertEqual(window.total(160), 6)
+        self.assertEqual(window.total(220), 0)
+
+    def test_prometheus_format(self):
+        self.assertEqual(format_labels(()), '')
+        self.assertEqual(format_labels((('action', 'fold'), ('le', 0.5))), '{action="fold",le="0.5"}')
+
+        metrics.inc('actions', action='fold')
+        metrics.inc('actions', 2, action='raise')
+        metrics.observe('ai_decision_seconds', 0.003, strategy='basic')
+        metrics.observe('ai_decision_seconds', 2.0, strategy='basic')
+        lines = MetricsService.prometheus().splitlines()
+
+        for line in (
+            'poker_games_in_progress 0',
+            'poker_hands_started_total 0',
+            'poker_actions_total{action="fold"} 1',
+            'poker_actions_total{action="raise"} 2',
+            'poker_actions_per_minute{action="raise"} 2',
+            'poker_ai_decision_seconds_bucket{strategy="basic",le="0.0025"} 0',
+            'poker_ai_decision_seconds_bucket{strategy="basic",le="0.005"} 1',
+            'poker_ai_decision_seconds_bucket{strategy="basic",le="1.0"} 1',
+            'poker_ai_decision_seconds_bucket{strategy="basic",le="+Inf"} 2',
+            'poker_ai_decision_seconds_sum{strategy="basic"} 2.003000',
+            'poker_ai_decision_seconds_count{strategy="basic"} 2',
+            '# TYPE poker_ai_decision_seconds histogram',
+        ):
+            self.assertIn(line, lines)
+        self.assertTrue(any(line.startswith('poker_pending_tasks{queue="ai_executor"} ') for line in lines))
+        self.assertTrue(any(line.startswith('poker_cache_hit_ratio{cache="opponent_stats"} ') for line in lines))
+
+    @override_settings(POKER_METRICS_TOKEN='secret')
+    def test_metrics_require_staff_or_token(self):
+        for name in ('operational_metrics', 'trace_metrics'):
+            url = reverse(name)
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(url).status_code, 403)
+                self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+                self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+                self.client.force_login(User.objects.get_or_create(username='player')[0])
+                self.assertEqual(self.client.get(url).status_code, 403)
+                self.client.force_login(User.objects.get_or_create(username='staff', is_staff=True)[0])
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.client.logout()
+
+    @override_settings(POKER_METRICS_TOKEN='')
+    def test_empty_token_does_not_grant_access(self):
+        response = self.client.get(reverse('operational_metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
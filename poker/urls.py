@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, views_async
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -13,5 +13,10 @@ urlpatterns = [
     path('game/<int:game_id>/end/', views.end_game, name='end_game'),
     path('game/<int:game_id>/add-ai/', views.add_ai_player, name='add_ai_player'),
     path('game/<int:game_id>/start/', views.start_game, name='start_game'),
-    path('game/<int:game_id>/action/', views.player_action, name='player_action'),
+    path('game/<int:game_id>/action/', views_async.player_action, name='player_action'),
+    path('game/<int:game_id>/state/', views_async.game_state, name='game_state'),
+    path('game/<int:game_id>/state/poll/', views_async.game_state_poll, name='game_state_poll'),
+    path('tools/equity/', views_async.equity_calculator, name='equity_calculator'),
+    path('metrics/', views_async.operational_metrics, name='operational_metrics'),
+    path('metrics/traces/', views_async.trace_metrics, name='trace_metrics'),
 ]
@@ -0,0 +1,166 @@
+"""
+整数エンコードされたカードを使う高速ハンド評価
+"""
+
+# カードは rank_index * 4 + suit_index の整数（0-51）で表す（順序はCard.RANKS / Card.SUITSと同じ）
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+SUITS = ['hearts', 'diamonds', 'clubs', 'spades']
+RANK_INDEX = {rank: i for i, rank in enumerate(RANKS)}
+SUIT_INDEX = {suit: i for i, suit in enumerate(SUITS)}
+FULL_DECK = tuple(range(52))
+
+# 役のカテゴリ（PokerHand.hand_rankと同じ順序、ロイヤルフラッシュはストレートフラッシュに含む）
+HIGH_CARD = 0
+ONE_PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+
+CATEGORY_NAMES = [
+    'High Card', 'One Pair', 'Two Pair', 'Three of a Kind',
+    'Straight', 'Flush', 'Full House', 'Four of a Kind', 'Straight Flush'
+]
+
+CATEGORY_SHIFT = 20
+
+
+def _build_straight_table():
+    """ランクのビットマスクごとのストレート最高位ランク（なければ-1）"""
+    table = [-1] * 8192
+    windows = [(high, 0b11111 << (high - 4)) for high in range(12, 3, -1)]
+    wheel = (1 << 12) | 0b1111  # A-2-3-4-5
+    for mask in range(8192):
+        for high, window in windows:
+            if mask & window == window:
+                table[mask] = high
+                break
+        else:
+            if mask & wheel == wheel:
+                table[mask] = 3
+    return table
+
+
+STRAIGHT_TABLE = _build_straight_table()
+POPCOUNT = [bin(mask).count('1') for mask in range(8192)]
+
+
+def _top_ranks(mask, count):
+    """ビットマスクから上位count個のランクを取得"""
+    ranks = []
+    rank = 12
+    while rank >= 0 and len(ranks) < count:
+        if mask & (1 << rank):
+            ranks.append(rank)
+        rank -= 1
+    return ranks
+
+
+def _pack(category, ranks):
+    """カテゴリとランク列を比較可能な整数にまとめる"""
+    score = category << CATEGORY_SHIFT
+    shift = 16
+    for rank in ranks:
+        score |= rank << shift
+        shift -= 4
+    return score
+
+
+class FastHandEvaluator:
+    """5〜7枚のカードから比較可能なスコアを計算する"""
+
+    @staticmethod
+    def card_to_int(card):
+        """Cardオブジェクトを整数に変換"""
+        return RANK_INDEX[card.rank] * 4 + SUIT_INDEX[card.suit]
+
+    @staticmethod
+    def cards_to_ints(cards):
+        """Cardオブジェクトのリストを整数のリストに変換"""
+        return [RANK_INDEX[card.rank] * 4 + SUIT_INDEX[card.suit] for card in cards]
+
+    @staticmethod
+    def int_to_card(value):
+        """整数をCardオブジェクトに変換"""
+        from ..models import Card
+        return Card(SUITS[value & 3], RANKS[value >> 2])
+
+    @staticmethod
+    def category(score):
+        """スコアから役のカテゴリを取得"""
+        return score >> CATEGORY_SHIFT
+
+    @staticmethod
+    def hand_rank(cards):
+        """PokerHand.hand_rankと同じ値（0-9、ロイヤルフラッシュは9）を取得"""
+        score = FastHandEvaluator.evaluate(cards)
+        category = score >> CATEGORY_SHIFT
+        if category == STRAIGHT_FLUSH and (score >> 16) & 0xF == 12:
+            return 9
+        return category
+
+    @staticmethod
+    def evaluate(cards):
+        """整数カードのリストから最良5枚のスコアを計算（大きいほど強い）"""
+        counts = [0] * 13
+        suit_masks = [0, 0, 0, 0]
+        for card in cards:
+            rank = card >> 2
+            counts[rank] += 1
+            suit_masks[card & 3] |= 1 << rank
+
+        # フラッシュ・ストレートフラッシュ
+        flush_score = 0
+        for mask in suit_masks:
+            if POPCOUNT[mask] >= 5:
+                high = STRAIGHT_TABLE[mask]
+                if high >= 0:
+                    return _pack(STRAIGHT_FLUSH, [high])
+                flush_score = _pack(FLUSH, _top_ranks(mask, 5))
+                break
+
+        quads = -1
+        trips = []
+        pairs = []
+        for rank in range(12, -1, -1):
+            count = counts[rank]
+            if count == 4:
+                quads = rank
+            elif count == 3:
+                trips.append(rank)
+            elif count == 2:
+                pairs.append(rank)
+
+        rank_mask = suit_masks[0] | suit_masks[1] | suit_masks[2] | suit_masks[3]
+
+        if quads >= 0:
+            kicker = _top_ranks(rank_mask & ~(1 << quads), 1)
+            return _pack(FOUR_OF_A_KIND, [quads] + kicker)
+
+        if trips and (len(trips) >= 2 or pairs):
+            pair = max(trips[1] if len(trips) >= 2 else -1, pairs[0] if pairs else -1)
+            return _pack(FULL_HOUSE, [trips[0], pair])
+
+        if flush_score:
+            return flush_score
+
+        high = STRAIGHT_TABLE[rank_mask]
+        if high >= 0:
+            return _pack(STRAIGHT, [high])
+
+        if trips:
+            kickers = _top_ranks(rank_mask & ~(1 << trips[0]), 2)
+            return _pack(THREE_OF_A_KIND, [trips[0]] + kickers)
+
+        if len(pairs) >= 2:
+            kicker = _top_ranks(rank_mask & ~(1 << pairs[0]) & ~(1 << pairs[1]), 1)
+            return _pack(TWO_PAIR, [pairs[0], pairs[1]] + kicker)
+
+        if pairs:
+            kickers = _top_ranks(rank_mask & ~(1 << pairs[0]), 3)
+            return _pack(ONE_PAIR, [pairs[0]] + kickers)
+
+        return _pack(HIGH_CARD, _top_ranks(rank_mask, 5))
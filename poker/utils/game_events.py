@@ -0,0 +1,90 @@
+"""
+ゲーム状態のバージョン管理とロングポーリング用の待ち合わせ
+"""
+import asyncio
+import threading
+from django.db.models import F
+from django.dispatch import receiver
+
+from ..signals import board_revealed, game_state_changed
+
+
+class GameEvents:
+    """ゲームごとの状態バージョン（Gameのstate_version）を進め、変更を待機中のリクエストに通知
+
+    バージョンはDBに持つので、どのワーカープロセスで取得した値とも比較できる。
+    同じプロセスでの変更は待機中のリクエストをすぐに起こし、他のプロセスでの変更は
+    SHARED_CHECK_INTERVALごとにDBのバージョンを確認して拾う。
+    """
+
+    SHARED_CHECK_INTERVAL = 1.0  # 他のプロセスでの変更を確認する間隔（秒）
+
+    _waiters = {}  # game_id -> {(loop, future)}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def version(game_id):
+        """ゲームの現在の状態バージョンを取得"""
+        from ..models import Game
+        return Game.objects.filter(id=game_id).values_list('state_version', flat=True).first() or 0
+
+    @staticmethod
+    async def aversion(game_id):
+        """versionの非同期版"""
+        from ..models import Game
+        return await Game.objects.filter(id=game_id).values_list('state_version', flat=True).afirst() or 0
+
+    @classmethod
+    def publish(cls, game_id):
+        """状態バージョンを進め、このプロセスで待機中のリクエストを起こす（同期コンテキストのどのスレッドからでも呼べる）"""
+        from ..models import Game
+        Game.objects.filter(id=game_id).update(state_version=F('state_version') + 1)
+
+        with cls._lock:
+            waiters = cls._waiters.pop(game_id, set())
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(cls._wake, future)
+
+    @classmethod
+    async def wait_for_change(cls, game_id, since, timeout):
+        """バージョンがsinceから変わるかタイムアウトするまで待ち、最新バージョンを返す"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        while True:
+            future = loop.create_future()
+            waiter = (loop, future)
+            # 確認とpublishの間の通知を取りこぼさないよう、先に登録してからDBを読む
+            with cls._lock:
+                cls._waiters.setdefault(game_id, set()).add(waiter)
+            try:
+                current = await cls.aversion(game_id)
+                remaining = deadline - loop.time()
+                if current != since or remaining <= 0:
+                    return current
+                try:
+                    await asyncio.wait_for(future, min(remaining, cls.SHARED_CHECK_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with cls._lock:
+                    waiters = cls._waiters.get(game_id)
+                    if waiters is not None:
+                        waiters.discard(waiter)
+                        if not waiters:
+                            del cls._waiters[game_id]
+
+    @staticmethod
+    def _wake(future):
+        if not future.done():
+            future.set_result(None)
+
+
+@receiver(game_state_changed)
+def _on_game_state_changed(sender, game_id, **kwargs):
+    GameEvents.publish(game_id)
+
+
+@receiver(board_revealed)
+def _on_board_revealed(sender, game_id, round_id, count, **kwargs):
+    GameEvents.publish(game_id)
@@ -0,0 +1,134 @@
+"""
+ハンドレンジ表記（"QQ+, AKs, A5s-A2s, KhQh" など）の解析
+"""
+import re
+
+from .fast_evaluator import FULL_DECK
+
+RANK_CHARS = '23456789TJQKA'
+SUIT_CHARS = 'hdcs'  # hearts, diamonds, clubs, spades（Card.SUITSと同じ順）
+
+ALL_COMBOS = [(a, b) for i, a in enumerate(FULL_DECK) for b in FULL_DECK[i + 1:]]
+
+_HAND_PATTERN = re.compile(r'^([2-9TJQKA])([2-9TJQKA])([so]?)$')
+_CARD_PATTERN = re.compile(r'(10|[2-9TJQKA])([hdcs])')
+_EXPLICIT_HAND_PATTERN = re.compile(r'((10|[2-9TJQKA])[hdcs]){2}')
+
+
+def _rank(char):
+    return RANK_CHARS.index(char)
+
+
+def _card(rank, suit):
+    return rank * 4 + suit
+
+
+def parse_cards(text):
+    """"AhKd7c" のようなカード表記を整数カードのリストに変換"""
+    text = (text or '').replace(' ', '').replace(',', '')
+    cards = []
+    position = 0
+    while position < len(text):
+        match = _CARD_PATTERN.match(text, position)
+        if not match:
+            raise ValueError(f'Invalid card: {text[position:position + 2]}')
+        rank = 'T' if match.group(1) == '10' else match.group(1)
+        cards.append(_card(_rank(rank), SUIT_CHARS.index(match.group(2))))
+        position = match.end()
+    if len(set(cards)) != len(cards):
+        raise ValueError('Duplicate cards')
+    return cards
+
+
+def _hand_combos(high, low, suited):
+    """ランクの組み合わせから具体的なコンボを列挙（suited: True / False / None=両方）"""
+    combos = []
+    if high == low:
+        for s1 in range(4):
+            for s2 in range(s1 + 1, 4):
+                combos.append((_card(high, s1), _card(high, s2)))
+        return combos
+    for s1 in range(4):
+        for s2 in range(4):
+            if suited is True and s1 != s2:
+                continue
+            if suited is False and s1 == s2:
+                continue
+            combos.append((_card(high, s1), _card(low, s2)))
+    return combos
+
+
+def _parse_hand(token):
+    """"AKs" を (high, low, suited) に変換"""
+    match = _HAND_PATTERN.match(token)
+    if not match:
+        raise ValueError(f'Invalid hand: {token}')
+    high, low = _rank(match.group(1)), _rank(match.group(2))
+    if high < low:
+        high, low = low, high
+    suited = {'s': True, 'o': False, '': None}[match.group(3)]
+    if high == low and suited is not None:
+        raise ValueError(f'Pairs cannot be suited or offsuit: {token}')
+    return high, low, suited
+
+
+def _expand_token(token):
+    """1つの表記をランクの組み合わせ (high, low, suited) のリストに展開"""
+    if token.endswith('+'):
+        high, low, suited = _parse_hand(token[:-1])
+        if high == low:
+            # "QQ+" -> QQ, KK, AA
+            return [(rank, rank, None) for rank in range(high, len(RANK_CHARS))]
+        # "ATs+" -> ATs, AJs, AQs, AKs
+        return [(high, kicker, suited) for kicker in range(low, high)]
+
+    if '-' in token:
+        first, last = token.split('-', 1)
+        high1, low1, suited1 = _parse_hand(first)
+        high2, low2, suited2 = _parse_hand(last)
+        if suited1 != suited2:
+            raise ValueError(f'Invalid range: {token}')
+        if high1 == low1 and high2 == low2:
+            # "22-55"
+            start, end = sorted((high1, high2))
+            return [(rank, rank, None) for rank in range(start, end + 1)]
+        if high1 != high2:
+            raise ValueError(f'Invalid range: {token}')
+        # "A5s-A2s"
+        start, end = sorted((low1, low2))
+        return [(high1, kicker, suited1) for kicker in range(start, end + 1)]
+
+    return [_parse_hand(token)]
+
+
+def parse_range(text, dead_cards=()):
+    """レンジ表記を重複のないコンボ (card1, card2) のリストに変換
+
+    "random" / "any" は全1326通り。"AhKh" のような具体的なハンドも指定できる。
+    dead_cardsを含むコンボは除外する。
+    """
+    dead = set(dead_cards)
+    combos = []
+    seen = set()
+    tokens = [token for token in re.split(r'[,\s]+', text or '') if token]
+    if not tokens:
+        raise ValueError('Empty range')
+
+    for token in tokens:
+        if token.lower() in ('random', 'any'):
+            candidates = ALL_COMBOS
+        elif _EXPLICIT_HAND_PATTERN.fullmatch(token):
+            candidates = [tuple(sorted(parse_cards(token)))]
+        else:
+            candidates = []
+            for high, low, suited in _expand_token(token.upper().replace('S', 's').replace('O', 'o')):
+                candidates.extend(_hand_combos(high, low, suited))
+
+        for combo in candidates:
+            combo = tuple(sorted(combo))
+            if combo in seen or combo[0] in dead or combo[1] in dead:
+                continue
+            seen.add(combo)
+            combos.append(combo)
+
+    return combos
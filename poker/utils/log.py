@@ -0,0 +1,130 @@
+"""
+構造化ログ（レベル・遅延書式化・サンプリング・キュー経由の非同期出力）
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+
+class StructuredLogger:
+    """イベント名とフィールドで記録するロガー
+
+    レベルが無効な場合は何もせず、フィールドのJSON化は出力スレッドで行う。
+    フィールドには読み込み済みの値（IDなど）を渡し、外部キーをたどらないようにする。
+    """
+
+    def __init__(self, name):
+        self._logger = logging.getLogger(name)
+
+    def is_enabled(self, level=logging.DEBUG):
+        return self._logger.isEnabledFor(level)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def debug_sampled(self, event, **fields):
+        """アクションごとの詳細イベント（POKER_LOG_SAMPLE_RATEの割合だけ記録）"""
+        if self._logger.isEnabledFor(logging.DEBUG):
+            rate = getattr(settings, 'POKER_LOG_SAMPLE_RATE', 1.0)
+            if rate >= 1 or random.random() < rate:
+                self._log(logging.DEBUG, event, fields, sample_rate=rate)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event, **fields):
+        """例外のトレースバック付きでエラーを記録（exceptブロック内で呼ぶ）"""
+        self._log(logging.ERROR, event, fields, exc_info=True)
+
+    def _log(self, level, event, fields, exc_info=None, sample_rate=None):
+        if not self._logger.isEnabledFor(level):
+            return
+        if sample_rate is not None and sample_rate < 1:
+            fields['sample_rate'] = sample_rate
+        self._logger.log(level, event, exc_info=exc_info, extra={'fields': fields}, stacklevel=3)
+
+
+def get_logger(name):
+    """モジュール用の構造化ロガーを取得"""
+    return StructuredLogger(name)
+
+
+class StructuredFormatter(logging.Formatter):
+    """1レコードを1行のJSONに書式化"""
+
+    def format(self, record):
+        data = {
+            'ts': round(record.created, 6),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        data.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class QueuedStreamHandler(QueueHandler):
+    """呼び出し側はキューに積むだけで、書式化と書き込みはバックグラウンドスレッドで行うハンドラ
+
+    キューが一杯の場合は待たずに破棄する（リクエストやAIワーカーをログでブロックしない）。
+    targetを渡した場合はストリームの代わりにそのハンドラ（ファイルなど）に書き込む。
+    """
+
+    def __init__(self, stream=None, maxsize=10000, target=None):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target or logging.StreamHandler(stream)
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._listener_lock = threading.Lock()
+        atexit.register(self._stop_listener)
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # 書式化は出力スレッドのtargetで行う
+        return record
+
+    def enqueue(self, record):
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_listener(self):
+        """出力スレッドを起動（fork後のプロセスでも再起動される）"""
+        if self._listener is None or self._pid != os.getpid():
+            with self._listener_lock:
+                if self._listener is None or self._pid != os.getpid():
+                    self._listener = QueueListener(self.queue, self.target)
+                    self._listener.start()
+                    self._pid = os.getpid()
+
+    def _stop_listener(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+
+    def close(self):
+        """キューに残っているレコードを書き出してからtargetを閉じる"""
+        self._stop_listener()
+        self.target.close()
+        super().close()
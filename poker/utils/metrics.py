@@ -0,0 +1,98 @@
+"""
+運用メトリクスのプロセス内カウンタ（件数・直近1分間の件数・レイテンシのヒストグラム）
+"""
+import threading
+import time
+
+
+# AIの判断時間のヒストグラムのバケット（秒）
+DECISION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+class _MinuteWindow:
+    """直近60秒の件数（1秒ごとのバケットを使い回す）"""
+
+    def __init__(self):
+        self._seconds = [0] * 60
+        self._counts = [0] * 60
+
+    def add(self, now, amount):
+        second = int(now)
+        index = second % 60
+        if self._seconds[index] != second:
+            self._seconds[index] = second
+            self._counts[index] = 0
+        self._counts[index] += amount
+
+    def total(self, now):
+        second = int(now)
+        return sum(count for at, count in zip(self._seconds, self._counts) if second - at < 60)
+
+
+class Metrics:
+    """イベントの件数とレイテンシをプロセス内で集計する（記録はロック1回の加算のみ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}  # (名前, ラベル) -> [累計, 直近1分間の件数]
+        self._histograms = {}  # (名前, ラベル) -> [件数, 合計, バケットごとの件数]
+
+    def inc(self, name, amount=1, **labels):
+        """イベントの件数を加算"""
+        key = (name, tuple(sorted(labels.items())))
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = [0, _MinuteWindow()]
+            counter[0] += amount
+            counter[1].add(now, amount)
+
+    def observe(self, name, value, **labels):
+        """値（秒）をヒストグラムに記録"""
+        key = (name, tuple(sorted(labels.items())))
+        bucket = next((i for i, bound in enumerate(DECISION_BUCKETS) if value <= bound), None)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0, 0.0, [0] * len(DECISION_BUCKETS)]
+            histogram[0] += 1
+            histogram[1] += value
+            if bucket is not None:
+                histogram[2][bucket] += 1
+
+    def counters(self, name):
+        """名前が一致するカウンタの (ラベル, 累計, 直近1分間の件数) の一覧"""
+        now = time.monotonic()
+        with self._lock:
+            return sorted(
+                (labels, total, window.total(now))
+                for (counter_name, labels), (total, window) in self._counters.items()
+                if counter_name == name
+            )
+
+    def histograms(self, name):
+        """名前が一致するヒストグラムの (ラベル, 件数, 合計, バケットごとの件数) の一覧"""
+        with self._lock:
+            return sorted(
+                (labels, count, total, list(buckets))
+                for (histogram_name, labels), (count, total, buckets) in self._histograms.items()
+                if histogram_name == name
+            )
+
+    def reset(self):
+        """集計結果をクリア"""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+
+def format_labels(labels):
+    """ラベルの組をPrometheusの {name="value",...} 形式にする"""
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+# プロセス共通のメトリクス
+metrics = Metrics()
@@ -0,0 +1,201 @@
+"""
+フロップ・ターンでのアウツとドローの計算（残りの山札を全列挙する）
+"""
+from .fast_evaluator import (
+    CATEGORY_NAMES, FLUSH, FOUR_OF_A_KIND, FULL_DECK, FULL_HOUSE, HIGH_CARD, ONE_PAIR, POPCOUNT,
+    STRAIGHT, STRAIGHT_FLUSH, STRAIGHT_TABLE, THREE_OF_A_KIND, TWO_PAIR,
+)
+
+
+class _HandState:
+    """ランクごとの枚数・スートごとのランクマスクを持ち、1枚ずつ出し入れできる手札の状態
+
+    役のカテゴリだけを求める（キッカーは比較しない）ので、1回の判定は数回の表引きで済む。
+    """
+
+    __slots__ = ('counts', 'multiples', 'suit_masks')
+
+    def __init__(self, cards):
+        self.counts = [0] * 13
+        self.multiples = [13, 0, 0, 0, 0]  # 枚数ごとのランク数
+        self.suit_masks = [0, 0, 0, 0]
+        for card in cards:
+            self.add(card)
+
+    def add(self, card):
+        rank = card >> 2
+        count = self.counts[rank]
+        self.multiples[count] -= 1
+        self.multiples[count + 1] += 1
+        self.counts[rank] = count + 1
+        self.suit_masks[card & 3] |= 1 << rank
+
+    def remove(self, card):
+        rank = card >> 2
+        count = self.counts[rank]
+        self.multiples[count] -= 1
+        self.multiples[count - 1] += 1
+        self.counts[rank] = count - 1
+        self.suit_masks[card & 3] &= ~(1 << rank)
+
+    def rank_mask(self):
+        masks = self.suit_masks
+        return masks[0] | masks[1] | masks[2] | masks[3]
+
+    def category(self):
+        flush = False
+        for mask in self.suit_masks:
+            if POPCOUNT[mask] >= 5:
+                if STRAIGHT_TABLE[mask] >= 0:
+                    return STRAIGHT_FLUSH
+                flush = True
+
+        multiples = self.multiples
+        if multiples[4]:
+            return FOUR_OF_A_KIND
+        if multiples[3] and (multiples[3] >= 2 or multiples[2]):
+            return FULL_HOUSE
+        if flush:
+            return FLUSH
+        if STRAIGHT_TABLE[self.rank_mask()] >= 0:
+            return STRAIGHT
+        if multiples[3]:
+            return THREE_OF_A_KIND
+        if multiples[2] >= 2:
+            return TWO_PAIR
+        if multiples[2]:
+            return ONE_PAIR
+        return HIGH_CARD
+
+
+class OutsCalculator:
+    """手札が良くなるカード（アウツ）と、次の1枚・リバーまでの2枚で役が上がる確率を計算"""
+
+    @staticmethod
+    def calculate(hole_cards, board_cards, with_two_cards=True):
+        """整数カードの手札とボード（3枚か4枚）からアウツを計算
+
+        手札を使って役のカテゴリが上がり、かつボードだけの役より強くなるカードをアウツとする
+        （ボードがペアになるだけのカードは含まない）。with_two_cards=Falseの場合は
+        フロップでのリバーまでの2枚の全列挙を省略する。
+        """
+        if len(hole_cards) != 2 or len(board_cards) not in (3, 4):
+            raise ValueError('Outs require 2 hole cards and a flop or turn')
+
+        known = set(hole_cards) | set(board_cards)
+        hand = _HandState(list(hole_cards) + list(board_cards))
+        board = _HandState(board_cards)
+        current = hand.category()
+        classes = OutsCalculator._card_classes(hand, known)
+        deck_size = 52 - len(known)
+
+        outs = {}
+        for cards in classes:
+            category = OutsCalculator._improved_category(hand, board, current, (cards[0],))
+            if category is not None:
+                outs.setdefault(category, []).extend(cards)
+
+        out_count = sum(len(cards) for cards in outs.values())
+        result = {
+            'category': CATEGORY_NAMES[current],
+            'outs': {CATEGORY_NAMES[category]: len(cards) for category, cards in sorted(outs.items())},
+            'out_cards': sorted(card for cards in outs.values() for card in cards),
+            'total_outs': out_count,
+            'one_card': out_count / deck_size,
+            'two_cards': None,
+            'draws': OutsCalculator.draws(hole_cards, board_cards),
+        }
+
+        if len(board_cards) == 3 and with_two_cards:
+            improved = 0
+            for i, first_cards in enumerate(classes):
+                for second_cards in classes[i:]:
+                    if second_cards is first_cards:
+                        if len(first_cards) < 2:
+                            continue
+                        pair = first_cards[:2]
+                        weight = len(first_cards) * (len(first_cards) - 1) // 2
+                    else:
+                        pair = (first_cards[0], second_cards[0])
+                        weight = len(first_cards) * len(second_cards)
+                    if OutsCalculator._improved_category(hand, board, current, pair) is not None:
+                        improved += weight
+            result['two_cards'] = improved / (deck_size * (deck_size - 1) // 2)
+
+        return result
+
+    @staticmethod
+    def _card_classes(hand, known):
+        """残りのカードを役の判定で区別できないグループにまとめる
+
+        2枚足してもフラッシュになり得ないスートはランクだけで区別すればよいので、
+        列挙する組み合わせが大幅に減る。
+        """
+        flush_suits = {suit for suit, mask in enumerate(hand.suit_masks) if POPCOUNT[mask] >= 3}
+        classes = {}
+        for card in FULL_DECK:
+            if card in known:
+                continue
+            suit = card & 3
+            key = (card >> 2, suit if suit in flush_suits else -1)
+            classes.setdefault(key, []).append(card)
+        return list(classes.values())
+
+    @staticmethod
+    def _improved_category(hand, board, current, cards):
+        """cardsを加えて役が上がる場合はそのカテゴリ、上がらない場合はNone"""
+        for card in cards:
+            hand.add(card)
+        category = hand.category()
+        if category > current:
+            for card in cards:
+                board.add(card)
+            if category <= board.category():
+                category = None
+            for card in cards:
+                board.remove(card)
+        else:
+            category = None
+        for card in cards:
+            hand.remove(card)
+        return category
+
+    @staticmethod
+    def draws(hole_cards, board_cards):
+        """フラッシュドロー・ストレートドローの有無（手札を使うもののみ）"""
+        state = _HandState(list(hole_cards) + list(board_cards))
+        hole_suits = {card & 3 for card in hole_cards}
+        flush_draw = any(
+            POPCOUNT[mask] == 4 and suit in hole_suits for suit, mask in enumerate(state.suit_masks)
+        )
+
+        rank_mask = state.rank_mask()
+        board_mask = _HandState(board_cards).rank_mask()
+        straight_ranks = 0
+        if STRAIGHT_TABLE[rank_mask] < 0:
+            for rank in range(13):
+                bit = 1 << rank
+                if rank_mask & bit:
+                    continue
+                # ボードだけでもストレートになるランクは数えない
+                if STRAIGHT_TABLE[rank_mask | bit] >= 0 and STRAIGHT_TABLE[board_mask | bit] < 0:
+                    straight_ranks += 1
+
+        return {
+            'flush_draw': flush_draw,
+            'open_ended': straight_ranks >= 2,
+            'gutshot': straight_ranks == 1,
+        }
+
+    @staticmethod
+    def draw_probability(hole_cards, board_cards, min_category=STRAIGHT):
+        """min_category以上の役へのアウツから、リバーまでにそれを引く確率を計算"""
+        result = OutsCalculator.calculate(hole_cards, board_cards, with_two_cards=False)
+        outs = sum(
+            count for name, count in result['outs'].items() if CATEGORY_NAMES.index(name) >= min_category
+        )
+        remaining = 52 - len(hole_cards) - len(board_cards)
+        miss = 1.0
+        for i in range(5 - len(board_cards)):
+            miss *= (remaining - i - outs) / (remaining - i)
+        return 1.0 - miss
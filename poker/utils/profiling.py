@@ -0,0 +1,216 @@
+"""
+1回の呼び出しのプロファイル（cProfile / サンプリング）とSQLの集計
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+
+def _short_path(path):
+    """プロジェクト内のファイルはプロジェクトからの相対パスで表示"""
+    base = str(settings.BASE_DIR)
+    return os.path.relpath(path, base) if path.startswith(base) else path
+
+
+class SamplingProfiler:
+    """対象スレッドのスタックを一定間隔で記録するサンプリングプロファイラ（計測対象の処理を遅くしない）"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()  # (スレッド名, 関数, 関数, ...) -> サンプル数
+        self._threads = {}  # スレッドID -> スレッド名
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_thread(self, thread_id, name):
+        self._threads[thread_id] = name
+
+    def remove_thread(self, thread_id):
+        self._threads.pop(thread_id, None)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='poker-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id, name in list(self._threads.items()):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = f'{_short_path(code.co_filename)}:{code.co_firstlineno}({code.co_name})'
+                    stack.append(label)
+                    frame = frame.f_back
+                if stack:
+                    stack.append(f'[{name}]')
+                    self.stacks[tuple(reversed(stack))] += 1
+
+    def folded(self):
+        """flamegraph用の折りたたみ形式（1行に「スレッド;関数;関数;... サンプル数」）"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit=None):
+        """含まれるサンプル数の多い関数（自身で実行していたサンプル数も付ける）"""
+        inclusive = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack[1:]):
+                inclusive[label] += count
+            own[stack[-1]] += count
+        return [
+            {
+                'function': label,
+                'cumulative_ms': round(count * self.interval * 1000, 3),
+                'self_ms': round(own[label] * self.interval * 1000, 3),
+                'samples': count,
+            }
+            for label, count in inclusive.most_common(limit)
+        ]
+
+
+class SQLRecorder:
+    """connection.execute_wrapperで同じSQLごとの件数と時間を集計"""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            count, total = self.queries.get(sql, (0, 0.0))
+            self.queries[sql] = (count + 1, total + time.perf_counter() - started)
+
+    def summary(self, limit):
+        ranked = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            'queries': sum(count for count, _ in self.queries.values()),
+            'total_ms': round(sum(total for _, total in self.queries.values()) * 1000, 3),
+            'top': [
+                {'sql': sql, 'count': count, 'total_ms': round(total * 1000, 3)}
+                for sql, (count, total) in ranked[:limit]
+            ],
+        }
+
+
+class CallProfiler:
+    """関数呼び出しをプロファイルし、結果のファイル出力と上位の関数・SQLの要約を作る
+
+    計測するのは呼び出したスレッドと、profile_coroutineでラップしたコルーチンを実行したスレッド。
+    cProfileはスレッドごとに計測して結果をまとめ、サンプリングは対象の全スレッドのスタックを記録する。
+    """
+
+    MODES = ('cprofile', 'sample')
+    TOP_LIMIT = 25
+    SQL_LIMIT = 10
+
+    def __init__(self, mode='cprofile', sample_interval=0.001):
+        if mode not in self.MODES:
+            raise ValueError(f'不明なプロファイルモードです: {mode}')
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self.elapsed = 0.0
+        self.sql = SQLRecorder()
+        self._profiles = []  # スレッドごとのcProfile.Profile
+        self._sampler = None
+
+    def run(self, func, *args, **kwargs):
+        """呼び出しを現在のスレッドで計測して結果を返す"""
+        if self.mode == 'sample':
+            self._sampler = SamplingProfiler(self.sample_interval)
+            self._sampler.start()
+
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self.sql), self._profile_thread():
+                return func(*args, **kwargs)
+        finally:
+            if self._sampler is not None:
+                self._sampler.stop()
+            self.elapsed = time.perf_counter() - started
+
+    def profile_coroutine(self, func):
+        """コルーチン関数を、実行されるイベントループのスレッドでも計測するようにラップ（run()の中で呼ぶ）"""
+        async def wrapper(*args, **kwargs):
+            with self._profile_thread():
+                return await func(*args, **kwargs)
+        return wrapper
+
+    @contextmanager
+    def _profile_thread(self):
+        """現在のスレッドを計測対象に加える"""
+        if self.mode == 'cprofile':
+            profile = cProfile.Profile()
+            self._profiles.append(profile)
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+        else:
+            thread_id = threading.get_ident()
+            self._sampler.add_thread(thread_id, threading.current_thread().name)
+            try:
+                yield
+            finally:
+                self._sampler.remove_thread(thread_id)
+
+    def save(self, path_without_extension):
+        """プロファイルを保存してパスを返す（cProfileは.prof、サンプリングは.folded）"""
+        if self.mode == 'cprofile':
+            path = f'{path_without_extension}.prof'
+            pstats.Stats(*self._profiles).dump_stats(path)
+        else:
+            path = f'{path_without_extension}.folded'
+            with open(path, 'w') as f:
+                f.write(self._sampler.folded())
+        return path
+
+    def summary(self):
+        functions = self._ranked_functions()
+        return {
+            'mode': self.mode,
+            'elapsed_ms': round(self.elapsed * 1000, 3),
+            'functions': functions[:self.TOP_LIMIT],
+            # asgirefやasyncioの中継に埋もれないよう、プロジェクト内の関数だけの順位も付ける
+            'project_functions': [
+                entry for entry in functions
+                if not entry['function'].startswith(('/', '<', '~', _short_path(__file__), 'poker/middleware.py'))
+            ][:self.TOP_LIMIT],
+            'sql': self.sql.summary(self.SQL_LIMIT),
+        }
+
+    def _ranked_functions(self):
+        """累積時間の長い順の全関数"""
+        if self.mode == 'sample':
+            return self._sampler.top_functions()
+
+        stats = pstats.Stats(*self._profiles).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                'function': f'{_short_path(filename)}:{line}({name})',
+                'calls': calls,
+                'cumulative_ms': round(cumulative * 1000, 3),
+                'self_ms': round(own * 1000, 3),
+            }
+            for (filename, line, name), (_, calls, own, cumulative, _) in ranked
+        ]
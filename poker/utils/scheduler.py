@@ -0,0 +1,78 @@
+"""
+遅延タスクスケジューラ
+"""
+import heapq
+import itertools
+import threading
+import time
+
+from .log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class TaskScheduler:
+    """タイマーヒープとバックグラウンドスレッドで遅延タスクを実行する"""
+
+    def __init__(self, name='poker-scheduler'):
+        self.name = name
+        self._heap = []
+        self._counter = itertools.count(1)
+        self._cancelled = set()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay, func, *args, **kwargs):
+        """delay秒後にfuncを実行するよう登録し、タスクIDを返す"""
+        run_at = time.monotonic() + max(0, delay)
+        with self._cond:
+            task_id = next(self._counter)
+            heapq.heappush(self._heap, (run_at, task_id, func, args, kwargs))
+            self._ensure_thread()
+            self._cond.notify()
+        return task_id
+
+    def cancel(self, task_id):
+        """登録済みタスクをキャンセル（実行前の場合のみ有効）"""
+        with self._cond:
+            if any(entry[1] == task_id for entry in self._heap):
+                self._cancelled.add(task_id)
+                return True
+        return False
+
+    def pending_count(self):
+        """実行待ちのタスク数を取得"""
+        with self._cond:
+            return len(self._heap) - len(self._cancelled)
+
+    def _ensure_thread(self):
+        """ワーカースレッドを起動（fork後のプロセスでも再起動される）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """期限が来たタスクを順に実行"""
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                run_at, task_id, func, args, kwargs = self._heap[0]
+                wait_time = run_at - time.monotonic()
+                if wait_time > 0:
+                    self._cond.wait(wait_time)
+                    continue
+                heapq.heappop(self._heap)
+                if task_id in self._cancelled:
+                    self._cancelled.discard(task_id)
+                    continue
+
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                logger.exception('scheduled_task_error', task=getattr(func, '__qualname__', repr(func)))
+
+
+# プロセス共通のスケジューラ
+scheduler = TaskScheduler()
@@ -0,0 +1,148 @@
+"""
+事前計算した戦略テーブル（抽象化したゲーム状態 -> アクションごとの期待値）
+
+ファイルはmmapで読み取り専用に開くため、同じファイルを開いた全ワーカープロセスで
+ページが共有される。テーブルは simulate の自己対戦から build_strategy_table で作成する。
+"""
+import mmap
+import os
+import struct
+import tempfile
+
+STREETS = ('preflop', 'flop', 'turn', 'river')
+POSITION_BUCKETS = 3   # 早い / 中間 / 遅い（ディーラーに近いほど遅い）
+EQUITY_BUCKETS = 10    # ハンド強度 1-10
+POT_ODDS_BUCKETS = 5   # コール額 / (ポット + コール額)
+HISTORY_BUCKETS = 4    # このストリートの最高ベット: なし / BB以下 / 3BBまで / それ以上
+ACTIONS = ('fold', 'call', 'raise')  # callはチェックを、raiseはオールインを含む
+
+DIMENSIONS = (len(STREETS), POSITION_BUCKETS, EQUITY_BUCKETS, POT_ODDS_BUCKETS, HISTORY_BUCKETS)
+ENTRY_COUNT = 1
+for _size in DIMENSIONS:
+    ENTRY_COUNT *= _size
+
+MAGIC = b'PKST'
+VERSION = 1
+HEADER = struct.Struct('<4sH5H')
+ENTRY = struct.Struct('<3f3I')  # アクションごとの平均収支（BB単位）とサンプル数
+
+
+class StrategyTable:
+    """mmapした戦略テーブルの読み取り"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, *dimensions = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION or tuple(dimensions) != DIMENSIONS:
+            self._mmap.close()
+            raise ValueError(f'Incompatible strategy table: {path}')
+        if len(self._mmap) != HEADER.size + ENTRY_COUNT * ENTRY.size:
+            self._mmap.close()
+            raise ValueError(f'Truncated strategy table: {path}')
+        self.path = path
+
+    @staticmethod
+    def state_key(phase, position_bucket, hand_strength, call_amount, pot_size, highest_bet, big_blind):
+        """ゲーム状態を抽象化したキーを作成（対象外のフェーズではNone）"""
+        if phase not in STREETS:
+            return None
+
+        equity_bucket = min(EQUITY_BUCKETS - 1, max(0, int(round(hand_strength)) - 1))
+
+        if call_amount <= 0:
+            odds_bucket = 0
+        else:
+            pot_odds = call_amount / (pot_size + call_amount)
+            odds_bucket = min(POT_ODDS_BUCKETS - 1, 1 + int(pot_odds * (POT_ODDS_BUCKETS - 1) * 2))
+
+        big_blind = max(1, big_blind)
+        if highest_bet <= 0:
+            history_bucket = 0
+        elif highest_bet <= big_blind:
+            history_bucket = 1
+        elif highest_bet <= big_blind * 3:
+            history_bucket = 2
+        else:
+            history_bucket = 3
+
+        return (STREETS.index(phase), position_bucket, equity_bucket, odds_bucket, history_bucket)
+
+    @staticmethod
+    def position_bucket(active_positions, dealer_position, position):
+        """ディーラーの次から数えた行動順を3段階に分類"""
+        order = sorted(active_positions, key=lambda p: (p <= dealer_position, p))
+        if position not in order:
+            return 0
+        return order.index(position) * POSITION_BUCKETS // len(order)
+
+    @staticmethod
+    def index(key):
+        """キーをエントリ番号に変換"""
+        index = 0
+        for value, size in zip(key, DIMENSIONS):
+            index = index * size + value
+        return index
+
+    def lookup(self, key):
+        """(平均収支のタプル, サンプル数のタプル) を返す"""
+        values = ENTRY.unpack_from(self._mmap, HEADER.size + self.index(key) * ENTRY.size)
+        return values[:3], values[3:]
+
+    def best_action(self, key, min_samples=20):
+        """十分なサンプルがあるアクションのうち期待値が最大のものを返す（なければNone）"""
+        evs, counts = self.lookup(key)
+        best = None
+        for action, ev, count in zip(ACTIONS, evs, counts):
+            if count >= min_samples and (best is None or ev > best[1]):
+                best = (action, ev)
+        return best[0] if best else None
+
+    def close(self):
+        self._mmap.close()
+
+    @staticmethod
+    def write(path, totals):
+        """集計結果 {key: [[収支合計, 回数] * 3]} をテーブルファイルに書き出す
+
+        一時ファイルに書いてから置き換えるため、既にmmapしているプロセスは古い内容を読み続ける。
+        """
+        entries = bytearray(ENTRY_COUNT * ENTRY.size)
+        for key, per_action in totals.items():
+            means = [total / count if count else 0.0 for total, count in per_action]
+            counts = [count for _, count in per_action]
+            ENTRY.pack_into(entries, StrategyTable.index(key) * ENTRY.size, *means, *counts)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, *DIMENSIONS))
+                f.write(entries)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+_tables = {}  # パス -> (ファイルの更新時刻, StrategyTable)
+
+
+def load_strategy_table(path):
+    """パスのテーブルを開く（未設定・存在しない場合はNone）
+
+    開いたテーブルはファイルの更新時刻が変わるまで使い回す。存在しない場合は記憶しないので、
+    後からbuild_strategy_tableで作成・更新したテーブルも再起動せずに読み込まれる。
+    """
+    if not path:
+        return None
+    path = str(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        _tables.pop(path, None)
+        return None
+    cached = _tables.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _tables[path] = (mtime, StrategyTable(path))
+    return cached[1]
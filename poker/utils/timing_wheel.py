@@ -0,0 +1,87 @@
+"""
+ハッシュ化タイミングホイール
+"""
+import math
+import threading
+import time
+
+from .log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class TimingWheel:
+    """キーごとに1つのタイマーを持つタイミングホイール（登録・取消・期限切れがO(1)）"""
+
+    def __init__(self, tick=0.5, slots=512, name='poker-timing-wheel'):
+        self.tick = tick
+        self.slots = slots
+        self.name = name
+        self._wheel = [{} for _ in range(slots)]  # スロットごとに key -> [残り周回数, callback, args]
+        self._slot_of = {}  # key -> スロット番号
+        self._cursor = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def arm(self, key, delay, callback, *args):
+        """delay秒後にcallback(*args)を実行（同じキーの既存タイマーは置き換え）"""
+        ticks = max(1, math.ceil(delay / self.tick))
+        with self._lock:
+            self._cancel_locked(key)
+            slot = (self._cursor + ticks) % self.slots
+            self._wheel[slot][key] = [(ticks - 1) // self.slots, callback, args]
+            self._slot_of[key] = slot
+            self._ensure_thread()
+
+    def cancel(self, key):
+        """キーのタイマーを取り消す"""
+        with self._lock:
+            return self._cancel_locked(key)
+
+    def pending_count(self):
+        """登録中のタイマー数を取得"""
+        with self._lock:
+            return len(self._slot_of)
+
+    def _cancel_locked(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is None:
+            return False
+        del self._wheel[slot][key]
+        return True
+
+    def _ensure_thread(self):
+        """ティックを進めるスレッドを起動（fork後のプロセスでも再起動される）"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _advance(self):
+        """カーソルを1スロット進め、期限切れのタイマーを取り出す"""
+        expired = []
+        with self._lock:
+            self._cursor = (self._cursor + 1) % self.slots
+            bucket = self._wheel[self._cursor]
+            for key, entry in list(bucket.items()):
+                if entry[0] > 0:
+                    entry[0] -= 1
+                    continue
+                del bucket[key]
+                del self._slot_of[key]
+                expired.append((entry[1], entry[2]))
+        return expired
+
+    def _run(self):
+        next_tick = time.monotonic() + self.tick
+        while True:
+            wait_time = next_tick - time.monotonic()
+            if wait_time > 0:
+                time.sleep(wait_time)
+            next_tick += self.tick
+
+            for callback, args in self._advance():
+                try:
+                    callback(*args)
+                except Exception:
+                    logger.exception('timer_callback_error', callback=getattr(callback, '__qualname__', repr(callback)))
@@ -0,0 +1,220 @@
+"""
+サービス層のスパン計測（実時間・DB時間・クエリ数をゲーム/ハンドごとに記録）
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connection
+
+from .log import QueuedStreamHandler
+
+
+# 実時間のヒストグラムのバケット（秒）
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _SpanFormatter(logging.Formatter):
+    """スパンの辞書を1行のJSONに書式化（出力スレッドで呼ばれる）"""
+
+    def format(self, record):
+        return json.dumps(record.msg)
+
+
+class Tracer:
+    """スパンをプロセス内で集計し、JSONLファイル（ローテーション）とPrometheus形式で出力する
+
+    スパンはスレッドごとのスタックで入れ子にでき、DB時間とクエリ数は開いている全スパンに
+    加算される（外側のスパンは内側の分も含む）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {}  # スパン名 -> [件数, 実時間, DB時間, クエリ数, バケットごとの件数]
+        self._file_logger = None
+        self._file_path = None
+
+    @contextmanager
+    def span(self, name, game_id=None, round_id=None):
+        """スパンを開き、終了時に計測結果を記録（キーを省略した場合は外側のスパンから引き継ぐ）"""
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            game_id = parent['game_id'] if game_id is None else game_id
+            round_id = parent['round_id'] if round_id is None else round_id
+
+        record = {
+            'span': name,
+            'game_id': game_id,
+            'round_id': round_id,
+            'parent': parent['span'] if parent else None,
+            'db': 0.0,
+            'queries': 0,
+        }
+        stack.append(record)
+        started_at = time.time()
+        started = time.perf_counter()
+        error = False
+        try:
+            if parent is None:
+                # 一番外側のスパンだけがクエリを計測し、開いている全スパンに加算する
+                with connection.execute_wrapper(self._measure_query):
+                    yield record
+            else:
+                yield record
+        except BaseException:
+            error = True
+            raise
+        finally:
+            stack.pop()
+            self._finish(record, started_at, time.perf_counter() - started, error)
+
+    def prometheus(self):
+        """集計結果をPrometheusのテキスト形式で返す"""
+        with self._lock:
+            stats = {name: (count, wall, db, queries, list(buckets))
+                     for name, (count, wall, db, queries, buckets) in self._stats.items()}
+
+        lines = [
+            '# HELP poker_span_duration_seconds Wall time of service-layer spans.',
+            '# TYPE poker_span_duration_seconds histogram',
+        ]
+        for name, (count, wall, _, _, buckets) in sorted(stats.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(SPAN_BUCKETS, buckets):
+                cumulative += bucket_count
+                lines.append(f'poker_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'poker_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {count}')
+            lines.append(f'poker_span_duration_seconds_sum{{span="{name}"}} {wall:.6f}')
+            lines.append(f'poker_span_duration_seconds_count{{span="{name}"}} {count}')
+
+        lines += [
+            '# HELP poker_span_db_seconds_total Database time spent inside service-layer spans.',
+            '# TYPE poker_span_db_seconds_total counter',
+        ]
+        lines += [f'poker_span_db_seconds_total{{span="{name}"}} {db:.6f}'
+                  for name, (_, _, db, _, _) in sorted(stats.items())]
+        lines += [
+            '# HELP poker_span_queries_total Database queries issued inside service-layer spans.',
+            '# TYPE poker_span_queries_total counter',
+        ]
+        lines += [f'poker_span_queries_total{{span="{name}"}} {queries}'
+                  for name, (_, _, _, queries, _) in sorted(stats.items())]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """集計結果をクリア"""
+        with self._lock:
+            self._stats = {}
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _measure_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapperから呼ばれ、クエリの時間を開いている全スパンに加算"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            for record in self._stack():
+                record['db'] += elapsed
+                record['queries'] += 1
+
+    def _finish(self, record, started_at, wall, error):
+        """スパンの結果を集計に加え、ファイル出力が有効ならJSONLに書き出す"""
+        bucket = next((i for i, bound in enumerate(SPAN_BUCKETS) if wall <= bound), None)
+        with self._lock:
+            stats = self._stats.get(record['span'])
+            if stats is None:
+                stats = self._stats[record['span']] = [0, 0.0, 0.0, 0, [0] * len(SPAN_BUCKETS)]
+            stats[0] += 1
+            stats[1] += wall
+            stats[2] += record['db']
+            stats[3] += record['queries']
+            if bucket is not None:
+                stats[4][bucket] += 1
+
+        file_logger = self._get_file_logger()
+        if file_logger is not None:
+            # 書式化と書き込みは出力スレッドで行う
+            file_logger.info({
+                'ts': round(started_at, 6),
+                'span': record['span'],
+                'game_id': record['game_id'],
+                'round_id': record['round_id'],
+                'parent': record['parent'],
+                'wall_ms': round(wall * 1000, 3),
+                'db_ms': round(record['db'] * 1000, 3),
+                'queries': record['queries'],
+                'error': error,
+            })
+
+    def _get_file_logger(self):
+        """POKER_TRACE_FILEが設定されていればローテーションするJSONLのロガーを返す"""
+        path = getattr(settings, 'POKER_TRACE_FILE', '')
+        if not path:
+            return None
+        if self._file_path != path:
+            with self._lock:
+                if self._file_path != path:
+                    file_logger = logging.getLogger('poker.trace')
+                    file_logger.propagate = False
+                    file_logger.setLevel(logging.INFO)
+                    for handler in list(file_logger.handlers):
+                        file_logger.removeHandler(handler)
+                        handler.close()
+                    # リクエストのスレッドでディスクに書かないよう、キュー経由で出力スレッドから書き込む
+                    handler = QueuedStreamHandler(target=RotatingFileHandler(
+                        path,
+                        maxBytes=getattr(settings, 'POKER_TRACE_MAX_BYTES', 10 * 1024 * 1024),
+                        backupCount=getattr(settings, 'POKER_TRACE_BACKUP_COUNT', 3),
+                        encoding='utf-8',
+                    ))
+                    handler.setFormatter(_SpanFormatter())
+                    file_logger.addHandler(handler)
+                    self._file_logger = file_logger
+                    self._file_path = path
+        return self._file_logger
+
+
+def _trace_keys(args):
+    """引数のモデル（Game / GameRound / Player）からゲームIDとハンド（GameRound）IDを取り出す"""
+    game_id = round_id = None
+    for arg in args:
+        meta = getattr(arg, '_meta', None)
+        if meta is None:
+            continue
+        if meta.model_name == 'game' and game_id is None:
+            game_id = arg.id
+        elif meta.model_name == 'gameround':
+            round_id = arg.id
+            game_id = game_id if game_id is not None else arg.game_id
+        elif meta.model_name == 'player' and game_id is None:
+            game_id = arg.game_id
+    return game_id, round_id
+
+
+def traced(name):
+    """関数の呼び出しをスパンで囲むデコレータ（引数のモデルからゲーム/ハンドのキーを決める）"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            game_id, round_id = _trace_keys(args)
+            with tracer.span(name, game_id, round_id):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# プロセス共通のトレーサー
+tracer = Tracer()
@@ -6,14 +6,17 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-import json
 
 from .models import Game, Player, GameRound, PlayerAction
 from .services.game_service import GameService
 from .services.betting_service import BettingService
-from .services.ai_service import AIService
+from .services.card_service import HandEvaluator
+from .services.chip_service import ChipService
+from .services.recovery_service import StallRecovery
+from .utils.log import get_logger
+
+
+logger = get_logger(__name__)
 
 
 def home(request):
@@ -91,8 +94,7 @@ def create_game(request):
         small_blind = int(request.POST.get('small_blind', 10))
         big_blind = int(request.POST.get('big_blind', 20))
         
-        # デバッグ用ログ
-        print(f"Debug - Received data: name='{name}', max_players={max_players}, small_blind={small_blind}, big_blind={big_blind}")
+        logger.debug('create_game_request', name=name, max_players=max_players, small_blind=small_blind, big_blind=big_blind)
         
         try:
             game = GameService.create_game(
@@ -108,7 +110,7 @@ def create_game(request):
             messages.error(request, f'ゲーム作成に失敗しました: {str(e)}')
         except Exception as e:
             messages.error(request, f'ゲーム作成に失敗しました: {str(e)}')
-            print(f"Debug - Exception details: {type(e).__name__}: {str(e)}")
+            logger.exception('create_game_failed', name=name)
     
     return render(request, 'poker/create_game.html')
 
@@ -133,7 +135,7 @@ def add_ai_player(request, game_id):
     game = get_object_or_404(Game, id=game_id)
     
     try:
-        GameService.add_ai_player(game)
+        GameService.add_ai_player(game, request.GET.get('strategy', ''))
         messages.success(request, 'AIプレイヤーを追加しました。')
     except ValueError as e:
         messages.error(request, str(e))
@@ -149,14 +151,28 @@ def game_detail(request, game_id):
     if not player:
         return redirect('join_game', game_id=game.id)
     
-    players = Player.objects.filter(game=game).order_by('position')
     current_round = GameRound.objects.filter(game=game).last()
+    if current_round and StallRecovery.is_stalled(game, current_round):
+        # 予定の処理が失われて止まっているテーブルは再開してから表示
+        StallRecovery.recover(game.id, current_round.id)
+        game.refresh_from_db()
+        current_round = GameRound.objects.filter(game=game).last()
+    
+    players = Player.objects.filter(game=game).order_by('position')
     
     # コール金額を計算
     call_amount = 0
     if current_round and player:
         call_amount = BettingService.get_call_amount(player, current_round)
     
+    # オールインのランアウト中はまだ見せていないカードを隠す
+    community_cards = current_round.get_visible_community_cards() if current_round else []
+    
+    # アウツのヒント（フロップ・ターンで手札がある場合）
+    outs_hint = None
+    if current_round and player.is_active and not player.is_folded:
+        outs_hint = HandEvaluator.outs_hint(player.get_hand_cards(), community_cards)
+    
     # 現在のラウンドのアクション履歴を取得
     recent_actions = []
     if current_round:
@@ -169,8 +185,10 @@ def game_detail(request, game_id):
         'player': player,
         'players': players,
         'current_round': current_round,
+        'community_cards': community_cards,
         'call_amount': call_amount,
         'recent_actions': recent_actions,
+        'outs_hint': outs_hint,
     }
     
     return render(request, 'poker/game_detail.html', context)
@@ -190,74 +208,6 @@ def start_game(request, game_id):
     return redirect('game_detail', game_id=game.id)
 
 
-@login_required
-@csrf_exempt
-def player_action(request, game_id):
-    """プレイヤーのアクションを処理"""
-    if request.method != 'POST':
-        return JsonResponse({'error': 'POST method required'}, status=405)
-    
-    game = get_object_or_404(Game, id=game_id)
-    player = get_object_or_404(Player, user=request.user, game=game)
-    
-    data = json.loads(request.body)
-    action = data.get('action')
-    amount = data.get('amount', 0)
-    
-    current_round = GameRound.objects.filter(game=game).last()
-    
-    if not current_round:
-        return JsonResponse({'error': 'No active round'}, status=400)
-    
-    # プレイヤーがアクティブかチェック
-    if not player.is_active or player.is_folded:
-        return JsonResponse({'error': 'Player is not active'}, status=400)
-    
-    # 現在のプレイヤーの番かチェック
-    if player.position != current_round.current_player_position:
-        return JsonResponse({'error': 'Not your turn'}, status=400)
-    
-    try:
-        # アクションを処理
-        print(f"[DEBUG] プレイヤー {player.user.username} (位置: {player.position}) がアクション: {action}")
-        BettingService.process_player_action(player, game, current_round, action, amount)
-        
-        # アクション後すぐにアクティブプレイヤーをチェック
-        current_round.refresh_from_db()
-        active_players = current_round.get_active_players()
-        print(f"[DEBUG] アクティブプレイヤー数: {active_players.count()}")
-        
-        if active_players.count() <= 1:
-            # アクティブプレイヤーが1人以下になった場合は即座にショーダウンへ
-            print(f"[DEBUG] アクティブプレイヤーが1人以下になったため、ショーダウンに移行")
-            GameService.advance_game_phase(game, current_round)
-            return JsonResponse({'success': True})
-        
-        # 次のプレイヤーを設定
-        from .utils.position_manager import PositionManager
-        next_position = PositionManager.get_next_player_position(current_round)
-        print(f"[DEBUG] 次のプレイヤー位置: {next_position}")
-        if next_position is not None:
-            current_round.current_player_position = next_position
-            current_round.save()
-        
-        # AIプレイヤーの行動を処理（ベッティング完了チェック前に）
-        AIService.process_ai_actions(game, current_round)
-        
-        # ベッティングラウンドが完了したかチェック（AIの行動後に）
-        current_round.refresh_from_db()  # データベースから最新状態を再取得
-        if BettingService.is_betting_round_complete(game, current_round):
-            print(f"[DEBUG] ベッティングラウンド完了、次のフェーズに移行")
-            GameService.advance_game_phase(game, current_round)
-        
-        return JsonResponse({'success': True})
-        
-    except ValueError as e:
-        return JsonResponse({'error': str(e)}, status=400)
-    except Exception as e:
-        return JsonResponse({'error': 'Internal server error'}, status=500)
-
-
 @login_required
 def leave_game(request, game_id):
     """ゲームから退出"""
@@ -285,13 +235,11 @@ def end_game(request, game_id):
     player = Player.objects.filter(user=request.user, game=game).first()
     if player:
         penalty = min(player.chips // 3, 150)
-        player.chips -= penalty
-        game.pot += penalty
-        player.save()
+        ChipService.transfer_to_pot(game, player, penalty, 'penalty')
     
     # ゲームを終了
     game.status = 'finished'
-    game.save()
+    game.save(update_fields=['status'])
     
     messages.success(request, 'ゲームを終了しました。')
     return redirect('home')
@@ -0,0 +1,238 @@
+"""
+非同期ビュー（JSONエンドポイント）
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from functools import wraps
+import hmac
+import json
+import threading
+
+from .models import Game, Player, GameRound
+from .services.card_service import HandEvaluator
+from .services.game_service import GameService
+from .services.metrics_service import MetricsService
+from .services.range_equity_service import RangeEquityService
+from .services.recovery_service import StallRecovery
+from .utils.game_events import GameEvents
+from .utils.log import get_logger
+from .utils.tracing import tracer
+
+
+logger = get_logger(__name__)
+
+LONG_POLL_TIMEOUT = 25  # ロングポーリングの最大待ち時間（秒）
+MAX_EQUITY_SAMPLES = 100000  # エクイティ計算APIのサンプル数の上限
+
+_equity_users = set()  # エクイティ計算中のユーザーID（プロセス内）
+_equity_lock = threading.Lock()
+
+
+async def _current_round(game):
+    """現在のラウンドを取得（予定の処理が失われて止まっているテーブルは再開してから返す）"""
+    current_round = await GameRound.objects.filter(game=game).alast()
+    if current_round and StallRecovery.is_stalled(game, current_round):
+        await sync_to_async(StallRecovery.recover)(game.id, current_round.id)
+        await game.arefresh_from_db()
+        current_round = await GameRound.objects.filter(game=game).alast()
+    return current_round
+
+
+async def _build_game_state(game, user):
+    """ゲーム状態のJSONデータを作成"""
+    current_round = await _current_round(game)
+    players = [
+        p async for p in Player.objects.filter(game=game).select_related('user').order_by('position')
+    ]
+
+    me = None
+    player_data = []
+    for p in players:
+        if p.user_id == user.id:
+            me = p
+        player_data.append({
+            'position': p.position,
+            'username': p.user.username,
+            'chips': p.chips,
+            'current_bet': p.current_bet,
+            'is_active': p.is_active,
+            'is_folded': p.is_folded,
+            'is_ai': p.is_ai,
+        })
+
+    state = {
+        'version': game.state_version,
+        'status': game.status,
+        'pot': game.pot,
+        'dealer_position': game.dealer_position,
+        'players': player_data,
+        'round': None,
+        'hand_cards': [card.to_dict() for card in me.get_hand_cards()] if me else [],
+        'call_amount': 0,
+        'outs': None,
+    }
+
+    if current_round:
+        # オールインのランアウト中はまだ見せていないカードを隠す
+        community_cards = current_round.get_visible_community_cards()
+        state['round'] = {
+            'round_number': current_round.round_number,
+            'phase': current_round.phase,
+            'community_cards': [card.to_dict() for card in community_cards],
+            'current_player_position': current_round.current_player_position,
+            'highest_bet': current_round.highest_bet,
+        }
+        if me:
+            state['call_amount'] = max(0, current_round.highest_bet - me.current_bet)
+            if me.is_active and not me.is_folded:
+                state['outs'] = HandEvaluator.outs_hint(me.get_hand_cards(), community_cards)
+
+    return state
+
+
+@login_required
+async def game_state(request, game_id):
+    """ゲーム状態を取得"""
+    game = await aget_object_or_404(Game, id=game_id)
+    user = await request.auser()
+    return JsonResponse(await _build_game_state(game, user))
+
+
+@login_required
+async def game_state_poll(request, game_id):
+    """ゲーム状態が変わるまで待ってから返す（ロングポーリング）"""
+    try:
+        since = int(request.GET.get('version', -1))
+        timeout = min(float(request.GET.get('timeout', LONG_POLL_TIMEOUT)), LONG_POLL_TIMEOUT)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid parameters'}, status=400)
+
+    game = await aget_object_or_404(Game, id=game_id)
+    user = await request.auser()
+
+    # 止まっているテーブルは待つ前に再開する（再開すればバージョンが変わるのですぐに返る）
+    await _current_round(game)
+
+    # 待機中はワーカーを占有しない（他プロセスでの変更はDBのバージョンで拾う）
+    await GameEvents.wait_for_change(game.id, since, timeout)
+
+    await game.arefresh_from_db()
+    return JsonResponse(await _build_game_state(game, user))
+
+
+@login_required
+@csrf_exempt
+async def player_action(request, game_id):
+    """プレイヤーのアクションを処理"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST method required'}, status=405)
+
+    user = await request.auser()
+    game = await aget_object_or_404(Game, id=game_id)
+    await aget_object_or_404(Player, user=user, game=game)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Request body must be a JSON object'}, status=400)
+    action = data.get('action')
+    amount = data.get('amount', 0)
+
+    try:
+        # 手番の確認とアクションの適用はゲームの行ロック内で行う（AIの行動はコミット後に進行）
+        await sync_to_async(GameService.submit_player_action)(game.id, user, action, amount)
+
+        return JsonResponse({'success': True})
+
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception:
+        logger.exception('player_action_error', game_id=game.id, user_id=user.id, action=action)
+        return JsonResponse({'error': 'Internal server error'}, status=500)
+
+
+@login_required
+async def equity_calculator(request):
+    """レンジ同士のエクイティを計算（学習ツール用）
+
+    POST {"ranges": ["QQ+, AKs", "random"], "board": "Ah7d2c", "dead": "", "samples": 20000}
+    計算はCPUを使うので、同じユーザーの同時実行と、プロセス内の同時実行数（POKER_EQUITY_CONCURRENCY）を制限する。
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST method required'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('Request body must be a JSON object')
+        ranges = data.get('ranges') or []
+        if not isinstance(ranges, list) or not all(isinstance(r, str) for r in ranges):
+            raise ValueError('ranges must be a list of strings')
+        board = data.get('board') or ''
+        dead = data.get('dead') or ''
+        if not isinstance(board, str) or not isinstance(dead, str):
+            raise ValueError('board and dead must be card strings such as "Ah7d2c"')
+        samples = int(data.get('samples') or RangeEquityService.DEFAULT_SAMPLES)
+        if not 1 <= samples <= MAX_EQUITY_SAMPLES:
+            raise ValueError(f'samples must be between 1 and {MAX_EQUITY_SAMPLES}')
+    except (ValueError, TypeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    user = await request.auser()
+    with _equity_lock:
+        busy = (user.id in _equity_users
+                or len(_equity_users) >= getattr(settings, 'POKER_EQUITY_CONCURRENCY', 2))
+        if not busy:
+            _equity_users.add(user.id)
+    if busy:
+        return JsonResponse({'error': 'Too many equity calculations in progress'}, status=429)
+
+    try:
+        # 計算中もイベントループを止めないようスレッドで実行
+        result = await sync_to_async(RangeEquityService.calculate, thread_sensitive=False)(
+            ranges,
+            board=board,
+            dead=dead,
+            samples=samples,
+            processes=getattr(settings, 'POKER_EQUITY_PROCESSES', 1),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    finally:
+        with _equity_lock:
+            _equity_users.discard(user.id)
+
+    return JsonResponse(result)
+
+
+def metrics_access_required(view):
+    """メトリクスのビューをスタッフか、POKER_METRICS_TOKENのBearerトークンを付けたリクエストだけに制限"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        token = getattr(settings, 'POKER_METRICS_TOKEN', '')
+        authorization = request.headers.get('Authorization', '')
+        if token and hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+            return await view(request, *args, **kwargs)
+        if (await request.auser()).is_staff:
+            return await view(request, *args, **kwargs)
+        return HttpResponse('Forbidden', status=403, content_type='text/plain; charset=utf-8')
+    return wrapper
+
+
+@metrics_access_required
+async def trace_metrics(request):
+    """サービス層のスパンの集計をPrometheusのテキスト形式で返す"""
+    return HttpResponse(tracer.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@metrics_access_required
+async def operational_metrics(request):
+    """テーブル数・ハンド数・アクション数・AIの判断時間・キュー・キャッシュの状態をPrometheusのテキスト形式で返す"""
+    body = await sync_to_async(MetricsService.prometheus)()
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'poker.middleware.RequestProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,12 +89,21 @@ if 'RENDER' in os.environ:
             conn_max_age=600
         )
     }
+elif 'DATABASE_URL' in os.environ:
+    # ローカルのPostgreSQLなど（loadtestでSQLiteと比較する場合）
+    DATABASES = {
+        'default': dj_database_url.config(default=os.environ['DATABASE_URL'])
+    }
 else:
     # Development database
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # AIワーカースレッドとの書き込み競合で即座にロックエラーにならないようにする
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+            },
         }
     }
 
@@ -147,3 +157,82 @@ if not DEBUG:    # Tell Django to copy statics to the `staticfiles` directory
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Poker game settings
+
+# ショーダウン後、次のハンドを開始するまでの待ち時間（秒）。0以下で即時開始
+POKER_NEXT_HAND_DELAY = float(os.environ.get('POKER_NEXT_HAND_DELAY', 1))
+
+# AIプレイヤーの行動をリクエスト外のスレッドプールで処理するか
+POKER_AI_BACKGROUND = os.environ.get('POKER_AI_BACKGROUND', '1') != '0'
+
+# AIワーカースレッド数
+POKER_AI_WORKERS = int(os.environ.get('POKER_AI_WORKERS', 2))
+
+# AIが1回の行動判断に使える時間（秒）。時間内はエクイティのサンプリングで判断を精緻化
+POKER_AI_DECISION_BUDGET = float(os.environ.get('POKER_AI_DECISION_BUDGET', 0.05))
+
+# 人間プレイヤーの持ち時間（秒）。時間切れでチェック、コールが必要ならフォールド。0で無効
+POKER_TURN_TIMEOUT = float(os.environ.get('POKER_TURN_TIMEOUT', 30))
+
+# 事前計算した戦略テーブルのパス（build_strategy_tableで作成）。空の場合はヒューリスティックで判断
+POKER_STRATEGY_TABLE = os.environ.get('POKER_STRATEGY_TABLE', '')
+
+# エクイティ計算APIでサンプリングに使うプロセス数
+POKER_EQUITY_PROCESSES = int(os.environ.get('POKER_EQUITY_PROCESSES', 1))
+
+# エクイティ計算APIをプロセス内で同時に実行できる数（同じユーザーは1つまで）
+POKER_EQUITY_CONCURRENCY = int(os.environ.get('POKER_EQUITY_CONCURRENCY', 2))
+
+# 全員オールインで残りのボードを一度に配ったとき、UIに1ストリートずつ見せる間隔（秒）。0で一度に表示
+POKER_RUNOUT_REVEAL_DELAY = float(os.environ.get('POKER_RUNOUT_REVEAL_DELAY', 0))
+
+# 次のハンドの開始予定や手番の期限をこの秒数過ぎても進んでいないテーブルは、状態の読み込み時に再開する
+POKER_RECOVERY_GRACE = float(os.environ.get('POKER_RECOVERY_GRACE', 10))
+
+# メトリクスのエンドポイントをスタッフ以外（Prometheusなど）が読むためのBearerトークン。空の場合はスタッフのみ
+POKER_METRICS_TOKEN = os.environ.get('POKER_METRICS_TOKEN', '')
+
+# サービス層のスパン（実時間・DB時間・クエリ数）を書き出すJSONLファイルのパス。空の場合はファイルに出力しない
+POKER_TRACE_FILE = os.environ.get('POKER_TRACE_FILE', '')
+
+# スパンのJSONLファイルをローテーションするサイズ（バイト）と残す世代数
+POKER_TRACE_MAX_BYTES = int(os.environ.get('POKER_TRACE_MAX_BYTES', 10 * 1024 * 1024))
+POKER_TRACE_BACKUP_COUNT = int(os.environ.get('POKER_TRACE_BACKUP_COUNT', 3))
+
+# スタッフが ?profile= を付けたリクエストのプロファイル（.prof / .folded）と要約を保存するディレクトリ
+POKER_PROFILE_DIR = os.environ.get('POKER_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+# サンプリングプロファイラ（?profile=sample）のサンプル間隔（秒）
+POKER_PROFILE_SAMPLE_INTERVAL = float(os.environ.get('POKER_PROFILE_SAMPLE_INTERVAL', 0.001))
+
+# pokerアプリのログレベル（DEBUGでアクションごとのイベントも出力）
+POKER_LOG_LEVEL = os.environ.get('POKER_LOG_LEVEL', 'INFO')
+
+# アクションごとのDEBUGイベントを記録する割合（0-1）
+POKER_LOG_SAMPLE_RATE = float(os.environ.get('POKER_LOG_SAMPLE_RATE', 0.01))
+
+# pokerアプリのログは1行1JSONで、キュー経由でバックグラウンドスレッドから標準出力に書き出す
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'poker.utils.log.StructuredFormatter',
+        },
+    },
+    'handlers': {
+        'poker': {
+            'class': 'poker.utils.log.QueuedStreamHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'poker': {
+            'handlers': ['poker'],
+            'level': POKER_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}